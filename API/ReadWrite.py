@@ -5,6 +5,7 @@ Collection of methods for reading and writing DICOM within a Pipeline.
 import os
 from PyQt5.QtWidgets import QFileDialog
 import CoreModules.WriteXMLfromDICOM as WriteXMLfromDICOM
+import CoreModules.WeaselSQLiteReader as WeaselSQLiteReader
 from CoreModules.TreeView import TreeView
 from Displays.UserInput import userInput
 from DICOM.Classes import ImagesList, SeriesList, StudyList, SubjectList
@@ -100,6 +101,7 @@ class ReadWrite():
             self.close_subwindows()
             self.cursor_arrow_to_hourglass()
             XML_File_Path = WriteXMLfromDICOM.makeDICOM_XML_File(self, self.DICOMFolder)
+            XML_File_Path = self._catalog_file(XML_File_Path, update=True)
             self.cursor_hourglass_to_arrow()
             self.treeView = TreeView(self, XML_File_Path)
               
@@ -113,11 +115,44 @@ class ReadWrite():
             self.cursor_arrow_to_hourglass()
             if WriteXMLfromDICOM.existsDICOMXMLFile(self.DICOMFolder):
                 XML_File_Path = self.DICOMFolder + '//' + os.path.basename(self.DICOMFolder) + '.xml'
+                XML_File_Path = self._catalog_file(XML_File_Path)
+                self.cursor_hourglass_to_arrow() 
+                self.treeView = TreeView(self, XML_File_Path) 
+                # Bring the existing XML file up to date with the files added, changed or removed since
+                self.refresh_dicom_folder()
             else:
                 XML_File_Path = WriteXMLfromDICOM.makeDICOM_XML_File(self, self.DICOMFolder)
-            self.cursor_hourglass_to_arrow() 
-            self.treeView = TreeView(self, XML_File_Path) 
+                XML_File_Path = self._catalog_file(XML_File_Path, update=True)
+                self.cursor_hourglass_to_arrow() 
+                self.treeView = TreeView(self, XML_File_Path) 
+
+    def refresh_dicom_folder(self):
+        """
+        Rescan the open DICOM folder and refresh display.
+        Only the files that are new or have changed are read, and the files removed are dropped.
+        If no DICOM folder is open, the user is asked to open one.
+        """
+        if self.DICOMFolder and self.objXMLReader is not None:
+            self.cursor_arrow_to_hourglass()
+            changes = WriteXMLfromDICOM.updateDICOM_XML_File(self, self.DICOMFolder, self.objXMLReader)
+            self.cursor_hourglass_to_arrow()
+            if changes:
+                self.refresh()
+        else:
+            self.open_dicom_folder()
              
+    def _catalog_file(self, XML_File_Path, update=False):
+        """
+        Returns the catalog of the DICOM folder in the format set in config.xml:
+        the XML file itself, or the SQLite catalog imported from it.
+        The XML file is imported again if update is True, 
+        otherwise an existing SQLite catalog is kept as it holds the latest edits.
+        """
+        configReader = getattr(self, 'objConfigXMLReader', None)
+        if configReader is not None and configReader.getCatalogFormat() == 'sqlite':
+            return WeaselSQLiteReader.catalogFromXML(XML_File_Path, update=update)
+        return XML_File_Path
+
     def close_dicom_folder(self):
         """
         Closes the DICOM folder and updates display.
@@ -14,14 +14,38 @@ class StaticMethods():
     @staticmethod
     def unique_elements(inputList):
         """
-        Returns unique elements of any list.
+        Returns unique elements of any list, in order of first appearance.
         """
         #output = list(inp for inp,_ in itertools.groupby(inputList))
-        output = []
-        for x in inputList:
-            if x not in output:
-                output.append(x)
-        return output
+        try:
+            # Hashable elements and (nested) lists are deduplicated with a set, in O(n)
+            output = []
+            seen = set()
+            for x in inputList:
+                key = StaticMethods._hashable_key(x)
+                if key not in seen:
+                    seen.add(key)
+                    output.append(x)
+            return output
+        except TypeError:
+            output = []
+            for x in inputList:
+                if x not in output:
+                    output.append(x)
+            return output
+
+    @staticmethod
+    def _hashable_key(x):
+        """
+        Returns a hashable key that is equal for two elements if and only if the elements are equal.
+        Lists and tuples are converted recursively, other unhashable types raise TypeError.
+        """
+        if isinstance(x, list):
+            return (list, tuple(StaticMethods._hashable_key(item) for item in x))
+        if isinstance(x, tuple):
+            return (tuple, tuple(StaticMethods._hashable_key(item) for item in x))
+        hash(x)
+        return x
     
     @staticmethod
     def match_search(regex_string, target):
@@ -12,7 +12,7 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QApplication, QAbstractItemVi
 import os
 import sys
 import logging
-from CoreModules.WeaselXMLReader import WeaselXMLReader
+from CoreModules.WeaselSQLiteReader import openReader
 from Displays.ImageViewers.ImageViewer import ImageViewer as imageViewer
 from DICOM.Classes import (Image, Series)
 
@@ -36,7 +36,10 @@ class TreeView():
             if os.path.exists(XML_File_Path):
                 QApplication.setOverrideCursor(Qt.WaitCursor)
                 self.weasel = weasel
-                self.weasel.objXMLReader = WeaselXMLReader(weasel, XML_File_Path)
+                # Release the catalog of the previous folder, if any
+                if getattr(self.weasel, 'objXMLReader', None) is not None:
+                    self.weasel.objXMLReader.close()
+                self.weasel.objXMLReader = openReader(weasel, XML_File_Path)
                 self.treeViewColumnWidths = { 1: 0, 2: 0, 3: 0} 
 
                 self.treeViewWidget = QTreeWidget()
@@ -328,6 +331,7 @@ class TreeView():
         """
         try:
             self.weasel.objXMLReader.save()
+            self.weasel.objXMLReader.close()
             self.weasel.objXMLReader = None
             self.treeViewWidget.clear()
             self.treeViewWidget.close()
@@ -456,6 +460,9 @@ class TreeView():
         to the XML element associated with it. 
 
         The XML element contains data describing the tree view item.
+        The XML reader also keeps track of the checked elements, so that 
+        the checked images, series, studies and subjects are found without
+        searching the XML tree.
 
          Input Parameters
         ****************
@@ -463,11 +470,8 @@ class TreeView():
         """
         try:
             logger.info("TreeView.saveCheckedState called.")
-            if item.checkState(0) == Qt.Checked:
-                checkedState = 'True' 
-            else:
-                checkedState = 'False'
-            item.element.set('checked', checkedState)
+            checked = item.checkState(0) == Qt.Checked
+            self.weasel.objXMLReader.setChecked(item.element, checked)
         except Exception as e:
                 print('Error in TreeView.saveCheckedState: ' + str(e))
                 logger.exception('Error in TreeView.saveCheckedState: ' + str(e))
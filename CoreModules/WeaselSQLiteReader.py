@@ -0,0 +1,673 @@
+"""
+Class for reading, editing and writing to a SQLite catalog summarising
+the contents of a DICOM folder, as an alternative to the XML file.
+
+The catalog has the same hierarchy as the XML file written by `WriteXMLfromDICOM.py`,
+stored in indexed subject, study, series and image tables,
+and `WeaselSQLiteReader` has the same methods as `WeaselXMLReader`.
+"""
+import os
+import json
+import sqlite3
+import weakref
+import threading
+import functools
+import xml.etree.ElementTree as ET
+import logging
+from CoreModules.WeaselXMLReader import WeaselXMLReader
+
+
+logger = logging.getLogger(__name__)
+# The loggers whose errors roll back a transaction: those of the reader methods
+TRANSACTION_LOGGERS = (logger, logging.getLogger(WeaselXMLReader.__module__))
+
+# File extension of the SQLite catalogs, which take their name from the XML file they replace
+CATALOG_EXTENSION = '.sqlite'
+# Tag of the root element, as in the XML file
+ROOT_TAG = 'DICOM'
+LEVELS = ('subject', 'study', 'series', 'image')
+CHILD_TAGS = {ROOT_TAG: 'subject', 'subject': 'study', 'study': 'series', 'series': 'image'}
+# The child elements of an image in the XML file, which are columns of the image table
+IMAGE_FIELDS = ('label', 'name', 'time', 'date')
+COLUMNS = {'subject': ('id', 'checked', 'attributes'),
+           'study': ('id', 'checked', 'attributes'),
+           'series': ('id', 'checked', 'attributes'),
+           'image': ('name', 'label', 'time', 'date', 'checked', 'attributes')}
+# Number of rows inserted at a time when importing an XML file
+IMPORT_BATCH_SIZE = 10000
+# Number of references to elements kept before those no longer used are removed
+ELEMENT_CACHE_SIZE = 100000
+
+# The primary keys are never reused, so ordering by them gives the order of the XML file.
+# The parent of a subject is always NULL.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subject (
+    pk INTEGER PRIMARY KEY AUTOINCREMENT, parent INTEGER,
+    id TEXT NOT NULL, checked INTEGER NOT NULL DEFAULT 0, attributes TEXT);
+CREATE TABLE IF NOT EXISTS study (
+    pk INTEGER PRIMARY KEY AUTOINCREMENT, parent INTEGER NOT NULL REFERENCES subject(pk) ON DELETE CASCADE,
+    id TEXT NOT NULL, checked INTEGER NOT NULL DEFAULT 0, attributes TEXT);
+CREATE TABLE IF NOT EXISTS series (
+    pk INTEGER PRIMARY KEY AUTOINCREMENT, parent INTEGER NOT NULL REFERENCES study(pk) ON DELETE CASCADE,
+    id TEXT NOT NULL, checked INTEGER NOT NULL DEFAULT 0, attributes TEXT);
+CREATE TABLE IF NOT EXISTS image (
+    pk INTEGER PRIMARY KEY AUTOINCREMENT, parent INTEGER NOT NULL REFERENCES series(pk) ON DELETE CASCADE,
+    name TEXT NOT NULL, label TEXT, time TEXT, date TEXT, checked INTEGER NOT NULL DEFAULT 0, attributes TEXT);
+CREATE INDEX IF NOT EXISTS subject_id ON subject(id);
+CREATE INDEX IF NOT EXISTS study_parent_id ON study(parent, id);
+CREATE INDEX IF NOT EXISTS series_parent_id ON series(parent, id);
+CREATE INDEX IF NOT EXISTS image_parent_name ON image(parent, name);
+CREATE INDEX IF NOT EXISTS image_name ON image(name);
+CREATE INDEX IF NOT EXISTS subject_checked ON subject(checked) WHERE checked = 1;
+CREATE INDEX IF NOT EXISTS study_checked ON study(checked) WHERE checked = 1;
+CREATE INDEX IF NOT EXISTS series_checked ON series(checked) WHERE checked = 1;
+CREATE INDEX IF NOT EXISTS image_checked ON image(checked) WHERE checked = 1;
+"""
+
+
+def catalogFile(xml_file):
+    """Returns the path of the SQLite catalog that replaces the XML file xml_file."""
+    return os.path.splitext(xml_file)[0] + CATALOG_EXTENSION
+
+
+def connectCatalog(catalog_file):
+    """Opens the SQLite catalog catalog_file, creating its tables if they do not exist, and returns the connection."""
+    connection = sqlite3.connect(catalog_file)
+    connection.execute('PRAGMA foreign_keys = ON')
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = NORMAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def importXMLFile(xml_file, catalog_file=None):
+    """
+    Imports an XML file written by `WriteXMLfromDICOM.py` into a SQLite catalog and returns the path of the catalog.
+    By default the catalog is written next to the XML file, see `catalogFile`.
+    The rows of an existing catalog are replaced in a single transaction,
+    so readers of the catalog see either its old or its new contents.
+
+    The XML file is parsed incrementally and its rows are inserted in batches,
+    so the XML tree is never held in memory.
+    """
+    logger.info("WeaselSQLiteReader.importXMLFile called")
+    try:
+        if catalog_file is None:
+            catalog_file = catalogFile(xml_file)
+        connection = connectCatalog(catalog_file)
+        # All the rows are replaced, so the deletions need not cascade
+        connection.execute('PRAGMA foreign_keys = OFF')
+        rows = {tag: [] for tag in LEVELS}
+        counts = {tag: 0 for tag in LEVELS}
+        # Primary key of the subject, study and series being read
+        current = {}
+        def insertRows():
+            # Parents are inserted before their children
+            for tag in LEVELS:
+                if rows[tag]:
+                    connection.executemany('INSERT INTO {} (pk, parent, {}) VALUES ({})'.format(
+                        tag, ', '.join(COLUMNS[tag]), ', '.join('?' * (len(COLUMNS[tag]) + 2))), rows[tag])
+                    rows[tag].clear()
+        with connection:
+            for tag in reversed(LEVELS):
+                connection.execute('DELETE FROM ' + tag)
+            for event, element in ET.iterparse(xml_file, events=('start', 'end')):
+                if event == 'start':
+                    if element.tag in ('subject', 'study', 'series'):
+                        attributes = dict(element.attrib)
+                        elementID = attributes.pop('id')
+                        checked = attributes.pop('checked', 'False') == 'True'
+                        counts[element.tag] += 1
+                        current[element.tag] = counts[element.tag]
+                        parent = None if element.tag == 'subject' else current[LEVELS[LEVELS.index(element.tag) - 1]]
+                        rows[element.tag].append((counts[element.tag], parent, elementID, checked, json.dumps(attributes) if attributes else None))
+                elif element.tag == 'image':
+                    attributes = dict(element.attrib)
+                    checked = attributes.pop('checked', 'False') == 'True'
+                    fields = {child.tag: child.text for child in element}
+                    counts['image'] += 1
+                    rows['image'].append((counts['image'], current['series'], fields.get('name'), fields.get('label'),
+                                          fields.get('time'), fields.get('date'), checked, json.dumps(attributes) if attributes else None))
+                    element.clear()
+                    if len(rows['image']) >= IMPORT_BATCH_SIZE:
+                        insertRows()
+                elif element.tag in ('subject', 'study', 'series'):
+                    element.clear()
+            insertRows()
+        connection.close()
+        return catalog_file
+    except Exception as e:
+        print('Error in function WeaselSQLiteReader.importXMLFile: ' + str(e))
+        logger.exception('Error in function WeaselSQLiteReader.importXMLFile: ' + str(e))
+
+
+def catalogFromXML(xml_file, update=False):
+    """
+    Returns the path of the SQLite catalog of the XML file xml_file.
+    The XML file is imported if the catalog does not exist yet or if update is True,
+    otherwise the catalog is used as it is because it holds the latest edits.
+    """
+    catalog_file = catalogFile(xml_file)
+    if update or not os.path.exists(catalog_file):
+        importXMLFile(xml_file, catalog_file)
+    return catalog_file
+
+
+def openReader(weasel, file):
+    """Returns a WeaselSQLiteReader if file is a SQLite catalog and a WeaselXMLReader otherwise."""
+    if file.lower().endswith(CATALOG_EXTENSION):
+        return WeaselSQLiteReader(weasel, file)
+    return WeaselXMLReader(weasel, file)
+
+
+class CatalogText:
+    """A child element of an image, such as its name or label, of which only the text is used."""
+    __slots__ = ('tag', 'text')
+
+    def __init__(self, tag, text):
+        self.tag = tag
+        self.text = text
+
+
+class CatalogElement:
+    """
+    A subject, study, series or image of a SQLite catalog, or the root of the catalog.
+
+    It has the part of the ElementTree Element interface that Weasel uses on the elements of the XML file:
+    tag, attrib, get, set, find, findall, iter, len, indexing and iteration over the children.
+    The values of the row are read when the element is returned by the catalog and
+    are updated by the edits made through the catalog.
+    """
+    __slots__ = ('catalog', 'tag', 'pk', 'parentKey', 'row', '__weakref__')
+
+    def __init__(self, catalog, tag, pk, parentKey, row):
+        self.catalog = catalog
+        self.tag = tag
+        self.pk = pk
+        self.parentKey = parentKey
+        self.row = row
+
+    def __repr__(self):
+        return '<{} {!r} at {}>'.format(self.__class__.__name__, self.tag, self.pk)
+
+    def __eq__(self, other):
+        return isinstance(other, CatalogElement) and other.catalog is self.catalog and (other.tag, other.pk) == (self.tag, self.pk)
+
+    def __hash__(self):
+        return hash((self.tag, self.pk))
+
+    @property
+    def attrib(self):
+        if self.pk is None:
+            return {}
+        attrib = dict(self.row['attributes'])
+        if self.tag != 'image':
+            attrib['id'] = self.row['id']
+        attrib['checked'] = 'True' if self.row['checked'] else 'False'
+        return attrib
+
+    def get(self, key, default=None):
+        return self.attrib.get(key, default)
+
+    def set(self, key, value):
+        self.catalog._setAttribute(self, key, value)
+
+    def __iter__(self):
+        if self.tag == 'image':
+            return iter([CatalogText(field, self.row[field]) for field in IMAGE_FIELDS])
+        return iter(self.catalog._children(self))
+
+    def __len__(self):
+        if self.tag == 'image':
+            return len(IMAGE_FIELDS)
+        return self.catalog._countChildren(self)
+
+    def __getitem__(self, index):
+        return list(self)[index]
+
+    def find(self, path):
+        if self.tag == 'image':
+            return CatalogText(path, self.row[path]) if path in IMAGE_FIELDS else None
+        for child in self.findall(path):
+            return child
+
+    def findall(self, path):
+        if self.tag == 'image':
+            return [CatalogText(path, self.row[path])] if path in IMAGE_FIELDS else []
+        return list(self) if path == CHILD_TAGS[self.tag] else []
+
+    def iter(self, tag=None):
+        if tag is None or self.tag == tag:
+            yield self
+        if self.tag == 'image':
+            for child in self:
+                if tag is None or child.tag == tag:
+                    yield child
+        elif tag is None or tag in IMAGE_FIELDS or (tag in LEVELS and (self.pk is None or LEVELS.index(tag) > LEVELS.index(self.tag))):
+            for child in self:
+                yield from child.iter(tag)
+
+
+class CatalogIndex:
+    """
+    The subject, study and series of a SQLite catalog keyed by (subjectID,), (subjectID, studyID)
+    and (subjectID, studyID, seriesID), used to look up the elements of the catalog by their IDs.
+    """
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def get(self, key, default=None):
+        elements = self.catalog._findElements(key, limit=1)
+        return elements[0] if elements else default
+
+    def __getitem__(self, key):
+        element = self.get(key)
+        if element is None:
+            raise KeyError(key)
+        return element
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+class _ErrorCounter(logging.Handler):
+    """Counts the errors logged by the thread that created it."""
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.thread = threading.get_ident()
+        self.errors = 0
+
+    def emit(self, record):
+        if record.thread == self.thread:
+            self.errors += 1
+
+
+def _transaction(method):
+    """
+    Makes a method that edits the catalog a transaction:
+    its changes are committed when it returns and rolled back if it raises an exception or logs an error.
+    The WeaselXMLReader methods catch their exceptions and only log them, so a logged error is the
+    only sign that they stopped half way through an edit. Methods called from within a transaction are part of it.
+    """
+    @functools.wraps(method)
+    def transaction(self, *args, **kwargs):
+        outermost = self._transactionDepth == 0
+        if outermost:
+            errorCounter = _ErrorCounter()
+            for readerLogger in TRANSACTION_LOGGERS:
+                readerLogger.addHandler(errorCounter)
+        self._transactionDepth += 1
+        failed = False
+        try:
+            return method(self, *args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._transactionDepth -= 1
+            if outermost:
+                for readerLogger in TRANSACTION_LOGGERS:
+                    readerLogger.removeHandler(errorCounter)
+                if failed or errorCounter.errors:
+                    self.connection.rollback()
+                    self._reloadElements()
+                else:
+                    self.connection.commit()
+    return transaction
+
+
+class WeaselSQLiteReader(WeaselXMLReader):
+    """
+    WeaselSQLiteReader keeps the summary of a DICOM folder in a SQLite catalog instead of an XML file.
+
+    It has the same methods as WeaselXMLReader, which it inherits: only the lookups and the
+    insertion, removal and renaming of elements are replaced by queries of the catalog.
+    The elements it returns are CatalogElement objects.
+    Opening a catalog does not read it, and each edit only changes the rows concerned
+    and is committed when the method that makes it returns.
+    """
+    def __init__(self, weasel, catalog_file):
+        """ Initialise an object of  WeaselSQLiteReader class
+
+        Input arguments
+        -----------------
+        weasel: instance of Weasel
+        catalog_file: the SQLite catalog to be represented
+        """
+        try:
+            self.weasel = weasel
+            self.file = catalog_file
+            self.connection = connectCatalog(catalog_file)
+            self.root = CatalogElement(self, ROOT_TAG, None, None, {})
+            # Weak references to the CatalogElement of each row, so there is at most one for each row at any time
+            self._elementCache = {}
+            self._elementCacheLimit = ELEMENT_CACHE_SIZE
+            self._transactionDepth = 0
+            logger.info('In module ' + __name__ + ' Created SQLite Reader Object')
+        except Exception as e:
+            print('Error in WeaselSQLiteReader.__init__: ' + str(e))
+            logger.error('Error in WeaselSQLiteReader.__init__: ' + str(e))
+
+
+    def _element(self, tag, row):
+        """
+        Returns the CatalogElement of a row (pk, parent, *COLUMNS[tag]) of the table tag.
+        """
+        key = (tag, row[0])
+        values = dict(zip(COLUMNS[tag], row[2:]))
+        values['checked'] = bool(values['checked'])
+        values['attributes'] = json.loads(values['attributes']) if values['attributes'] else {}
+        reference = self._elementCache.get(key)
+        element = None if reference is None else reference()
+        if element is None:
+            element = CatalogElement(self, tag, row[0], row[1], values)
+            self._elementCache[key] = weakref.ref(element)
+            if len(self._elementCache) > self._elementCacheLimit:
+                self._pruneElementCache()
+        else:
+            element.parentKey = row[1]
+            element.row = values
+        return element
+
+
+    def _reloadElements(self):
+        """
+        Reads again the rows of the elements in use, after a transaction is rolled back.
+        """
+        for (tag, pk), reference in list(self._elementCache.items()):
+            element = reference()
+            if element is not None:
+                self._get(tag, pk)
+
+
+    def _pruneElementCache(self):
+        """
+        Removes the elements that are no longer used from the cache of elements.
+        """
+        self._elementCache = {key: reference for key, reference in self._elementCache.items() if reference() is not None}
+        self._elementCacheLimit = max(ELEMENT_CACHE_SIZE, 2 * len(self._elementCache))
+
+
+    def _select(self, tag, conditions=(), parameters=(), limit=None):
+        """
+        Returns the elements of the table tag that meet the SQL conditions, in the order of the XML file.
+        The conditions can use the columns of the tables of the parents, eg. 'subject.id = ?' for a series.
+        """
+        tables = LEVELS[:LEVELS.index(tag) + 1]
+        sql = 'SELECT {0}.pk, {0}.parent, '.format(tag) + ', '.join(tag + '.' + column for column in COLUMNS[tag]) + ' FROM ' + tag
+        for child, parent in zip(reversed(tables[1:]), reversed(tables[:-1])):
+            sql += ' JOIN {0} ON {1}.parent = {0}.pk'.format(parent, child)
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY ' + ', '.join(table + '.pk' for table in tables)
+        if limit is not None:
+            sql += ' LIMIT ' + str(int(limit))
+        return [self._element(tag, row) for row in self.connection.execute(sql, parameters)]
+
+
+    def _get(self, tag, pk):
+        """
+        Returns the element of the table tag with the primary key pk, or None if it has been removed.
+        """
+        sql = 'SELECT pk, parent, ' + ', '.join(COLUMNS[tag]) + ' FROM ' + tag + ' WHERE pk = ?'
+        row = self.connection.execute(sql, (pk,)).fetchone()
+        return None if row is None else self._element(tag, row)
+
+
+    def _children(self, element):
+        """
+        Returns the child elements of element in the order of the XML file.
+        """
+        tag = CHILD_TAGS[element.tag]
+        sql = 'SELECT pk, parent, ' + ', '.join(COLUMNS[tag]) + ' FROM ' + tag
+        if element.pk is None:
+            rows = self.connection.execute(sql + ' ORDER BY pk')
+        else:
+            rows = self.connection.execute(sql + ' WHERE parent = ? ORDER BY pk', (element.pk,))
+        return [self._element(tag, row) for row in rows]
+
+
+    def _countChildren(self, element):
+        """
+        Returns the number of child elements of element.
+        """
+        tag = CHILD_TAGS[element.tag]
+        if element.pk is None:
+            return self.connection.execute('SELECT COUNT(*) FROM ' + tag).fetchone()[0]
+        return self.connection.execute('SELECT COUNT(*) FROM ' + tag + ' WHERE parent = ?', (element.pk,)).fetchone()[0]
+
+
+    def _setAttribute(self, element, key, value):
+        """
+        Sets an attribute of element, as Element.set does in the XML tree.
+        """
+        if element.pk is None:
+            raise ValueError('The root of the catalog has no attributes')
+        if key == 'checked':
+            checked = value == 'True'
+            self.connection.execute('UPDATE ' + element.tag + ' SET checked = ? WHERE pk = ?', (checked, element.pk))
+            element.row['checked'] = checked
+        elif key == 'id' and element.tag != 'image':
+            self.connection.execute('UPDATE ' + element.tag + ' SET id = ? WHERE pk = ?', (value, element.pk))
+            element.row['id'] = value
+        else:
+            attributes = dict(element.row['attributes'], **{key: value})
+            self.connection.execute('UPDATE ' + element.tag + ' SET attributes = ? WHERE pk = ?', (json.dumps(attributes), element.pk))
+            element.row['attributes'] = attributes
+
+
+    def _findElements(self, key, limit=None):
+        """
+        Returns all the elements with the given key, in the order of the XML file.
+        """
+        conditions = [LEVELS[level] + '.id = ?' for level in range(len(key))]
+        return self._select(LEVELS[len(key) - 1], conditions, key, limit=limit)
+
+
+    def _newElement(self, parent, tag, attributes):
+        """
+        Inserts a subject, study or series in parent and returns its element.
+        """
+        attributes = dict(attributes)
+        elementID = attributes.pop('id')
+        checked = attributes.pop('checked', 'False') == 'True'
+        cursor = self.connection.execute('INSERT INTO ' + tag + ' (parent, id, checked, attributes) VALUES (?, ?, ?, ?)',
+            (parent.pk, elementID, checked, json.dumps(attributes) if attributes else None))
+        return self._get(tag, cursor.lastrowid)
+
+
+    def _newImageElement(self, series, label, name, time, date):
+        """
+        Inserts an image in series, with the size and modification time of its file, and returns its element.
+        """
+        attributes = self._fileState(name)
+        cursor = self.connection.execute('INSERT INTO image (parent, name, label, time, date, attributes) VALUES (?, ?, ?, ?, ?, ?)',
+            (series.pk, name, label, time, date, json.dumps(attributes) if attributes else None))
+        return self._get('image', cursor.lastrowid)
+
+
+    def _setImageFields(self, image, fields):
+        """
+        Sets the label, time or date of an image element from the dictionary fields, eg. {'label': '000001'}.
+        """
+        columns = [field for field in fields if field in IMAGE_FIELDS and field != 'name']
+        self.connection.execute('UPDATE image SET ' + ', '.join(column + ' = ?' for column in columns) + ' WHERE pk = ?',
+            [fields[column] for column in columns] + [image.pk])
+        for column in columns:
+            image.row[column] = fields[column]
+
+
+    def _removeElement(self, parent, element):
+        """
+        Removes element from parent, with all its descendants.
+        """
+        if element.parentKey != parent.pk or element.tag != CHILD_TAGS[parent.tag]:
+            raise ValueError('The element is not a child of the parent')
+        self.connection.execute('DELETE FROM ' + element.tag + ' WHERE pk = ?', (element.pk,))
+
+
+    def _setElementID(self, element, newID):
+        """
+        Changes the id attribute of a subject, study or series element.
+        """
+        self._setAttribute(element, 'id', newID)
+
+
+    def _getImage(self, series, imageName):
+        """
+        Returns the first image element with the file path imageName in the series element, or None.
+        """
+        images = self._select('image', ['image.parent = ?', 'image.name = ?'], (series.pk, imageName), limit=1)
+        return images[0] if images else None
+
+
+    def _findImage(self, subjectID, studyID, seriesID, imageName):
+        """
+        Returns the first image element with the file path imageName in the series with the given IDs, or None.
+        """
+        images = self._select('image', ['subject.id = ?', 'study.id = ?', 'series.id = ?', 'image.name = ?'],
+                              (subjectID, studyID, seriesID, imageName), limit=1)
+        return images[0] if images else None
+
+
+    def _getFirstImage(self, imageName):
+        """
+        Returns the first image element in the catalog with the file path imageName, or None.
+        """
+        images = self._select('image', ['image.name = ?'], (imageName,), limit=1)
+        return images[0] if images else None
+
+
+    def save(self):
+        """
+        Commits the changes to the catalog that have not been committed yet.
+        The edits made through WeaselSQLiteReader methods are committed as they are made.
+        """
+        try:
+            self.connection.commit()
+        except Exception as e:
+            print('Error in WeaselSQLiteReader.save: ' + str(e))
+            logger.error('Error in WeaselSQLiteReader.save: ' + str(e))
+
+
+    def close(self):
+        """
+        Commits the changes to the catalog and closes the connection to it.
+        """
+        try:
+            self.connection.commit()
+            self.connection.close()
+        except Exception as e:
+            print('Error in WeaselSQLiteReader.close: ' + str(e))
+            logger.error('Error in WeaselSQLiteReader.close: ' + str(e))
+
+
+    @_transaction
+    def setChecked(self, element, checked):
+        """
+        Sets the checked state of a subject, study, series or image element to True or False.
+        """
+        element.set('checked', 'True' if checked else 'False')
+
+
+    def _checkedElements(self, tag, root=None):
+        """
+        Returns the checked elements with the given tag in the order of the XML file.
+        If root is given, only the elements in root or below are returned.
+        """
+        conditions = [tag + '.checked = 1']
+        parameters = []
+        if root is not None and root.pk is not None:
+            if LEVELS.index(root.tag) > LEVELS.index(tag):
+                return []
+            conditions.append(root.tag + '.pk = ?')
+            parameters.append(root.pk)
+        return self._select(tag, conditions, parameters)
+
+
+    def _getImageList(self, subjectID, studyID, seriesID):
+        """
+        Returns a list of image elements in a specific series
+        """
+        try:
+            return self._select('image', ['subject.id = ?', 'study.id = ?', 'series.id = ?'], (subjectID, studyID, seriesID))
+        except Exception as e:
+            print('Error in WeaselSQLiteReader.getImageList: ' + str(e))
+            logger.error('Error in WeaselSQLiteReader.getImageList: ' + str(e))
+
+
+    def getSubject(self, subjectID):
+        """
+        Returns the subject with the ID, subjectID
+        """
+        try:
+            return CatalogIndex(self).get((subjectID,))
+        except Exception as e:
+            print('Error in WeaselSQLiteReader.getSubject: ' + str(e))
+            logger.error('Error in WeaselSQLiteReader.getSubject: ' + str(e))
+
+
+    def getStudy(self, subjectID, studyID):
+        """
+        Returns the study with the ID, studyID
+        """
+        try:
+            return CatalogIndex(self).get((subjectID, studyID))
+        except Exception as e:
+            print('Error in WeaselSQLiteReader.getStudy: ' + str(e))
+            logger.error('Error in WeaselSQLiteReader.getStudy: ' + str(e))
+
+
+    def getSeries(self, subjectID, studyID, seriesID):
+        """
+        Returns the series with the ID, seriesID
+        """
+        try:
+            return CatalogIndex(self).get((subjectID, studyID, seriesID))
+        except Exception as e:
+            print('Error in WeaselSQLiteReader.getSeries: ' + str(e))
+            logger.error('Error in WeaselSQLiteReader.getSeries: ' + str(e))
+
+
+    def getImageParentIDs(self, imageName):
+        """
+        Returns the (subjectID, studyID, seriesID) of the first image with the file path imageName,
+        or (None, None, None) if the image is not in the catalog.
+        """
+        try:
+            row = self.connection.execute('SELECT subject.id, study.id, series.id FROM image'
+                ' JOIN series ON image.parent = series.pk JOIN study ON series.parent = study.pk JOIN subject ON study.parent = subject.pk'
+                ' WHERE image.name = ? ORDER BY subject.pk, study.pk, series.pk, image.pk LIMIT 1', (imageName,)).fetchone()
+            return (None, None, None) if row is None else tuple(row)
+        except Exception as e:
+            print('Error in WeaselSQLiteReader.getImageParentIDs: ' + str(e))
+            logger.error('Error in WeaselSQLiteReader.getImageParentIDs: ' + str(e))
+
+
+    def branch(self, elem):
+        """Returns the list of elements from the root to elem, or None if elem is not in the catalog"""
+        if elem.pk is None or self._get(elem.tag, elem.pk) is None:
+            return None
+        branch = [elem]
+        while branch[0].tag != 'subject':
+            branch.insert(0, self._get(LEVELS[LEVELS.index(branch[0].tag) - 1], branch[0].parentKey))
+        return [self.root] + branch
+
+
+    removeSubjectFromXMLFile = _transaction(WeaselXMLReader.removeSubjectFromXMLFile)
+    removeOneImageFromSeries = _transaction(WeaselXMLReader.removeOneImageFromSeries)
+    removeOneStudyFromSubject = _transaction(WeaselXMLReader.removeOneStudyFromSubject)
+    removeOneSeriesFromStudy = _transaction(WeaselXMLReader.removeOneSeriesFromStudy)
+    removeImageFromXMLFile = _transaction(WeaselXMLReader.removeImageFromXMLFile)
+    removeMultipleImagesFromXMLFile = _transaction(WeaselXMLReader.removeMultipleImagesFromXMLFile)
+    moveImageInXMLFile = _transaction(WeaselXMLReader.moveImageInXMLFile)
+    moveImagesInXMLFile = _transaction(WeaselXMLReader.moveImagesInXMLFile)
+    insertNewStudyInXMLFile = _transaction(WeaselXMLReader.insertNewStudyInXMLFile)
+    insertNewSeriesInXMLFile = _transaction(WeaselXMLReader.insertNewSeriesInXMLFile)
+    insertNewImageInXMLFile = _transaction(WeaselXMLReader.insertNewImageInXMLFile)
+    insertNewSubjectinXML = _transaction(WeaselXMLReader.insertNewSubjectinXML)
+    insertNewStudyinXML = _transaction(WeaselXMLReader.insertNewStudyinXML)
+    insertNewSeriesInXML = _transaction(WeaselXMLReader.insertNewSeriesInXML)
+    insertNewImageInXML = _transaction(WeaselXMLReader.insertNewImageInXML)
+    updateImageInXML = _transaction(WeaselXMLReader.updateImageInXML)
+    renameSeriesinXMLFile = _transaction(WeaselXMLReader.renameSeriesinXMLFile)
@@ -4,6 +4,7 @@ the contents of a DICOM folder.
 """
 import xml.etree.cElementTree as ET  
 from datetime import datetime
+from itertools import count
 import logging
 import DICOM.ReadDICOM_Image as ReadDICOM_Image
 from DICOM.Classes import (ImagesList, SeriesList, StudyList, SubjectList, Image, Series, Study, Subject)
@@ -18,6 +19,14 @@ class WeaselXMLReader:
 
     WeaselXMLReader represents the XML file in memory as an ElementTree,
     and uses the ElementTree functionality to edit the XML file. 
+
+    The lookups use dictionaries that are built when the file is read and kept in
+    sync by every insert, removal, move and rename made through this class:
+        - subject, study and series elements keyed by (subjectID,), (subjectID, studyID)
+          and (subjectID, studyID, seriesID)
+        - image elements keyed by file path
+        - the parent element of every subject, study, series and image element
+        - the subject, study, series and image elements that are checked
     """
     def __init__(self, weasel, xml_file): 
         """ Initialise an object of  WeaselXMLReader class
@@ -32,6 +41,7 @@ class WeaselXMLReader:
             self.file = xml_file
             self.tree = ET.parse(xml_file)
             self.root = self.tree.getroot()
+            self._buildIndex()
             logger.info('In module ' + __name__ + ' Created XML Reader Object')
         except Exception as e:
             print('Error in WeaselXMLReader.__init__: ' + str(e)) 
@@ -45,6 +55,242 @@ class WeaselXMLReader:
            self.fullFilePath)
 
 
+    def _buildIndex(self):
+        """
+        Builds the lookup dictionaries of the XML tree in one pass.
+        """
+        self._elements = {}
+        self._keyCounts = {}
+        self._images = {}
+        self._parents = {}
+        self._positions = {}
+        self._positionCounter = count()
+        self._checked = {'subject': set(), 'study': set(), 'series': set(), 'image': set()}
+        for subject in self.root.findall('subject'):
+            self._indexElement(subject, self.root)
+
+
+    def _elementKey(self, element):
+        """
+        Returns the key of a subject, study or series element, eg. (subjectID, studyID) for a study.
+        """
+        key = []
+        while element is not self.root:
+            key.append(element.attrib['id'])
+            element = self._parents[element]
+        return tuple(reversed(key))
+
+
+    def _documentOrder(self, element):
+        """
+        Returns a sort key that orders elements as in the XML tree.
+
+        Elements are only ever appended to their parent, so the order in which they
+        were indexed is their order among their siblings.
+        """
+        order = []
+        while element is not self.root:
+            order.append(self._positions[element])
+            element = self._parents[element]
+        return tuple(reversed(order))
+
+
+    def _indexElement(self, element, parent):
+        """
+        Adds an element and all its descendants to the lookup dictionaries.
+        Returns the keys that are now shared by more than one element.
+        """
+        self._parents[element] = parent
+        if element not in self._positions:
+            self._positions[element] = next(self._positionCounter)
+        if element.get('checked') == 'True':
+            self._checked[element.tag].add(element)
+        if element.tag == 'image':
+            self._images.setdefault(element.find('name').text, []).append(element)
+            return []
+        key = self._elementKey(element)
+        self._elements.setdefault(key, element)
+        self._keyCounts[key] = self._keyCounts.get(key, 0) + 1
+        duplicateKeys = [key] if self._keyCounts[key] > 1 else []
+        for child in element:
+            if child.tag in ('study', 'series', 'image'):
+                duplicateKeys += self._indexElement(child, element)
+        return duplicateKeys
+
+
+    def _unindexElement(self, element):
+        """
+        Removes an element and all its descendants from the lookup dictionaries.
+        Returns the keys that are still used by other elements.
+        """
+        descendants = [child for child in element.iter() if child.tag in ('subject', 'study', 'series', 'image')]
+        keys = {child: self._elementKey(child) for child in descendants if child.tag != 'image'}
+        duplicateKeys = []
+        for child in descendants:
+            if child.tag == 'image':
+                imageName = child.find('name').text
+                self._images[imageName].remove(child)
+                if not self._images[imageName]:
+                    del self._images[imageName]
+                continue
+            key = keys[child]
+            self._keyCounts[key] -= 1
+            if self._keyCounts[key] == 0:
+                del self._keyCounts[key]
+                del self._elements[key]
+            elif self._elements[key] is child:
+                duplicateKeys.append(key)
+        for child in descendants:
+            del self._parents[child]
+            self._checked[child.tag].discard(child)
+        return [key for key in set(duplicateKeys) if key in self._keyCounts]
+
+
+    def _searchElements(self, key):
+        """
+        Searches the XML tree for all the elements with the given key, in the order of the XML tree.
+        """
+        elements = [self.root]
+        for tag, elementID in zip(('subject', 'study', 'series'), key):
+            elements = [child for element in elements for child in element.findall(tag) if child.attrib['id'] == elementID]
+        return elements
+
+
+    def _findElements(self, key):
+        """
+        Returns all the elements with the given key, in the order of the XML tree.
+        The XML tree is only searched if the key is shared by several elements.
+        """
+        if self._keyCounts.get(key, 0) > 1:
+            return self._searchElements(key)
+        element = self._elements.get(key)
+        return [] if element is None else [element]
+
+
+    def _resolveKeys(self, keys):
+        """
+        Points each key shared by several elements to the first of them in the XML tree,
+        the element that find() would return.
+        """
+        for key in keys:
+            self._elements[key] = self._searchElements(key)[0]
+
+
+    def _newElement(self, parent, tag, attributes):
+        """
+        Creates a subject, study or series element in parent and adds it to the lookup dictionaries.
+        """
+        element = ET.SubElement(parent, tag, attributes)
+        self._resolveKeys(self._indexElement(element, parent))
+        return element
+
+
+    def _fileState(self, imageName):
+        """
+        Returns the size and modification time of the file imageName as the attributes recorded for its image,
+        which the folder rescan compares with the file to find out whether it has changed. Returns {} if the file can't be read.
+        """
+        signature = ReadDICOM_Image.fileSignature(imageName)
+        return {} if signature is None else {'size': str(signature[0]), 'mtime': str(signature[1])}
+
+
+    def _newImageElement(self, series, label, name, time, date):
+        """
+        Creates an image element in series and adds it to the lookup dictionaries.
+        The size and modification time of the file are recorded, so that the folder rescan doesn't read it again.
+        """
+        newImage = ET.SubElement(series, 'image', dict({'checked':'False'}, **self._fileState(name)))
+        #Add child nodes of the image element
+        ET.SubElement(newImage, 'label').text = label
+        ET.SubElement(newImage, 'name').text = name
+        ET.SubElement(newImage, 'time').text = time
+        ET.SubElement(newImage, 'date').text = date
+        self._indexElement(newImage, series)
+        return newImage
+
+
+    def _getOrCreateSeries(self, subjectID, studyID, seriesID, studyUID=None, seriesUID=None, typeID=None):
+        """
+        Returns the series element with the given IDs, creating it with its study and subject if they do not exist.
+        """
+        subject = self.getSubject(subjectID)
+        if subject is None:
+            subject = self._newElement(self.root, 'subject', {'id':subjectID, 'checked':'False'})
+        study = self.getStudy(subjectID, studyID)
+        if study is None:
+            newAttributes = {'id':studyID, 'checked':'False'}
+            if studyUID is not None: newAttributes['uid'] = studyUID
+            study = self._newElement(subject, 'study', newAttributes)
+        series = self.getSeries(subjectID, studyID, seriesID)
+        if series is None:
+            newAttributes = {'id':seriesID, 'checked':'False'}
+            if typeID is not None: newAttributes['typeID'] = typeID
+            if seriesUID is not None: newAttributes['uid'] = seriesUID
+            series = self._newElement(study, 'series', newAttributes)
+        return series
+
+
+    def _setImageFields(self, image, fields):
+        """
+        Sets the label, time or date of an image element from the dictionary fields, eg. {'label': '000001'}.
+        """
+        for field, value in fields.items():
+            image.find(field).text = value
+
+
+    def _removeElement(self, parent, element):
+        """
+        Removes element from parent and from the lookup dictionaries.
+        """
+        parent.remove(element)
+        self._resolveKeys(self._unindexElement(element))
+        for child in element.iter():
+            self._positions.pop(child, None)
+
+
+    def _setElementID(self, element, newID):
+        """
+        Changes the id attribute of a subject, study or series element and updates the lookup dictionaries.
+        """
+        parent = self._parents[element]
+        duplicateKeys = self._unindexElement(element)
+        element.attrib['id'] = newID
+        duplicateKeys += self._indexElement(element, parent)
+        self._resolveKeys(duplicateKeys)
+
+
+    def _getImage(self, series, imageName):
+        """
+        Returns the first image element with the file path imageName in the series element, or None.
+        """
+        images = [image for image in self._images.get(imageName, []) if self._parents[image] is series]
+        if len(images) > 1:
+            return min(images, key=self._documentOrder)
+        return images[0] if images else None
+
+
+    def _findImage(self, subjectID, studyID, seriesID, imageName):
+        """
+        Returns the first image element with the file path imageName in the series with the given IDs, or None.
+        """
+        for series in self._findElements((subjectID, studyID, seriesID)):
+            image = self._getImage(series, imageName)
+            if image is not None:
+                return image
+
+
+    def _getFirstImage(self, imageName):
+        """
+        Returns the first image element in the XML tree with the file path imageName, or None.
+        """
+        images = self._images.get(imageName)
+        if not images:
+            return None
+        elif len(images) == 1:
+            return images[0]
+        return min(images, key=self._documentOrder)
+
+
     def save(self):
         """
         Saves the contents of the XML tree in memory to a physical file.
@@ -55,19 +301,46 @@ class WeaselXMLReader:
             print('Error in WeaselXMLReader.saveXMLFile: ' + str(e)) 
             logger.error('Error in WeaselXMLReader.saveXMLFile: ' + str(e))
 
+
+    def close(self):
+        """
+        Releases the file when the reader is replaced. The XML tree is held in memory, so there is nothing to release.
+        """
+        pass
+
     
+    def setChecked(self, element, checked):
+        """
+        Sets the checked state of a subject, study, series or image element to True or False
+        and updates the set of checked elements.
+        """
+        element.set('checked', 'True' if checked else 'False')
+        if checked and element in self._parents:
+            self._checked[element.tag].add(element)
+        else:
+            self._checked[element.tag].discard(element)
+
+
+    def _checkedElements(self, tag, root=None):
+        """
+        Returns the checked elements with the given tag in the order of the XML tree.
+        If root is given, only the elements in root or below are returned.
+        """
+        elements = self._checked[tag]
+        if root is not None and root is not self.root:
+            elements = [element for element in elements if root in self.branch(element)]
+        return sorted(elements, key=self._documentOrder)
+
+
     def checkedImages(self, root=None):
         """
         Returns a list of images checked by the user.
         """
         list = []
-        if root is None:
-            root = self.root
-        for image in root.iter('image'):
-            if image.attrib['checked'] == 'True':
-                id = self.objectID(image)
-                dcm = Image(self.weasel, id[0], id[1], id[2], id[3])
-                list.append(dcm)
+        for image in self._checkedElements('image', root):
+            id = self.objectID(image)
+            dcm = Image(self.weasel, id[0], id[1], id[2], id[3])
+            list.append(dcm)
         return ImagesList(list)
 
 
@@ -76,14 +349,11 @@ class WeaselXMLReader:
         Returns a list of  series checked by the user.
         """
         list = []
-        if root is None:
-            root = self.root
-        for series in root.iter('series'):
-            if series.attrib['checked'] == 'True':
-                images = [image.find('name').text for image in series]
-                id = self.objectID(series)
-                dcm = Series(self.weasel, id[0], id[1], id[2], listPaths=images)
-                list.append(dcm)
+        for series in self._checkedElements('series', root):
+            images = [image.find('name').text for image in series]
+            id = self.objectID(series)
+            dcm = Series(self.weasel, id[0], id[1], id[2], listPaths=images)
+            list.append(dcm)
         return SeriesList(list)
 
 
@@ -92,13 +362,10 @@ class WeaselXMLReader:
         Returns a list of studies checked by the user.
         """
         list = []
-        if root is None:
-            root = self.root
-        for study in root.iter('study'):
-            if study.attrib['checked'] == 'True':
-                id = self.objectID(study)
-                dcm = Study(self.weasel, id[0], id[1])
-                list.append(dcm)
+        for study in self._checkedElements('study', root):
+            id = self.objectID(study)
+            dcm = Study(self.weasel, id[0], id[1])
+            list.append(dcm)
         return StudyList(list)
 
 
@@ -107,12 +374,10 @@ class WeaselXMLReader:
         Returns a list of  subjects checked by the user.
         """
         list = []
-        root = self.root
-        for subject in root.iter('subject'):
-            if subject.attrib['checked'] == 'True':
-                id = self.objectID(subject)
-                dcm = Subject(self.weasel, id[0])
-                list.append(dcm)
+        for subject in self._checkedElements('subject'):
+            id = self.objectID(subject)
+            dcm = Subject(self.weasel, id[0])
+            list.append(dcm)
         return SubjectList(list)
 
 
@@ -150,10 +415,8 @@ class WeaselXMLReader:
         try:
             #print("getImageList: studyID={}, seriesID={}".format(studyID, seriesID))
 
-            xPath = './/subject[@id='+ chr(34) + subjectID + chr(34) + \
-                    ']/study[@id=' + chr(34) + studyID + chr(34) + \
-                    ']/series[@id=' + chr(34) + seriesID + chr(34) + ']/image'        
-            return self.root.findall(xPath)
+            seriesList = self._findElements((subjectID, studyID, seriesID))
+            return [image for series in seriesList for image in series.findall('image')]
         except Exception as e:
             print('Error in WeaselXMLReader.getImageList: ' + str(e)) 
             logger.error('Error in WeaselXMLReader.getImageList: ' + str(e))
@@ -164,9 +427,7 @@ class WeaselXMLReader:
         Returns the subject with the ID, subjectID
         """
         try:
-            xPath = './/subject[@id=' + chr(34) + subjectID + chr(34) + ']'
-            #print(xPath)
-            return self.root.find(xPath)
+            return self._elements.get((subjectID,))
         except Exception as e:
             print('Error in WeaselXMLReader.getSubject: ' + str(e)) 
             logger.error('Error in WeaselXMLReader.getSubject: ' + str(e))
@@ -177,10 +438,7 @@ class WeaselXMLReader:
         Returns the study with the ID, studyID
         """
         try:
-            xPath = './/subject[@id=' + chr(34) + subjectID + chr(34) +  \
-                    ']/study[@id=' + chr(34) + studyID + chr(34) + ']'
-            #print(xPath)
-            return self.root.find(xPath)
+            return self._elements.get((subjectID, studyID))
         except Exception as e:
             print('Error in WeaselXMLReader.getStudy: ' + str(e)) 
             logger.error('Error in WeaselXMLReader.getStudy: ' + str(e))
@@ -191,11 +449,7 @@ class WeaselXMLReader:
         Returns the series with the ID, seriesID
         """
         try: 
-            xPath = './/subject[@id=' + chr(34) + subjectID + chr(34) + ']' \
-                    '/study[@id=' + chr(34) + studyID + chr(34) + ']' + \
-                    '/series[@id=' + chr(34) + seriesID + chr(34) + ']'
-            #print ("get series Xpath = {}".format(xPath))
-            return self.root.find(xPath)
+            return self._elements.get((subjectID, studyID, seriesID))
         except Exception as e:
             print('Error in WeaselXMLReader.getSeries: ' + str(e)) 
             logger.error('Error in WeaselXMLReader.getSeries_: ' + str(e))
@@ -221,11 +475,7 @@ class WeaselXMLReader:
             if imageName is None:
                 return "000000"
             else:
-                xPath = './/subject[@id=' + chr(34) + subjectID + chr(34) +  \
-                        ']/study[@id=' + chr(34) + studyID + chr(34) + \
-                        ']/series[@id=' + chr(34) + seriesID + chr(34)  + \
-                        ']/image[name=' + chr(34) + imageName + chr(34) +']/label'
-                return self.root.find(xPath).text
+                return self._findImage(subjectID, studyID, seriesID, imageName).find('label').text
         except Exception as e:
             print('Error in WeaselXMLReader.getImageLabel: ' + str(e)) 
             logger.error('Error in WeaselXMLReader.getImageLabel: ' + str(e))
@@ -252,11 +502,7 @@ class WeaselXMLReader:
                 now = datetime.now()
                 return now.strftime("%H:%M:%S")
             else:
-                xPath = './/subject[@id=' + chr(34) + subjectID + chr(34) +  \
-                        ']/study[@id=' + chr(34) + studyID + chr(34) + \
-                        ']/series[@id=' + chr(34) + seriesID + chr(34)  + \
-                        ']/image[name=' + chr(34) + imageName + chr(34) +']/time'
-                return self.root.find(xPath).text
+                return self._findImage(subjectID, studyID, seriesID, imageName).find('time').text
         except Exception as e:
             print('Error in WeaselXMLReader.getImageTime: ' + str(e)) 
             logger.error('Error in WeaselXMLReader.getImageTime: ' + str(e))
@@ -283,11 +529,7 @@ class WeaselXMLReader:
                 now = datetime.now()
                 return now.strftime("%d/%m/%Y") 
             else:
-                xPath = './/subject[@id=' + chr(34) + subjectID + chr(34) +  \
-                        ']/study[@id=' + chr(34) + studyID + chr(34) + \
-                        ']/series[@id=' + chr(34) + seriesID + chr(34)  + \
-                        ']/image[name=' + chr(34) + imageName + chr(34) +']/date'
-                return self.root.find(xPath).text   
+                return self._findImage(subjectID, studyID, seriesID, imageName).find('date').text   
         except Exception as e:
             print('Error in WeaselXMLReader.getImageDate: ' + str(e)) 
             logger.error('Error in WeaselXMLReader.getImageDate: ' + str(e))
@@ -308,12 +550,7 @@ class WeaselXMLReader:
         list of the image file paths
         """
         try:
-            xPath = './/subject[@id=' + chr(34) + subjectID + chr(34) +  \
-                    ']/study[@id=' + chr(34) + studyID + chr(34) + \
-                    ']/series[@id=' + chr(34) + seriesID + chr(34) + ']/image'
-            # print(xPath)
-            images = self.root.findall(xPath)
-            #print("images={}".format(images))
+            images = self._getImageList(subjectID, studyID, seriesID)
             imageList = [image.find('name').text for image in images]
             #print("length imageList={}".format(len(imageList)))
             return imageList
@@ -337,27 +574,43 @@ class WeaselXMLReader:
         seriesID - ID of the series the image belongs to
         """
         try:
-            xPathSubject = './/subject/study/series/image[name=' + chr(34) + imageName + chr(34) +']/../../..'
-            if self.root.find(xPathSubject):
-                subjectID = self.root.find(xPathSubject).attrib['id']
-            else:
-                subjectID = None
-            xPathStudy = './/subject/study/series/image[name=' + chr(34) + imageName + chr(34) +']/../..'
-            if self.root.find(xPathStudy):
-                studyID = self.root.find(xPathStudy).attrib['id']
-            else:
-                studyID = None
-            xPathSeries = './/subject/study/series/image[name=' + chr(34) + imageName + chr(34) +']/..'
-            if self.root.find(xPathSeries):
-                seriesID = self.root.find(xPathSeries).attrib['id']
-            else:
-                seriesID = None
-            return (subjectID, studyID, seriesID)
+            image = self._getFirstImage(imageName)
+            if image is None:
+                return (None, None, None)
+            series = self._parents[image]
+            study = self._parents[series]
+            subject = self._parents[study]
+            return (subject.attrib['id'], study.attrib['id'], series.attrib['id'])
         except Exception as e:
-            print('Error in WeaselXMLReader.getImageParentIDs: ' + str(e)) 
+            print('Error in WeaselXMLReader.getImageParentIDs: ' + str(e))
             logger.error('Error in WeaselXMLReader.getImageParentIDs: ' + str(e))
 
 
+    def getImagesParentIDs(self, imageList):
+        """
+        Returns the list of (subjectID, studyID, seriesID) of each image in imageList.
+        Images that are not in the XML file get (None, None, None).
+        """
+        try:
+            return [self.getImageParentIDs(imageName) for imageName in imageList]
+        except Exception as e:
+            print('Error in WeaselXMLReader.getImagesParentIDs: ' + str(e))
+            logger.error('Error in WeaselXMLReader.getImagesParentIDs: ' + str(e))
+
+
+    def getImageBranch(self, subjectID, studyID, seriesID, imageName):
+        """
+        Returns the list of elements from the root to the image with the file path imageName
+        in the series with the given IDs, ie. [root, subject, study, series, image], or None if there is no such image.
+        """
+        try:
+            image = self._findImage(subjectID, studyID, seriesID, imageName)
+            return None if image is None else self.branch(image)
+        except Exception as e:
+            print('Error in WeaselXMLReader.getImageBranch: ' + str(e))
+            logger.error('Error in WeaselXMLReader.getImageBranch: ' + str(e))
+
+
     def branch(self, elem):
         """
         Returns the parents of the current element.
@@ -365,20 +618,12 @@ class WeaselXMLReader:
         This function checks where in the XML hierarchy the element, elem, lies.
         Then it returns the IDs of its parent branches.
         """
-        if elem in self.root: # elem is a subject
-            return [self.root, elem]
-        else:
-            for subject in self.root:
-                if elem in subject: # elem is a study
-                    return [self.root, subject, elem]
-                else:
-                    for study in subject:
-                        if elem in study: # elem is a series
-                            return [self.root, subject, study, elem]
-                        else:
-                            for series in study:
-                                if elem in series: # elem is an image
-                                    return [self.root, subject, study, series, elem]
+        if elem not in self._parents:
+            return None
+        branch = [elem]
+        while branch[0] is not self.root:
+            branch.insert(0, self._parents[branch[0]])
+        return branch
 
 
     def objectID(self, elem):
@@ -402,7 +647,7 @@ class WeaselXMLReader:
             logger.info("WeaselXMLReader removeSubjectFromXMLFile called")
             subject = self.getSubject(subjectID)
             if subject:
-                self.root.remove(subject)
+                self._removeElement(self.root, subject)
             else:
                 print("Unable to remove subject {}".format(subjectID))
         except Exception as e:
@@ -424,7 +669,7 @@ class WeaselXMLReader:
             subject = self.getSubject(subjectID)
             study = self.getStudy(subjectID, studyID)
             if study and subject:
-                subject.remove(study)
+                self._removeElement(subject, study)
             else:
                 print("Unable to remove study {}".format(studyID))
         except AttributeError as e:
@@ -450,7 +695,7 @@ class WeaselXMLReader:
             study = self.getStudy(subjectID, studyID)
             series = self.getSeries(subjectID, studyID, seriesID)
             if study and series:
-                study.remove(series)
+                self._removeElement(study, series)
             else:
                 print("Unable to remove series {}".format(seriesID))
         except AttributeError as e:
@@ -473,12 +718,9 @@ class WeaselXMLReader:
         """
         try:
             series = self.getSeries(subjectID, studyID, seriesID)
-
-            if series:
-                for image in series:
-                    if image.find('name').text == imagePath:
-                        series.remove(image)
-                        break
+            image = None if series is None else self._getImage(series, imagePath)
+            if image is not None:
+                self._removeElement(series, image)
         except Exception as e:
             print('Error in WeaselXMLReader.removeOneImageFromSeries: ' + str(e)) 
             logger.error('Error in WeaselXMLReader.removeOneImageFromSeries: ' + str(e))
@@ -580,17 +822,63 @@ class WeaselXMLReader:
         suffix - series and image name suffix
         """
         try:
-            self.insertNewImageInXML(imageName, imageName, newSubjectID, newStudyID, newSeriesID, suffix)
-            images = self._getImageList(subjectID, studyID, seriesID)
-            if len(images) == 1:
-                self.removeOneSeriesFromStudy(subjectID, studyID, seriesID)
-            elif len(images) > 1:
-                self.removeOneImageFromSeries(subjectID, studyID, seriesID, imageName)
+            self.moveImagesInXMLFile(subjectID, studyID, seriesID, newSubjectID, newStudyID, newSeriesID, [imageName], suffix)
         except Exception as e:
-            print('Error in InterfaceDICOMXMLFile.moveImageInXMLFile: ' + str(e)) 
+            print('Error in InterfaceDICOMXMLFile.moveImageInXMLFile: ' + str(e))
             logger.error('Error in InterfaceDICOMXMLFile.moveImageInXMLFile: ' + str(e))
 
 
+    def moveImagesInXMLFile(self, subjectID, studyID, seriesID, newSubjectID, newStudyID, newSeriesID, imageList, suffix):
+        """
+        Moves a list of images from one series to the series with the given destination IDs, 
+        which is created with its study and subject if they do not exist.
+        The origin series is searched once and is removed if all its images are moved.
+
+        Input arguments
+        ***************
+        subjectID  - Origin subject ID of the images
+        studyID - Origin study ID of the images
+        seriesID - Origin series ID of the images
+        newSubjectID - Destination subject ID of the images
+        newStudyID - Destination study ID of the images
+        newSeriesID - Destination series ID of the images
+        imageList - list of file paths & names of the images
+        suffix - series and image name suffix
+        """
+        try:
+            if [subjectID, studyID, seriesID] == [newSubjectID, newStudyID, newSeriesID]:
+                return
+            series = self.getSeries(subjectID, studyID, seriesID)
+            if series is None:
+                return
+            imageNames = set(imageList)
+            movedImages = [image for image in series.findall('image') if image.find('name').text in imageNames]
+            if not movedImages:
+                return
+            newSeries = self.getSeries(newSubjectID, newStudyID, newSeriesID)
+            if newSeries is None:
+                dataset = ReadDICOM_Image.getDicomHeader(movedImages[0].find('name').text)
+                newSeries = self._getOrCreateSeries(newSubjectID, newStudyID, newSeriesID, studyUID=str(dataset.StudyInstanceUID), 
+                                                    seriesUID=str(dataset.SeriesInstanceUID), typeID=suffix)
+            # The images keep their label, time, date and attributes, such as the checked state,
+            # but the size and modification time are those of the file now, as recorded by _newImageElement
+            for image in movedImages:
+                newImage = self._newImageElement(newSeries, *[image.find(field).text for field in ('label', 'name', 'time', 'date')])
+                for key, value in image.attrib.items():
+                    if key == 'checked':
+                        self.setChecked(newImage, value == 'True')
+                    elif key not in ('size', 'mtime'):
+                        newImage.set(key, value)
+            if len(movedImages) == len(series.findall('image')):
+                self.removeOneSeriesFromStudy(subjectID, studyID, seriesID)
+            else:
+                for image in movedImages:
+                    self._removeElement(series, image)
+        except Exception as e:
+            print('Error in InterfaceDICOMXMLFile.moveImagesInXMLFile: ' + str(e))
+            logger.error('Error in InterfaceDICOMXMLFile.moveImagesInXMLFile: ' + str(e))
+
+
     def insertNewStudyInXMLFile(self, subjectID, newStudyID, suffix, seriesList=[], newSubjectName=None):
         """
         Creates a new study in the XML tree.
@@ -630,7 +918,7 @@ class WeaselXMLReader:
         try:
             logger.info("InterfaceDICOMXMLFile insertNewSeriesInXMLFile called")
             (subjectID, studyID, seriesID) = self.getImageParentIDs(origImageList[0])
-            dataset = ReadDICOM_Image.getDicomDataset(newImageList[0])
+            dataset = ReadDICOM_Image.getDicomHeader(newImageList[0])
             if newStudyName is not None: studyID = str(dataset.StudyDate) + "_" + str(dataset.StudyTime).split(".")[0] + "_" + newStudyName
             if newSubjectName is not None: subjectID = newSubjectName
             newSeriesID = self.getNewSeriesName(subjectID, studyID, dataset, suffix, newSeriesName=newSeriesName) # If developer sets seriesName
@@ -669,9 +957,9 @@ class WeaselXMLReader:
         Adds a  new subject to the XML tree and populates it with the studies 
         the list newStudiesList
         """
-        newSubject = ET.SubElement(self.root, 'subject', newAttributes)
+        newSubject = self._newElement(self.root, 'subject', newAttributes)
         for newStudy in newStudiesList:
-            dataset = ReadDICOM_Image.getDicomDataset(newStudy[0][0])
+            dataset = ReadDICOM_Image.getDicomHeader(newStudy[0][0])
             newStudyID = str(dataset.StudyDate) + "_" + str(dataset.StudyTime).split(".")[0] + "_" + str(dataset.StudyDescription)
             self.insertNewStudyinXML(newStudy, newSubjectID, newStudyID, '')
 
@@ -687,7 +975,7 @@ class WeaselXMLReader:
                 Each nested list is a set of image filenames belonging to same series.
         """
         try:
-            dataset = ReadDICOM_Image.getDicomDataset(newSeriesList[0][0])
+            dataset = ReadDICOM_Image.getDicomHeader(newSeriesList[0][0])
             currentSubject = self.getSubject(subjectID)
             newAttributes = {'id':newStudyID, 
                              'typeID':suffix,
@@ -696,9 +984,9 @@ class WeaselXMLReader:
 
             if currentSubject is not None:
                 #Add new study to subject to hold new series+images
-                newStudy = ET.SubElement(currentSubject, 'study', newAttributes)
+                newStudy = self._newElement(currentSubject, 'study', newAttributes)
                 for newSeries in newSeriesList:
-                    dataset = ReadDICOM_Image.getDicomDataset(newSeries[0])
+                    dataset = ReadDICOM_Image.getDicomHeader(newSeries[0])
                     newSeriesID = str(dataset.SeriesNumber) + "_" + str(dataset.SeriesDescription)
                     self.insertNewSeriesInXML(newSeries, newSeries, subjectID, newStudyID, newSeriesID, newSeriesID, suffix)
             else:
@@ -717,7 +1005,7 @@ class WeaselXMLReader:
         that have the same attributes as an existing series of images.
         """
         try:
-            dataset = ReadDICOM_Image.getDicomDataset(newImageList[0])
+            dataset = ReadDICOM_Image.getDicomHeader(newImageList[0])
             currentStudy = self.getStudy(subjectID, studyID)
             newAttributes = {'id':newSeriesID, 
                              'typeID':suffix,
@@ -726,29 +1014,19 @@ class WeaselXMLReader:
 
             if currentStudy is not None:
                 #Add new series to study to hold new images
-                newSeries = ET.SubElement(currentStudy, 'series', newAttributes)
+                newSeries = self._newElement(currentStudy, 'series', newAttributes)
                 #Get image date & time from original image
+                imageTime = self._getImageTime(subjectID, studyID, seriesID)
+                imageDate = self._getImageDate(subjectID, studyID, seriesID)
+                originalParentIDs = self.getImagesParentIDs(origImageList[:len(newImageList)])
                 for index, imageNewName in enumerate(newImageList):
-                    subjectID_Original, studyID_Original, seriesID_Original = self.getImageParentIDs(origImageList[index])
+                    subjectID_Original, studyID_Original, seriesID_Original = originalParentIDs[index]
                     if subjectID_Original is None or studyID_Original is None or seriesID_Original is None:
                         imageLabel = str(index + 1).zfill(6) # + suffix
                     else:
                         imageLabel = str(ReadDICOM_Image.getImageTagValue(newImageList[index], 'InstanceNumber')).zfill(6)
                         #imageLabel = self.getImageLabel(subjectID_Original, studyID_Original, seriesID_Original, origImageList[index])
-                    imageTime = self._getImageTime(subjectID, studyID, seriesID)
-                    imageDate = self._getImageDate(subjectID, studyID, seriesID)
-                    newAttributes = {'checked':'False'}
-                    newImage = ET.SubElement(newSeries,'image', newAttributes)
-                    #Add child nodes of the image element
-                    labelNewImage = ET.SubElement(newImage, 'label')
-                    #labelNewImage.text = str(index + 1).zfill(6)
-                    labelNewImage.text = imageLabel # + suffix
-                    nameNewImage = ET.SubElement(newImage, 'name')
-                    nameNewImage.text = imageNewName
-                    timeNewImage = ET.SubElement(newImage, 'time')
-                    timeNewImage.text = imageTime
-                    dateNewImage = ET.SubElement(newImage, 'date')
-                    dateNewImage.text = imageDate
+                    self._newImageElement(newSeries, imageLabel, imageNewName, imageTime, imageDate)
             else:
                 self.insertNewStudyinXML([newImageList], subjectID, studyID, suffix)
                 #self.insertNewStudyinXML([[]], subjectID, studyID, '')
@@ -764,7 +1042,7 @@ class WeaselXMLReader:
         This function inserts a new image in the XML tree.
         """
         try:
-            dataset = ReadDICOM_Image.getDicomDataset(newImageFileName)
+            dataset = ReadDICOM_Image.getDicomHeader(newImageFileName)
             if newSeriesName:
                 newSeriesID = str(dataset.SeriesNumber) + "_" + newSeriesName
             else:
@@ -815,44 +1093,54 @@ class WeaselXMLReader:
                                  'checked':'False'}
 
                 #Add new series to study to hold new images
-                newSeries = ET.SubElement(currentStudy, 'series', newAttributes)     
-                #print("image time {}, date {}".format(imageTime, imageDate))
+                newSeries = self._newElement(currentStudy, 'series', newAttributes)
                 #Now add image element
-                newAttributes = {'checked':'False'}
-                newImage = ET.SubElement(newSeries, 'image', newAttributes)
-                #Add child nodes of the image element
-                labelNewImage = ET.SubElement(newImage, 'label')
-                labelNewImage.text = imageLabel # + suffix
-                #labelNewImage.text = "000001"
-                nameNewImage = ET.SubElement(newImage, 'name')
-                nameNewImage.text = newImageFileName
-                timeNewImage = ET.SubElement(newImage, 'time')
-                timeNewImage.text = imageTime
-                dateNewImage = ET.SubElement(newImage, 'date')
-                dateNewImage.text = imageDate
+                self._newImageElement(newSeries, imageLabel, newImageFileName, imageTime, imageDate)
                 return newSeriesID
             else:
                 #A series already exists to hold new images from
                 #the current parent series
-                newAttributes = {'checked':'False'}
-                newImage = ET.SubElement(series, 'image', newAttributes)
-                #Add child nodes of the image element
-                labelNewImage = ET.SubElement(newImage, 'label')
-                #imageLabel = self.getImageLabel(subjectID, studyID, seriesID, imageName)
-                labelNewImage.text = imageLabel # + suffix
-                #labelNewImage.text = str(len(series)).zfill(6)
-                nameNewImage = ET.SubElement(newImage, 'name')
-                nameNewImage.text = newImageFileName
-                timeNewImage = ET.SubElement(newImage, 'time')
-                timeNewImage.text = imageTime
-                dateNewImage = ET.SubElement(newImage, 'date')
-                dateNewImage.text = imageDate
+                self._newImageElement(series, imageLabel, newImageFileName, imageTime, imageDate)
                 return series.attrib['id']
         except Exception as e:
             print('Error in WeaselXMLReader.insertNewImageInXML: ' + str(e)) 
             logger.error('Error in WeaselXMLReader.insertNewImageInXML: ' + str(e))
 
 
+    def updateImageInXML(self, subjectID, studyID, seriesID, imageName, label, time, date,
+                         studyUID=None, seriesUID=None, attributes=None):
+        """
+        Adds an image read from the DICOM folder to the XML tree, or updates it if it is already there.
+
+        If the image is already in the series with the given IDs, its label, time, date and attributes
+        are updated in place, so it keeps its position and checked state. Otherwise it is removed and added 
+        to the series, which is created with its study and subject if they do not exist, and keeps its checked state.
+        Returns the image element.
+        """
+        try:
+            if attributes is None: attributes = {}
+            checked = False
+            image = self._getFirstImage(imageName)
+            if image is not None:
+                if self.objectID(image)[:3] == [subjectID, studyID, seriesID]:
+                    self._setImageFields(image, {'label': label, 'time': time, 'date': date})
+                    for key, value in attributes.items():
+                        image.set(key, value)
+                    return image
+                checked = image.get('checked') == 'True'
+                self.removeImageFromXMLFile(imageName)
+            series = self._getOrCreateSeries(subjectID, studyID, seriesID, studyUID=studyUID, seriesUID=seriesUID)
+            image = self._newImageElement(series, label, imageName, time, date)
+            for key, value in attributes.items():
+                image.set(key, value)
+            if checked:
+                self.setChecked(image, True)
+            return image
+        except Exception as e:
+            print('Error in WeaselXMLReader.updateImageInXML: ' + str(e))
+            logger.error('Error in WeaselXMLReader.updateImageInXML: ' + str(e))
+
+
     def renameSeriesinXMLFile(self, imageList, series_id=None, series_name=None):
         """Renames a whole series in the DICOM XML file"""
         try:
@@ -867,7 +1155,7 @@ class WeaselXMLReader:
                 except:
                     newName = str(ReadDICOM_Image.getDicomDataset(imageList[0]).ProtocolName) if series_name is None else str(series_name)
             xmlSeriesName = seriesNumber + "_" + newName
-            self.getSeries(subjectID, studyID, seriesID).attrib['id'] = xmlSeriesName
+            self._setElementID(self.getSeries(subjectID, studyID, seriesID), xmlSeriesName)
         except Exception as e:
             print('Error in InterfaceDICOMXMLFile removeOneSeriesFromStudy: ' + str(e))
             logger.error('Error in InterfaceDICOMXMLFile removeOneSeriesFromStudy: ' + str(e))
@@ -12,14 +12,31 @@ import re
 import datetime
 import numpy as np
 from pydicom import Dataset, DataElement, dcmread
+from pydicom.tag import Tag
 import xml.etree.ElementTree as ET
 from xml.dom import minidom
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from PyQt5.QtWidgets import (QApplication, QFileDialog, QMessageBox)
 
 import logging
 logger = logging.getLogger(__name__)
 
+# Tags read from each file when a folder is scanned, resolved once rather than for every file
+SCAN_TAGS = [Tag(keyword) for keyword in ['InstanceNumber', 'SOPInstanceUID', 'PixelData', 'FloatPixelData', 'DoubleFloatPixelData', 'AcquisitionTime',
+             'AcquisitionDate', 'SeriesTime', 'SeriesDate', 'PatientName', 'PatientID', 'StudyDate', 'StudyTime', 
+             'SeriesDescription', 'StudyDescription', 'SequenceName', 'ProtocolName', 'SeriesNumber', 'PerFrameFunctionalGroupsSequence',
+             'StudyInstanceUID', 'SeriesInstanceUID']]
+PIXEL_DATA_TAGS = ['PixelData', 'FloatPixelData', 'DoubleFloatPixelData']
+# Values longer than this (in bytes), such as the pixel data, are not read when a folder is scanned
+HEADER_DEFER_SIZE = 1024
+# Number of files whose headers are read by each task of the folder scan
+SCAN_CHUNK_SIZE = 64
+# Number of threads or processes reading headers during the folder scan, unless another number is given.
+# The headers are read serially by default: on a single core the thread pool was slower than the serial
+# read (see benchmarks/benchmark_scan.py), so a pool is only used when asked for
+SCAN_WORKERS = 1
+
 
 def get_files_info(scan_directory):
     """This method returns the number of files and subfolders in a folder. It doesn't mean that they are all DICOM.
@@ -76,29 +93,88 @@ def scan_tree(scan_directory):
             yield entry
 
 
-def get_scan_data(scan_directory, progBarMsg, self):
+def get_file_state(filepath):
+    """This method returns the size and modification time of a file as strings, 
+        as they are recorded in the XML file to detect the files that have changed since.
+    """
+    stat = os.stat(filepath)
+    return str(stat.st_size), str(stat.st_mtime_ns)
+
+
+def read_headers(file_list, tags=SCAN_TAGS):
+    """This method returns the headers of the files in file_list, with None for the files that are not DICOM.
+        Only the given tags are read and the pixel data is skipped, so its presence can be checked
+        with `in` but its value is not loaded.
+    """
+    list_headers = list()
+    for filepath in file_list:
+        try:
+            list_headers.append(dcmread(filepath, defer_size=HEADER_DEFER_SIZE, specific_tags=tags)) # Check the force=True flag once in a while
+        except:
+            list_headers.append(None)
+    return list_headers
+
+
+def scan_headers(file_list, workers=None, processPool=False, chunkSize=SCAN_CHUNK_SIZE):
+    """This generator yields the header of each file in file_list in order, or None if the file is not DICOM.
+        If workers is more than 1, the headers are read in chunks of chunkSize files by a pool of `workers` threads, 
+        or of processes if processPool is True. Only a few chunks are read ahead of the caller, so the results 
+        stream back as soon as they are ready. Otherwise the headers are read serially (SCAN_WORKERS).
+    """
+    workers = workers or SCAN_WORKERS
+    if workers == 1 or len(file_list) <= chunkSize:
+        yield from read_headers(file_list)
+        return
+    Executor = ProcessPoolExecutor if processPool else ThreadPoolExecutor
+    with Executor(max_workers=workers) as executor:
+        pending = deque()
+        for start in range(0, len(file_list), chunkSize):
+            pending.append(executor.submit(read_headers, file_list[start:start+chunkSize]))
+            if len(pending) > 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def get_scan_data(scan_directory, progBarMsg, self, workers=None, processPool=False):
     """This method opens all DICOM files in the provided path recursively and saves 
         each file individually as a variable into a list/array.
+        The headers are read serially unless workers is given, see `scan_headers`.
     """
     try:
         logger.info("WriteXMLfromDICOM.get_scan_data called")
-        list_paths = list()
-        list_dicom = list()
         file_list = [item.path for item in scan_tree(scan_directory) if item.is_file()]
         file_list.sort(key=natural_keys)
+        list_dicom, list_paths = read_scan_data(file_list, progBarMsg, self, workers=workers, processPool=processPool)
+        if list_dicom is not None and len(list_dicom) == 0:
+            self.message(msg="No DICOM files present in the selected folder")
+            raise FileNotFoundError('No DICOM files present in the selected folder')
+        return list_dicom, list_paths
+    except Exception as e:
+        print('Error in WriteXMLfromDICOM.get_scan_data: ' + str(e))
+        logger.exception('Error in function WriteXMLfromDICOM.get_scan_data: ' + str(e))
+
+
+def read_scan_data(file_list, progBarMsg, self, workers=None, processPool=False):
+    """This method opens the DICOM files in file_list and returns the headers and paths of those
+        that hold an image, converting multiframe files to single frame files first.
+        Files that are not DICOM are skipped. The headers are read without loading the pixel data, serially
+        or on `workers` threads (or processes if processPool is True), see `scan_headers`.
+    """
+    try:
+        logger.info("WriteXMLfromDICOM.read_scan_data called")
+        list_paths = list()
+        list_dicom = list()
         multiframe_files_list = list()
         self.progress_bar(max=len(file_list), index=0, msg=progBarMsg, title="Loading DICOM")
         fileCounter = 0
         multiframeCounter = 0
-        for filepath in file_list:
+        for filepath, dataset in zip(file_list, scan_headers(file_list, workers=workers, processPool=processPool)):
             try:
                 fileCounter += 1
                 self.update_progress_bar(index=fileCounter)
-                list_tags = ['InstanceNumber', 'SOPInstanceUID', 'PixelData', 'FloatPixelData', 'DoubleFloatPixelData', 'AcquisitionTime',
-                             'AcquisitionDate', 'SeriesTime', 'SeriesDate', 'PatientName', 'PatientID', 'StudyDate', 'StudyTime', 
-                             'SeriesDescription', 'StudyDescription', 'SequenceName', 'ProtocolName', 'SeriesNumber', 'PerFrameFunctionalGroupsSequence',
-                             'StudyInstanceUID', 'SeriesInstanceUID']
-                dataset = dcmread(filepath, specific_tags=list_tags) # Check the force=True flag once in a while
+                if dataset is None:
+                    continue
                 if not hasattr(dataset, 'SeriesDescription') and not hasattr(dataset, 'StudyDescription'):
                     elemSeries = DataElement(0x0008103E, 'LO', 'No Series Description')
                     elemStudy = DataElement(0x00081030, 'LO', 'No Study Description')
@@ -121,7 +197,7 @@ def get_scan_data(scan_directory, progBarMsg, self):
                         ds.save_as(filepath)
                     dataset.StudyDescription = 'No Study Description'
                 # If Multiframe, use dcm4che to split into single-frame
-                if hasattr(dataset, 'PerFrameFunctionalGroupsSequence'):
+                if 'PerFrameFunctionalGroupsSequence' in dataset:
                     multiframeCounter += 1
                     if multiframeCounter == 1:
                         buttonReply = QMessageBox.question(self, "Multiframe DICOM files found",
@@ -176,7 +252,7 @@ def get_scan_data(scan_directory, progBarMsg, self):
                               'The DICOM file ' + filepath + ' was not deleted.')
                     continue
                 if (hasattr(dataset, 'InstanceNumber') and hasattr(dataset, 'SOPInstanceUID') and 
-                    any(hasattr(dataset, attr) for attr in ['PixelData', 'FloatPixelData', 'DoubleFloatPixelData'])
+                    any(attr in dataset for attr in PIXEL_DATA_TAGS)
                     and ('DIRFILE' not in filepath) and ('DICOMDIR' not in filepath)):
                     list_paths.extend([filepath])
                     list_dicom.extend([dataset])
@@ -195,7 +271,7 @@ def get_scan_data(scan_directory, progBarMsg, self):
                     list_tags = ['InstanceNumber', 'SOPInstanceUID', 'PixelData', 'FloatPixelData', 'DoubleFloatPixelData', 'SliceLocation', (0x2001, 0x100a),
                                  'AcquisitionTime', 'AcquisitionDate', 'SeriesTime', 'SeriesDate', 'PatientName', 'PatientID', 'StudyDate', 'StudyTime', 
                                  'SeriesDescription', 'StudyDescription', 'SequenceName', 'ProtocolName', 'SeriesNumber', 'StudyInstanceUID', 'SeriesInstanceUID']
-                    dataset = dcmread(singleframe, specific_tags=list_tags) # Check the force=True flag once in a while
+                    dataset = read_headers([singleframe], tags=list_tags)[0]
                     # The multiframe converter stores SliceLocation in tag (0x2001, 0x100a), so this step is to store it in SliceLocation.
                     dicomTag = (0x2001, 0x100a)
                     sliceValue = dataset[dicomTag].value
@@ -206,21 +282,17 @@ def get_scan_data(scan_directory, progBarMsg, self):
                             ds.save_as(singleframe)
                     dataset.SliceLocation = sliceValue
                     if (hasattr(dataset, 'InstanceNumber') and hasattr(dataset, 'SOPInstanceUID') and 
-                        any(hasattr(dataset, attr) for attr in ['PixelData', 'FloatPixelData', 'DoubleFloatPixelData'])
+                        any(attr in dataset for attr in PIXEL_DATA_TAGS)
                         and ('DIRFILE' not in singleframe) and ('DICOMDIR' not in singleframe)):
                         list_paths.extend([singleframe])
                         list_dicom.extend([dataset])
                 except:
                     continue
             self.close_progress_bar()
-        if len(list_dicom) == 0:
-            self.message(msg="No DICOM files present in the selected folder")
-            raise FileNotFoundError('No DICOM files present in the selected folder')
-
         return list_dicom, list_paths
     except Exception as e:
-        print('Error in WriteXMLfromDICOM.get_scan_data: ' + str(e))
-        logger.exception('Error in function WriteXMLfromDICOM.get_scan_data: ' + str(e))
+        print('Error in WriteXMLfromDICOM.read_scan_data: ' + str(e))
+        logger.exception('Error in function WriteXMLfromDICOM.read_scan_data: ' + str(e))
 
 
 def get_study_series(dicom):
@@ -261,6 +333,35 @@ def build_dictionary(list_dicom):
         logger.exception('Error in WriteXMLfromDICOM.build_dictionary: ' + str(e))
 
 
+def get_image_time_date(dicomfile):
+    """This method returns the time and date of a single DICOM file as they are written in the XML file.
+    """
+    # They consider multiple/eventual formats
+    if len(dicomfile.dir("AcquisitionTime"))>0:
+        try:
+            time = datetime.datetime.strptime(dicomfile.AcquisitionTime, '%H%M%S').strftime('%H:%M')
+        except:
+            time = datetime.datetime.strptime(dicomfile.AcquisitionTime, '%H%M%S.%f').strftime('%H:%M')
+        try:
+            date = datetime.datetime.strptime(dicomfile.AcquisitionDate, '%Y%m%d').strftime('%d/%m/%Y')
+        except:
+            date = datetime.datetime.strptime(dicomfile.StudyDate, '%Y%m%d').strftime('%d/%m/%Y')
+    elif len(dicomfile.dir("SeriesTime"))>0:
+        # It means it's Enhanced MRI
+        try:
+            time = datetime.datetime.strptime(dicomfile.SeriesTime, '%H%M%S').strftime('%H:%M')
+        except:
+            time = datetime.datetime.strptime(dicomfile.SeriesTime, '%H%M%S.%f').strftime('%H:%M')
+        try:
+            date = datetime.datetime.strptime(dicomfile.SeriesDate, '%Y%m%d').strftime('%d/%m/%Y')
+        except:
+            date = datetime.datetime.strptime(dicomfile.StudyDate, '%Y%m%d').strftime('%d/%m/%Y')
+    else:
+        time = datetime.datetime.strptime('000000', '%H%M%S').strftime('%H:%M')
+        date = datetime.datetime.strptime('20000101', '%Y%m%d').strftime('%d/%m/%Y')
+    return time, date
+
+
 def open_dicom_to_xml(xml_dict, list_dicom, list_paths):
     """This method opens all DICOM files in the given list and saves 
         information from each file individually to an XML tree/structure.
@@ -302,30 +403,11 @@ def open_dicom_to_xml(xml_dict, list_dicom, list_paths):
             label.text = str(dicomfile.InstanceNumber).zfill(6)
             #label.text = str(len(list(image_root.iter('image')))).zfill(6)
             name.text = os.path.normpath(list_paths[index])
-            
-            # The next lines save the time and date to XML - They consider multiple/eventual formats
-            if len(dicomfile.dir("AcquisitionTime"))>0:
-                try:
-                    time.text = datetime.datetime.strptime(dicomfile.AcquisitionTime, '%H%M%S').strftime('%H:%M')
-                except:
-                    time.text = datetime.datetime.strptime(dicomfile.AcquisitionTime, '%H%M%S.%f').strftime('%H:%M')
-                try:
-                    date.text = datetime.datetime.strptime(dicomfile.AcquisitionDate, '%Y%m%d').strftime('%d/%m/%Y')
-                except:
-                    date.text = datetime.datetime.strptime(dicomfile.StudyDate, '%Y%m%d').strftime('%d/%m/%Y')
-            elif len(dicomfile.dir("SeriesTime"))>0:
-                # It means it's Enhanced MRI
-                try:
-                    time.text = datetime.datetime.strptime(dicomfile.SeriesTime, '%H%M%S').strftime('%H:%M')
-                except:
-                    time.text = datetime.datetime.strptime(dicomfile.SeriesTime, '%H%M%S.%f').strftime('%H:%M')
-                try:
-                    date.text = datetime.datetime.strptime(dicomfile.SeriesDate, '%Y%m%d').strftime('%d/%m/%Y')
-                except:
-                    date.text = datetime.datetime.strptime(dicomfile.StudyDate, '%Y%m%d').strftime('%d/%m/%Y')
-            else:
-                time.text = datetime.datetime.strptime('000000', '%H%M%S').strftime('%H:%M')
-                date.text = datetime.datetime.strptime('20000101', '%Y%m%d').strftime('%d/%m/%Y')
+            time.text, date.text = get_image_time_date(dicomfile)
+            # The size and modification time of the file are used to find the files that have changed when the folder is scanned again
+            size, mtime = get_file_state(list_paths[index])
+            image_element.set('size', size)
+            image_element.set('mtime', mtime)
         return DICOM_XML_object
     except Exception as e:
         print('Error in WriteXMLfromDICOM.open_dicom_to_xml: ' + str(e))
@@ -418,4 +500,52 @@ def makeDICOM_XML_File(self, scan_directory):
         return fullFilePath
     except Exception as e:
         print('Error in function WriteXMLfromDICOM.makeDICOM_XML_File: ' + str(e))
-        logger.exception('Error in function WriteXMLfromDICOM.makeDICOM_XML_File: ' + str(e))
\ No newline at end of file
+        logger.exception('Error in function WriteXMLfromDICOM.makeDICOM_XML_File: ' + str(e))
+
+def updateDICOM_XML_File(self, scan_directory, objXMLReader):
+    """Brings the description of the scan folder, scan_directory, held by objXMLReader up to date 
+    with the files in the folder. Returns the number of images added, changed or removed.
+
+    The size and modification time of each file are compared with those recorded for its image,
+    so only the headers of the files that are new or have changed are read. 
+    The images of the files that no longer exist are removed.
+    The XML file of the folder and its SQLite catalog are left out. Other files that are not DICOM images
+    are not recorded, so they are checked again at each update."""
+    try:
+        logger.info("WriteXMLfromDICOM.updateDICOM_XML_File called.")
+        recorded = {}
+        for image in objXMLReader.root.iter('image'):
+            recorded.setdefault(image.find('name').text, (image.get('size'), image.get('mtime')))
+        # The XML file of the folder, and the SQLite catalog that replaces it with its journal files, are not images
+        catalog = os.path.splitext(os.path.normpath(objXMLReader.file))[0]
+        catalog_files = {catalog + extension for extension in ('.xml', '.sqlite', '.sqlite-wal', '.sqlite-shm', '.sqlite-journal')}
+        current = {}
+        for entry in scan_tree(scan_directory):
+            if entry.is_file() and os.path.normpath(entry.path) not in catalog_files:
+                stat = entry.stat()
+                current[os.path.normpath(entry.path)] = (str(stat.st_size), str(stat.st_mtime_ns))
+        removed = [filepath for filepath in recorded if filepath not in current]
+        file_list = [filepath for filepath, state in current.items() if recorded.get(filepath) != state]
+        file_list.sort(key=natural_keys)
+        scans, paths = [], []
+        if file_list:
+            scans, paths = read_scan_data(file_list, "Reading {} new or changed files".format(len(file_list)), self)
+            if scans is None: scans, paths = [], []
+        paths = [os.path.normpath(filepath) for filepath in paths]
+        # Changed files that are no longer DICOM images
+        removed += [filepath for filepath in set(file_list).difference(paths) if filepath in recorded]
+        for dicomfile, filepath in zip(scans, paths):
+            subject, study, sequence, series_number, study_uid, series_uid = get_study_series(dicomfile)
+            time, date = get_image_time_date(dicomfile)
+            size, mtime = get_file_state(filepath)
+            objXMLReader.updateImageInXML(subject, study, series_number + "_" + sequence, filepath, 
+                str(dicomfile.InstanceNumber).zfill(6), time, date, studyUID=study_uid, seriesUID=series_uid,
+                attributes={'size': size, 'mtime': mtime})
+        if removed:
+            objXMLReader.removeMultipleImagesFromXMLFile(removed)
+        logger.info("WriteXMLfromDICOM.updateDICOM_XML_File updated {} and removed {} images."
+                    .format(len(scans), len(removed)))
+        return len(scans) + len(removed)
+    except Exception as e:
+        print('Error in function WriteXMLfromDICOM.updateDICOM_XML_File: ' + str(e))
+        logger.exception('Error in function WriteXMLfromDICOM.updateDICOM_XML_File: ' + str(e))
@@ -56,3 +56,17 @@ class XMLConfigReader:
         except Exception as e:
             print('Error in XMLConfigReader.getWeaselDataFolder: ' + str(e)) 
             logger.exception('Error in XMLConfigReader.getWeaselDataFolder: ' + str(e))
+
+
+    def getCatalogFormat(self):
+        """This method gets the format of the DICOM folder catalogs, 'xml' or 'sqlite', in the `<catalog_format>` field.
+        It is 'xml' if the field is missing or empty."""
+        try:
+            catalog = self.root.find('./catalog_format')
+            if catalog is None or not catalog.text:
+                return 'xml'
+            else:
+                return catalog.text.strip().lower()
+        except Exception as e:
+            print('Error in XMLConfigReader.getCatalogFormat: ' + str(e)) 
+            logger.exception('Error in XMLConfigReader.getCatalogFormat: ' + str(e))
@@ -19,17 +19,66 @@ import datetime
 import numpy as np
 import random
 import pydicom
-import nibabel as nib
-import pandas as pd
 import copy
-from ast import literal_eval # Convert strings to their actual content. Eg. "[a, b]" becomes the actual list [a, b]
 from DICOM.DeveloperTools import (PixelArrayDICOMTools, GenericDICOMTools)
 import DICOM.ReadDICOM_Image as ReadDICOM_Image
 import DICOM.SaveDICOM_Image as SaveDICOM_Image
+import DICOM.ExportDICOM_Image as ExportDICOM_Image
 
 import logging
 logger = logging.getLogger(__name__)
 
+
+def _uidFromXML(objWeasel, subjectID, studyID, seriesID=None):
+    """Returns the 'uid' attribute stored in the XML element of the given study or series, or None if not available."""
+    try:
+        if seriesID is None:
+            element = objWeasel.objXMLReader.getStudy(subjectID, studyID)
+        else:
+            element = objWeasel.objXMLReader.getSeries(subjectID, studyID, seriesID)
+        if element is not None:
+            return element.attrib.get('uid')
+    except (AttributeError, KeyError) as e:
+        logger.exception('Error in Classes._uidFromXML: ' + str(e))
+    return None
+
+
+# DICOM tags that define the position of an image in the XML tree (subject, study and series IDs)
+HIERARCHY_TAGS = ('PatientID', 'StudyDate', 'StudyTime', 'StudyDescription', 'SeriesNumber', 'SeriesDescription')
+
+
+def _hierarchyValues(dataset):
+    """Returns a dictionary with the values of the HIERARCHY_TAGS in the DICOM dataset."""
+    return {tag: getattr(dataset, tag, None) for tag in HIERARCHY_TAGS}
+
+
+def _newParentIDs(oldValues, newValues, subjectID, studyID, seriesID):
+    """Returns the subject, study and series IDs of an image after the HIERARCHY_TAGS change from oldValues to newValues,
+        and True if any of these IDs changed.
+    """
+    changeXML = False
+    if oldValues['SeriesDescription'] != newValues['SeriesDescription'] or oldValues['SeriesNumber'] != newValues['SeriesNumber']:
+        changeXML = True
+        seriesID = str(newValues['SeriesNumber']) + "_" + str(newValues['SeriesDescription'])
+    if oldValues['StudyDate'] != newValues['StudyDate'] or oldValues['StudyTime'] != newValues['StudyTime'] or oldValues['StudyDescription'] != newValues['StudyDescription']:
+        changeXML = True
+        studyID = str(newValues['StudyDate']) + "_" + str(newValues['StudyTime']).split(".")[0] + "_" + str(newValues['StudyDescription'])
+    if oldValues['PatientID'] != newValues['PatientID']:
+        changeXML = True
+        subjectID = str(newValues['PatientID'])
+    return subjectID, studyID, seriesID, changeXML
+
+
+def _editedHierarchyTags(tagValues):
+    """Returns the HIERARCHY_TAGS that are changed by the dictionary tagValues ({dicomTag: newValue, ...})."""
+    editedTags = set()
+    for tag in tagValues:
+        keyword = tag if isinstance(tag, str) else pydicom.datadict.keyword_for_tag(pydicom.tag.Tag(tag))
+        if keyword in HIERARCHY_TAGS:
+            editedTags.add(keyword)
+    return editedTags
+
+
 class ListOfDicomObjects(list):
     """
     A superclass for managing Lists of Subjects, Studies, Series or Images. 
@@ -77,6 +126,44 @@ class ImagesList(ListOfDicomObjects):
         for image in self:
             copy.append(image.copy())
         return ImagesList(copy)
+
+    def _exportList(self, directory=None):
+        """
+        Returns the list of tuples ([image path], file path without extension) used to export the images of the list.
+        """
+        exportFiles = {}
+        for image in self:
+            folder = os.path.dirname(image.path) if directory is None else directory
+            # As when exporting one image at a time, the last image of a series overwrites the previous ones
+            exportFiles[os.path.join(folder, image.seriesID)] = [image.path]
+        return [(imagePathList, filePath) for filePath, imagePathList in exportFiles.items()]
+
+    def export_as_nifti(self, directory=None, progress_bar=True):
+        """
+        Saves each image of the list as a .nii.gz file named after its series. The files are written concurrently.
+        Returns the list of files that could not be written.
+        """
+        if len(self) == 0: return []
+        exportList = [(imagePathList, filePath + '.nii.gz') for imagePathList, filePath in self._exportList(directory)]
+        return ExportDICOM_Image.exportNIfTIFiles(exportList, objWeasel=self[0].objWeasel if progress_bar else None)
+
+    def export_as_csv(self, directory=None, columnHeaders=None, compressed=False, progress_bar=True):
+        """
+        Saves each image of the list as a .csv (or .csv.gz if compressed) file named after its series.
+        Returns the list of files (without extension) that could not be written.
+        """
+        if len(self) == 0: return []
+        return ExportDICOM_Image.exportTables(self._exportList(directory), fileFormat='csv.gz' if compressed else 'csv',
+                                       columnHeaders=columnHeaders, objWeasel=self[0].objWeasel if progress_bar else None)
+
+    def export_as_numpy(self, directory=None, compressed=False, progress_bar=True):
+        """
+        Saves each image of the list as a .npy (or compressed .npz) file named after its series.
+        Returns the list of files (without extension) that could not be written.
+        """
+        if len(self) == 0: return []
+        return ExportDICOM_Image.exportTables(self._exportList(directory), fileFormat='npz' if compressed else 'npy',
+                                       objWeasel=self[0].objWeasel if progress_bar else None)
         
     def merge(self, series_number=None,series_name='MergedSeries', study_name=None, patient_name=None, overwrite=True, progress_bar=True):
         """
@@ -96,17 +183,21 @@ class ImagesList(ListOfDicomObjects):
         """
         Returns a list of unique series to which the images belong to.
         """
-        parentsList = []
-        listParentsAttribute = []
+        if len(self) == 0: return SeriesList([])
+        objWeasel = self[0].objWeasel
+        firstImages = {}
         for image in self:
-            series = image.parent
-            listIndividualAttributes = [series.subjectID, series.studyID, series.seriesID,
-                                        series.images, series.studyUID, series.seriesUID, series.suffix]
-            listParentsAttribute.append(listIndividualAttributes)
-        listUniqueParentsAttribute = self[0].objWeasel.unique_elements(listParentsAttribute)
-        for listAtt in listUniqueParentsAttribute:
-            series = Series(self[0].objWeasel, listAtt[0], listAtt[1], listAtt[2], listAtt[3], listAtt[4], listAtt[5], listAtt[6])
-            parentsList.append(series)
+            firstImages.setdefault((image.subjectID, image.studyID, image.seriesID), image)
+        parentsList = []
+        for key, image in firstImages.items():
+            # The series and study are the parents of the image element in the XML file
+            branch = objWeasel.objXMLReader.getImageBranch(*key, image.path)
+            if branch is None:
+                parentsList.append(Series(objWeasel, *key, listPaths=[], suffix=image.suffix))
+                continue
+            studyXML, seriesXML = branch[-3], branch[-2]
+            paths = [imageXML.find('name').text for imageXML in seriesXML]
+            parentsList.append(Series(objWeasel, *key, listPaths=paths, studyUID=studyXML.attrib.get('uid'), seriesUID=seriesXML.attrib.get('uid'), suffix=image.suffix))
         return SeriesList(parentsList)
 
 
@@ -117,52 +208,68 @@ class ImagesList(ListOfDicomObjects):
         self[0].objWeasel.display(self)
 
 
+    @property
+    def tag_table(self):
+        """
+        Returns the columnar table of DICOM tag values of the list of images.
+        The headers are read once and the table is reused as long as the list holds the same images.
+        The files are only checked for changes after Weasel writes a DICOM file; call refresh() after editing them outside Weasel.
+        """
+        table = getattr(self, '_tagTable', None)
+        if table is None or table.paths != self.paths:
+            table = ReadDICOM_Image.DicomTagTable(self.paths)
+            self._tagTable = table
+        return table.sync()
+
+    def refresh(self):
+        """
+        Re-reads the DICOM tag values of the images whose files changed on disk.
+        """
+        self.tag_table.refresh()
+        return self
+
+    def _subset(self, indices):
+        """
+        Returns an ImagesList with the images in the given positions, reusing the tag table.
+        """
+        images = list(self)
+        subset = ImagesList([images[index] for index in indices])
+        subset._tagTable = self.tag_table.take(indices)
+        return subset
+
     def sort(self, *argv, reverse=False):
         """
         Sort the list of images by the given DICOM tags.
         """
-        tuple_to_sort = []
-        list_to_sort = []
-        list_to_sort.append(self)
-        for tag in argv:
-            if len(self.get_value(tag)) > 0:
-                attributeList = self.get_value(tag)
-                list_to_sort.append(attributeList)
-        for index, _ in enumerate(self):
-            individual_tuple = []
-            for individual_list in list_to_sort:
-                individual_tuple.append(individual_list[index])
-            tuple_to_sort.append(tuple(individual_tuple))
-        tuple_sorted = sorted(tuple_to_sort, key=lambda x: x[1:], reverse=reverse)
-        list_sorted_images = []
-        for individual in tuple_sorted:
-            list_sorted_images.append(individual[0])
-        self = ImagesList(list_sorted_images)
-        return self
+        if len(self) == 0: return ImagesList([])
+        return self._subset(self.tag_table.argsort(*argv, reverse=reverse))
 
     def where(self, tag, condition, target):
-        list_images = []
-        for image in self:
-            value = image[tag]
-            if condition == "==":
-                statement = 'str(' + repr(value) + ') ' + condition + ' str(' + repr(target) + ')'
-                if eval(statement) == True:
-                    list_images.append(image)
-            else:
-                statement = repr(value) + ' ' + repr(condition) + ' ' + repr(target)
-                if eval(literal_eval(statement)) == True:
-                    list_images.append(image)
-        self = ImagesList(list_images)
-        return self
+        """
+        Returns the images where the value of the DICOM tag satisfies the condition (==, !=, <, <=, >, >=) with target.
+        Numeric and TM values are compared as numbers, text values as strings.
+        """
+        if len(self) == 0: return ImagesList([])
+        return self._subset(np.flatnonzero(self.tag_table.mask(tag, condition, target)))
+
+    def group_by(self, *tags):
+        """
+        Partitions the list of images by the values of the given DICOM tags, reading the tags once.
+        Returns a dictionary {value: ImagesList}, or {(value1, value2, ...): ImagesList} if there are several tags.
+        """
+        if len(self) == 0: return {}
+        return {key: self._subset(indices) for key, indices in self.tag_table.groups(*tags).items()}
 
     def get_value(self, tag):
         """
         Returns a list of values of the given DICOM tag in the list of images
         """
-        attributes_list = []
-        for image in self:
-            attributes_list.append(image.get_value(tag))
-        return attributes_list
+        if len(self) == 0: return []
+        if isinstance(tag, list):
+            return [list(values) for values in zip(*[self.get_value(ind_tag) for ind_tag in tag])]
+        if tag in ReadDICOM_Image.PIXEL_DATA_TAGS:
+            return [image.get_value(tag) for image in self]
+        return list(self.tag_table.values(tag))
 
     def set_value(self, tag, value):
         """
@@ -180,14 +287,15 @@ class ImagesList(ListOfDicomObjects):
             for index, image in enumerate(self):
                 if index == tag:
                     return image
+        elif isinstance(tag, str) and len(tag.split(' ')) == 3:
+            dicom_tag, logical_operator, target_value = tag.split(' ')
+            return self.where(dicom_tag, logical_operator, target_value)
         else:
             return self.get_value(tag)
 
     def __setitem__(self, tag, value):
         if isinstance(tag, str) and len(tag.split(' ')) == 3:
-            dicom_tag = tag.split(' ')[0]
-            logical_operator = tag.split(' ')[1]
-            target_value = tag.split(' ')[2]
+            dicom_tag, logical_operator, target_value = tag.split(' ')
             listImages = self.where(dicom_tag, logical_operator, target_value)
             listImages.set_value(dicom_tag, value)
         elif isinstance(tag, str):
@@ -219,6 +327,43 @@ class SeriesList(ListOfDicomObjects):
             copy.append(series.copy())
         return SeriesList(copy)
 
+    def _exportList(self, directory=None):
+        """
+        Returns the list of tuples (image paths, file path without extension) used to export the series of the list.
+        """
+        exportList = []
+        for series in self:
+            folder = os.path.dirname(series.images[0]) if directory is None else directory
+            exportList.append((series.images, os.path.join(folder, series.seriesID)))
+        return exportList
+
+    def export_as_nifti(self, directory=None, progress_bar=True):
+        """
+        Saves each series of the list as a .nii.gz file named after the series. The series are written concurrently
+        and one progress bar reports the slices written across all series. Returns the list of files that could not be written.
+        """
+        if len(self) == 0: return []
+        exportList = [(imagePathList, filePath + '.nii.gz') for imagePathList, filePath in self._exportList(directory)]
+        return ExportDICOM_Image.exportNIfTIFiles(exportList, objWeasel=self[0].objWeasel if progress_bar else None)
+
+    def export_as_csv(self, directory=None, columnHeaders=None, compressed=False, progress_bar=True):
+        """
+        Saves the slices of each series of the list as .csv (or .csv.gz if compressed) files. The series are written concurrently.
+        Returns the list of series files (without extension) that could not be written.
+        """
+        if len(self) == 0: return []
+        return ExportDICOM_Image.exportTables(self._exportList(directory), fileFormat='csv.gz' if compressed else 'csv',
+                                       columnHeaders=columnHeaders, objWeasel=self[0].objWeasel if progress_bar else None)
+
+    def export_as_numpy(self, directory=None, compressed=False, progress_bar=True):
+        """
+        Saves each series of the list as a .npy (or compressed .npz) file named after the series. The series are written concurrently.
+        Returns the list of files (without extension) that could not be written.
+        """
+        if len(self) == 0: return []
+        return ExportDICOM_Image.exportTables(self._exportList(directory), fileFormat='npz' if compressed else 'npy',
+                                       objWeasel=self[0].objWeasel if progress_bar else None)
+
     def merge(self, series_name='MergedSeries', study_name=None, patient_name=None, overwrite=True, progress_bar=True):
         """
         Merges a list of series into a new series under the same study
@@ -231,16 +376,16 @@ class SeriesList(ListOfDicomObjects):
         """
         Returns a list of unique studies to which the series belong to.
         """
-        parentsList = []
-        listParentsAttribute = []
+        if len(self) == 0: return StudyList([])
+        objWeasel = self[0].objWeasel
+        firstSeries = {}
         for series in self:
-            study = series.parent
-            listIndividualAttributes = [study.subjectID, study.studyID, study.studyUID, study.suffix]
-            listParentsAttribute.append(listIndividualAttributes)
-        listUniqueParentsAttribute = self[0].objWeasel.unique_elements(listParentsAttribute)
-        for listAtt in listUniqueParentsAttribute:
-            study = Study(self[0].objWeasel, listAtt[0], listAtt[1], listAtt[2], listAtt[3])
-            parentsList.append(study)
+            firstSeries.setdefault((series.subjectID, series.studyID), series)
+        parentsList = []
+        for key, series in firstSeries.items():
+            studyXML = objWeasel.objXMLReader.getStudy(*key)
+            studyUID = None if studyXML is None else studyXML.attrib.get('uid')
+            parentsList.append(Study(objWeasel, key[0], key[1], studyUID=studyUID, suffix=series.suffix))
         return StudyList(parentsList)
 
     @property
@@ -281,17 +426,12 @@ class StudyList(ListOfDicomObjects):
         """
         Returns a list of unique subjects to which the studies belong to.
         """
-        parentsList = []
-        listParentsAttribute = []
+        if len(self) == 0: return SubjectList([])
+        objWeasel = self[0].objWeasel
+        firstStudies = {}
         for study in self:
-            subject = study.parent
-            listIndividualAttributes = [subject.subjectID, subject.suffix]
-            listParentsAttribute.append(listIndividualAttributes)
-        listUniqueParentsAttribute = self[0].objWeasel.unique_elements(listParentsAttribute)
-        for listAtt in listUniqueParentsAttribute:
-            subject = Subject(self[0].objWeasel, listAtt[0], listAtt[1])
-            parentsList.append(subject)
-        return SubjectList(parentsList)
+            firstStudies.setdefault(study.subjectID, study)
+        return SubjectList([Subject(objWeasel, subjectID, suffix=study.suffix) for subjectID, study in firstStudies.items()])
 
     @property
     def children(self):
@@ -581,12 +721,12 @@ class Study:
         suffix : string (optional)
             This is the text to append to subjectID if a new Study() class is created.
     """
-    __slots__ = ('objWeasel', 'subjectID', 'studyID', 'studyUID', 'suffix')
+    __slots__ = ('objWeasel', 'subjectID', 'studyID', '_studyUID', 'suffix')
     def __init__(self, objWeasel, subjectID, studyID, studyUID=None, suffix=None):
         self.objWeasel = objWeasel
         self.subjectID = subjectID
         self.studyID = studyID
-        self.studyUID = self.StudyUID if studyUID is None else studyUID
+        self._studyUID = studyUID # Resolved on first access to studyUID
         self.suffix = '' if suffix is None else suffix
     
     def __repr__(self):
@@ -615,7 +755,7 @@ class Study:
     def parent(self):
         logger.info("Study.parent called")
         try:
-            return Subject(self.objWeasel, self.subjectID)
+            return Subject(self.objWeasel, self.subjectID, suffix=self.suffix)
         except Exception as e:
             print('Error in Study.parent: ' + str(e))
             logger.exception('Error in Study.parent: ' + str(e))
@@ -764,6 +904,18 @@ class Study:
             print('Error in Study.merge: ' + str(e))
             logger.exception('Error in Study.merge: ' + str(e))
 
+    @property
+    def studyUID(self):
+        if self._studyUID is None:
+            self._studyUID = _uidFromXML(self.objWeasel, self.subjectID, self.studyID)
+        if self._studyUID is None:
+            self._studyUID = self.StudyUID
+        return self._studyUID
+
+    @studyUID.setter
+    def studyUID(self, value):
+        self._studyUID = value
+
     @property
     def StudyUID(self):
         if len(self.children) > 0:
@@ -825,18 +977,22 @@ class Series:
         suffix : string (optional)
             This is the text to append to subjectID if a new Series() class is created.
     """
-    __slots__ = ('objWeasel', 'subjectID', 'studyID', 'seriesID', 'studyUID', 'seriesUID', 
-                 'images', 'suffix', 'referencePathsList')
+    __slots__ = ('objWeasel', 'subjectID', 'studyID', 'seriesID', '_studyUID', '_seriesUID', 
+                 'images', 'suffix', 'referencePathsList', '_complexComponents', '_geometry')
     def __init__(self, objWeasel, subjectID, studyID, seriesID, listPaths=None, studyUID=None, seriesUID=None, suffix=None):
         self.objWeasel = objWeasel
         self.subjectID = subjectID
         self.studyID = studyID
         self.seriesID = seriesID
         self.images = [] if listPaths is None else listPaths
-        self.studyUID = self.StudyUID if studyUID is None else studyUID
-        self.seriesUID = self.SeriesUID if seriesUID is None else seriesUID
+        # The UIDs are resolved on first access, from the XML file if possible
+        self._studyUID = studyUID
+        self._seriesUID = seriesUID
         self.suffix = '' if suffix is None else suffix
         self.referencePathsList = []
+        # Cache of split_complex(): (tuple of image paths, lists of paths of each component)
+        self._complexComponents = None
+        self._geometry = None
         # This is to deal with Enhanced MRI
         #if self.PydicomList and len(self.images) == 1:
         #    self.indices = list(np.arange(len(self.PydicomList[0].PerFrameFunctionalGroupsSequence))) if hasattr(self.PydicomList[0], 'PerFrameFunctionalGroupsSequence') else []
@@ -869,7 +1025,7 @@ class Series:
     def parent(self):
         logger.info("Series.parent called")
         try:
-            return Study(self.objWeasel, self.subjectID, self.studyID, studyUID=self.studyUID)
+            return Study(self.objWeasel, self.subjectID, self.studyID, studyUID=self.studyUID, suffix=self.suffix)
         except Exception as e:
             print('Error in Series.parent: ' + str(e))
             logger.exception('Error in Series.parent: ' + str(e))
@@ -1004,23 +1160,20 @@ class Series:
         return self.PydicomList
 
     def save(self, PydicomList):
-        newSubjectID = self.subjectID
-        newStudyID = self.studyID
-        newSeriesID = self.seriesID
+        self._complexComponents = None
+        # One header snapshot of the files before they are overwritten
+        oldHeaderList = ReadDICOM_Image.getSeriesDicomHeader(self.images)
+        # The new IDs are carried forward over all edited images and apply to the whole series
+        newSubjectID, newStudyID, newSeriesID = self.subjectID, self.studyID, self.seriesID
+        changeXML = False
+        for index, dataset in enumerate(PydicomList):
+            newSubjectID, newStudyID, newSeriesID, changedIDs = _newParentIDs(_hierarchyValues(oldHeaderList[index]), _hierarchyValues(dataset), 
+                                                                              newSubjectID, newStudyID, newSeriesID)
+            changeXML = changeXML or changedIDs
         for index, dataset in enumerate(PydicomList):
-            changeXML = False
-            if dataset.SeriesDescription != self.PydicomList[index].SeriesDescription or dataset.SeriesNumber != self.PydicomList[index].SeriesNumber:
-                changeXML = True
-                newSeriesID = str(dataset.SeriesNumber) + "_" + str(dataset.SeriesDescription)
-            if dataset.StudyDate != self.PydicomList[index].StudyDate or dataset.StudyTime != self.PydicomList[index].StudyTime or dataset.StudyDescription != self.PydicomList[index].StudyDescription:
-                changeXML = True
-                newStudyID = str(dataset.StudyDate) + "_" + str(dataset.StudyTime).split(".")[0] + "_" + str(dataset.StudyDescription)
-            if dataset.PatientID != self.PydicomList[index].PatientID:
-                changeXML = True
-                newSubjectID = str(dataset.PatientID)
             SaveDICOM_Image.saveDicomToFile(dataset, output_path=self.images[index])
-            if changeXML == True:
-                self.objWeasel.objXMLReader.moveImageInXMLFile(self.subjectID, self.studyID, self.seriesID, newSubjectID, newStudyID, newSeriesID, self.images[index], '')
+        if changeXML == True:
+            self.objWeasel.objXMLReader.moveImagesInXMLFile(self.subjectID, self.studyID, self.seriesID, newSubjectID, newStudyID, newSeriesID, self.images, '')
         # Only after updating the Element Tree (XML), we can change the instance values and save the DICOM file
         self.subjectID = newSubjectID
         self.studyID = newStudyID
@@ -1055,40 +1208,53 @@ class Series:
     def sort(self, *argv, reverse=False):
         logger.info("Series.sort called")
         try:
-            tuple_to_sort = []
-            list_to_sort = [self.images]
-            for tag in argv:
-                if len(self.get_value(tag)) > 0:
-                    list_to_sort.append(self.get_value(tag))
-            for index in range(len(self.images)):
-                individual_tuple = [individual_list[index] for individual_list in list_to_sort]
-                tuple_to_sort.append(tuple(individual_tuple))
-            tuple_sorted = sorted(tuple_to_sort, key=lambda x: x[1:], reverse=reverse)
-            list_sorted_images = [individual[0] for individual in tuple_sorted]
-            self.images = list_sorted_images
+            tagTable = ReadDICOM_Image.DicomTagTable(self.images)
+            self.images = [self.images[index] for index in tagTable.argsort(*argv, reverse=reverse)]
             return self
         except Exception as e:
             print('Error in Series.sort: ' + str(e))
             logger.exception('Error in Series.sort: ' + str(e))
     
+    def split_by(self, *tags, write=False, series_names=None, study_name=None, study_uid=None, patient_id=None, suffix='_Split', overwrite=False, progress_bar=False):
+        """
+        Partitions the images of the series by the values of the given DICOM tags, reading the tags once.
+        Returns a dictionary {value: Series}, or {(value1, value2, ...): Series} if there are several tags.
+        If write=True, each group is written into a new series of the same study, all groups in one pass.
+        series_names is an optional function that returns the name of the new series from the key of the group;
+        by default the new series are named after the series and the tag values.
+        """
+        logger.info("Series.split_by called")
+        try:
+            tagTable = ReadDICOM_Image.DicomTagTable(self.images)
+            groups = {key: [self.images[index] for index in indices] for key, indices in tagTable.groups(*tags).items()}
+            if write == False:
+                return {key: Series(self.objWeasel, self.subjectID, self.studyID, self.seriesID, listPaths=imagePathList,
+                                    studyUID=self._studyUID, seriesUID=self._seriesUID, suffix=self.suffix) for key, imagePathList in groups.items()}
+            seriesName = self.seriesID.split('_', 1)[1]
+            seriesNames = []
+            for key in groups:
+                if series_names is not None:
+                    seriesNames.append(series_names(key))
+                    continue
+                values = key if len(tags) > 1 else (key,)
+                seriesNames.append(seriesName + ' [' + ', '.join(str(tag) + ' = ' + str(value) for tag, value in zip(tags, values)) + ']')
+            newImagePathGroups = GenericDICOMTools.splitDicomIntoSeries(self.objWeasel, list(groups.values()), seriesNames, study_name=study_name, study_uid=study_uid,
+                                                                        patient_id=patient_id, suffix=suffix, overwrite=overwrite, progress_bar=progress_bar)
+            outputSeries = {}
+            for key, newImagePathList in zip(groups, newImagePathGroups):
+                if not newImagePathList: continue
+                (subjectID, studyID, seriesID) = self.objWeasel.objXMLReader.getImageParentIDs(newImagePathList[0])
+                outputSeries[key] = Series(self.objWeasel, subjectID, studyID, seriesID, listPaths=newImagePathList, suffix=suffix)
+            return outputSeries
+        except Exception as e:
+            print('Error in Series.split_by: ' + str(e))
+            logger.exception('Error in Series.split_by: ' + str(e))
+
     def where(self, tag, condition, target):
         logger.info("Series.where called")
         try:
-            list_images = []
-            list_paths = []
-            for image in self.children:
-                value = image[tag]
-                if condition == "==":
-                    statement = 'str(' + repr(value) + ') ' + condition + ' str(' + repr(target) + ')'
-                    if eval(statement) == True:
-                        list_images.append(image)
-                        list_paths.append(image.path)
-                else:
-                    statement = repr(value) + ' ' + repr(condition) + ' ' + repr(target)
-                    if eval(literal_eval(statement)) == True:
-                        list_images.append(image)
-                        list_paths.append(image.path)
-            self.images = list_paths
+            tagTable = ReadDICOM_Image.DicomTagTable(self.images)
+            self.images = [self.images[index] for index in np.flatnonzero(tagTable.mask(tag, condition, target))]
             return self
         except Exception as e:
             print('Error in Series.where: ' + str(e))
@@ -1115,6 +1281,30 @@ class Series:
             print('Error in Series.Metadata: ' + str(e))
             logger.exception('Error in Series.Metadata: ' + str(e))
 
+    @property
+    def seriesUID(self):
+        if self._seriesUID is None:
+            self._seriesUID = _uidFromXML(self.objWeasel, self.subjectID, self.studyID, self.seriesID)
+        if self._seriesUID is None:
+            self._seriesUID = self.SeriesUID
+        return self._seriesUID
+
+    @seriesUID.setter
+    def seriesUID(self, value):
+        self._seriesUID = value
+
+    @property
+    def studyUID(self):
+        if self._studyUID is None:
+            self._studyUID = _uidFromXML(self.objWeasel, self.subjectID, self.studyID)
+        if self._studyUID is None:
+            self._studyUID = self.StudyUID
+        return self._studyUID
+
+    @studyUID.setter
+    def studyUID(self, value):
+        self._studyUID = value
+
     @property
     def SeriesUID(self):
         if not self.images:
@@ -1135,23 +1325,40 @@ class Series:
             self.studyUID = None
         return self.studyUID
 
+    def split_complex(self):
+        """
+        Returns the Magnitude, Phase, Real and Imaginary series of this series, in this order.
+        The image types are read from the DICOM headers only, in one pass, and cached until the images
+        or their files on disk (size and modification time) change.
+        """
+        logger.info("Series.split_complex called")
+        try:
+            images = (tuple(self.images), tuple(ReadDICOM_Image.fileSignature(imagePath) for imagePath in self.images))
+            if self._complexComponents is None or self._complexComponents[0] != images:
+                components = ([], [], [], [])
+                for imagePath, flags in zip(self.images, ReadDICOM_Image.getSeriesImageTypes(self.images)):
+                    flagMagnitude, flagPhase, flagReal, flagImaginary, _ = flags
+                    if flagMagnitude == True: components[0].append(imagePath)
+                    if flagPhase == True: components[1].append(imagePath)
+                    if flagReal: components[2].append(imagePath)
+                    if flagImaginary: components[3].append(imagePath)
+                self._complexComponents = (images, components)
+            componentSeries = []
+            for imagePaths in self._complexComponents[1]:
+                series = Series(self.objWeasel, self.subjectID, self.studyID, self.seriesID, listPaths=list(imagePaths),
+                                studyUID=self._studyUID, seriesUID=self._seriesUID)
+                series.referencePathsList = self.images
+                componentSeries.append(series)
+            return tuple(componentSeries)
+        except Exception as e:
+            print('Error in Series.split_complex: ' + str(e))
+            logger.exception('Error in Series.split_complex: ' + str(e))
+
     @property
     def Magnitude(self):
         logger.info("Series.Magnitude called")
         try:
-            dicomList = self.PydicomList
-            magnitudeSeries = Series(self.objWeasel, self.subjectID, self.studyID, self.seriesID, listPaths=self.images)
-            magnitudeSeries.remove(all_images=True)
-            magnitudeSeries.referencePathsList = self.images
-            for index in range(len(self.images)):
-                flagMagnitude, _, _, _, _ = ReadDICOM_Image.checkImageType(dicomList[index])
-                #if isinstance(flagMagnitude, list) and flagMagnitude:
-                #    if len(flagMagnitude) > 1 and len(self.images) == 1:
-                #        magnitudeSeries.indices = flagMagnitude
-                #    magnitudeSeries.add(Image(self.objWeasel, self.subjectID, self.studyID, self.seriesID, self.images[index]))
-                if flagMagnitude == True:
-                    magnitudeSeries.add(Image(self.objWeasel, self.subjectID, self.studyID, self.seriesID, self.images[index]))
-            return magnitudeSeries
+            return self.split_complex()[0]
         except Exception as e:
             print('Error in Series.Magnitude: ' + str(e))
             logger.exception('Error in Series.Magnitude: ' + str(e))
@@ -1160,19 +1367,7 @@ class Series:
     def Phase(self):
         logger.info("Series.Phase called")
         try:
-            dicomList = self.PydicomList
-            phaseSeries = Series(self.objWeasel, self.subjectID, self.studyID, self.seriesID, listPaths=self.images)
-            phaseSeries.remove(all_images=True)
-            phaseSeries.referencePathsList = self.images
-            for index in range(len(self.images)):
-                _, flagPhase, _, _, _ = ReadDICOM_Image.checkImageType(dicomList[index])
-                #if isinstance(flagPhase, list) and flagPhase:
-                #    if len(flagPhase) > 1 and len(self.images) == 1:
-                #        phaseSeries.indices = flagPhase
-                #    phaseSeries.add(Image(self.objWeasel, self.subjectID, self.studyID, self.seriesID, self.images[index]))
-                if flagPhase == True:
-                    phaseSeries.add(Image(self.objWeasel, self.subjectID, self.studyID, self.seriesID, self.images[index]))
-            return phaseSeries
+            return self.split_complex()[1]
         except Exception as e:
             print('Error in Series.Phase: ' + str(e))
             logger.exception('Error in Series.Phase: ' + str(e))
@@ -1181,19 +1376,7 @@ class Series:
     def Real(self):
         logger.info("Series.Real called")
         try:
-            dicomList = self.PydicomList
-            realSeries = Series(self.objWeasel, self.subjectID, self.studyID, self.seriesID, listPaths=self.images)
-            realSeries.remove(all_images=True)
-            realSeries.referencePathsList = self.images
-            for index in range(len(self.images)):
-                _, _, flagReal, _, _ = ReadDICOM_Image.checkImageType(dicomList[index])
-                #if isinstance(flagReal, list) and flagReal:
-                #    if len(flagReal) > 1 and len(self.images) == 1:
-                #        realSeries.indices = flagReal
-                #    realSeries.add(Image(self.objWeasel, self.subjectID, self.studyID, self.seriesID, self.images[index]))
-                if flagReal:
-                    realSeries.add(Image(self.objWeasel, self.subjectID, self.studyID, self.seriesID, self.images[index]))
-            return realSeries
+            return self.split_complex()[2]
         except Exception as e:
             print('Error in Series.Real: ' + str(e))
             logger.exception('Error in Series.Real: ' + str(e))
@@ -1202,19 +1385,7 @@ class Series:
     def Imaginary(self):
         logger.info("Series.Imaginary called")
         try:
-            dicomList = self.PydicomList
-            imaginarySeries = Series(self.objWeasel, self.subjectID, self.studyID, self.seriesID, listPaths=self.images)
-            imaginarySeries.remove(all_images=True)
-            imaginarySeries.referencePathsList = self.images
-            for index in range(len(self.images)):
-                _, _, _, flagImaginary, _ = ReadDICOM_Image.checkImageType(dicomList[index])
-                #if isinstance(flagImaginary, list) and flagImaginary:
-                #    if len(flagImaginary) > 1 and len(self.images) == 1:
-                #        imaginarySeries.indices = flagImaginary
-                #    imaginarySeries.add(Image(self.objWeasel, self.subjectID, self.studyID, self.seriesID, self.images[index]))
-                if flagImaginary:
-                    imaginarySeries.add(Image(self.objWeasel, self.subjectID, self.studyID, self.seriesID, self.images[index]))
-            return imaginarySeries
+            return self.split_complex()[3]
         except Exception as e:
             print('Error in Series.Imaginary: ' + str(e))
             logger.exception('Error in Series.Imaginary: ' + str(e))
@@ -1228,6 +1399,17 @@ class Series:
         except Exception as e:
             print('Error in Series.PixelArray: ' + str(e))
             logger.exception('Error in Series.PixelArray: ' + str(e))
+
+    def memmap(self):
+        """Returns a read-only view of the PixelArray that reads and rescales the slices from disk only when indexed.
+            Only available for uncompressed DICOM files. Usage example: series.memmap()[::2, 64:192, 64:192]
+        """
+        logger.info("Series.memmap called")
+        try:
+            return PixelArrayDICOMTools.getVolumeView(self.images)
+        except Exception as e:
+            print('Error in Series.memmap: ' + str(e))
+            logger.exception('Error in Series.memmap: ' + str(e))
         
     def overlay_mask(self, maskInstance):
         """Returns the PixelArray masked.
@@ -1242,42 +1424,9 @@ class Series:
         """
         logger.info("Series.Mask called")
         try:
-            dataset = maskInstance.PydicomList
-            mask_array = maskInstance.PixelArray
-            mask_array[mask_array != 0] = 1
-            mask_output = []
-            if isinstance(maskInstance, Image):
-                for dicomFile in self.images:
-                    dataset_original = ReadDICOM_Image.getDicomDataset(dicomFile)
-                    tempArray = np.zeros(np.shape(ReadDICOM_Image.getPixelArray(dataset_original)))
-                    affine_results = ReadDICOM_Image.mapMaskToImage(mask_array, dataset, dataset_original)
-                    if affine_results:
-                        coords = zip(*affine_results)
-                        tempArray[tuple(coords)] = list(np.ones(len(affine_results)).flatten())
-                    mask_output.append(np.transpose(tempArray) * ReadDICOM_Image.getPixelArray(dataset_original))
-                return np.nan_to_num(mask_output)
-            elif isinstance(maskInstance, Series):
-                listImages = self.images
-                listMaskImages = maskInstance.images
-                if np.shape(mask_array) == np.shape(self.PixelArray) and maskInstance.Affine.all() == self.Affine.all():
-                    if len(np.shape(mask_array)) == 3:
-                        mask_output = [np.transpose(image2D) for image2D in mask_array]
-                    else:
-                        mask_output = np.transpose(mask_array)
-                else:
-                    for dicomFile in listImages:
-                        dataset_original = ReadDICOM_Image.getDicomDataset(dicomFile)
-                        tempArray = np.zeros(np.shape(ReadDICOM_Image.getPixelArray(dataset_original)))
-                        for maskFile in listMaskImages:
-                            dataset = ReadDICOM_Image.getDicomDataset(maskFile)
-                            mask_array = ReadDICOM_Image.getPixelArray(dataset)
-                            mask_array[mask_array != 0] = 1
-                            affine_results = ReadDICOM_Image.mapMaskToImage(mask_array, dataset, dataset_original)
-                            if affine_results:
-                                coords = zip(*affine_results)
-                                tempArray[tuple(coords)] = list(np.ones(len(affine_results)).flatten())
-                        mask_output.append(np.transpose(tempArray) * ReadDICOM_Image.getPixelArray(dataset_original))
-                return np.nan_to_num(mask_output)
+            maskPaths = [maskInstance.path] if isinstance(maskInstance, Image) else maskInstance.images
+            resampledMask = ReadDICOM_Image.resampleMask(maskPaths, self.images, cacheKey=(maskInstance.seriesUID, self.seriesUID))
+            return np.nan_to_num(resampledMask * ReadDICOM_Image.returnCachedSeriesPixelArray(self.images))
         except Exception as e:
             print('Error in Series.Mask: ' + str(e))
             logger.exception('Error in Series.Mask: ' + str(e))
@@ -1292,11 +1441,21 @@ class Series:
             print('Error in Series.write_mask: ' + str(e))
             logger.exception('Error in Series.write_mask: ' + str(e))
 
+    @property
+    def geometry(self):
+        """
+        Returns the ReadDICOM_Image.SeriesGeometry table of the series, built from one header-only pass
+        and kept until the images of the series change.
+        """
+        if self._geometry is None or self._geometry.paths != self.images or not self._geometry.isCurrent():
+            self._geometry = ReadDICOM_Image.getSeriesGeometry(self.images)
+        return self._geometry
+
     @property
     def Affine(self):
         logger.info("Series.Affine called")
         try:
-            return ReadDICOM_Image.returnAffineArray(self.images[0])
+            return self.geometry.fileAffines()[0]
         except Exception as e:
             print('Error in Series.Affine: ' + str(e))
             logger.exception('Error in Series.Affine: ' + str(e))
@@ -1305,11 +1464,7 @@ class Series:
     def TopLeftCorner(self):
         logger.info("Series.TopLeftCorner called")
         try:
-            listCoords = list()
-            dicomList = self.PydicomList
-            for dicom_dataset in dicomList:
-                listCoords.append(ReadDICOM_Image.getTopLeftCorner(dicom_dataset))
-            return listCoords
+            return self.geometry.topLeftCorners.tolist()
         except Exception as e:
             print('Error in Series.TopLeftCorner: ' + str(e))
             logger.exception('Error in Series.TopLeftCorner: ' + str(e))
@@ -1318,7 +1473,7 @@ class Series:
     def CentralSliceLocation(self):
         logger.info("Series.CentralSliceLocation called")
         try:
-            locations = np.unique(self["SliceLocation"])
+            locations = np.unique(self.geometry.sliceLocations)
             # If number of slices is even, the lower value is selected.
             central_index = int(np.floor(len(locations) / 2))
             return locations[central_index]
@@ -1330,7 +1485,7 @@ class Series:
     def ListAffines(self):
         logger.info("Series.ListAffines called")
         try:
-            return [ReadDICOM_Image.returnAffineArray(image) for image in self.images]
+            return self.geometry.fileAffines()
         except Exception as e:
             print('Error in Series.ListAffines: ' + str(e))
             logger.exception('Error in Series.ListAffines: ' + str(e))
@@ -1339,7 +1494,7 @@ class Series:
     def ROIindices(self):
         logger.info("Series.ROIindices called")
         try:
-            tempImage = self.PixelArray
+            tempImage = self.PixelArray.copy()
             tempImage[tempImage != 0] = 1
             return np.transpose(np.where(tempImage == 1))
         except Exception as e:
@@ -1353,12 +1508,12 @@ class Series:
                 if isinstance(tag, list):
                     outputValuesList = []
                     for ind_tag in tag:
-                        if (ind_tag == "SliceLocation" or ind_tag == (0x0020,0x1041)) and not hasattr(self.PydicomList[0], "SliceLocation"): ind_tag = (0x2001, 0x100a)
+                        if (ind_tag == "SliceLocation" or ind_tag == (0x0020,0x1041)) and not hasattr(ReadDICOM_Image.getDicomHeader(self.images[0]), "SliceLocation"): ind_tag = (0x2001, 0x100a)
                         outputValuesList.append(ReadDICOM_Image.getSeriesTagValues(self.images, ind_tag)[0])
                     return outputValuesList
                 elif isinstance(tag, str) and len(tag.split(' ')) == 3:
                     dicom_tag = tag.split(' ')[0]
-                    if (dicom_tag == "SliceLocation" or dicom_tag == (0x0020,0x1041)) and not hasattr(self.PydicomList[0], "SliceLocation"): dicom_tag = (0x2001, 0x100a)
+                    if (dicom_tag == "SliceLocation" or dicom_tag == (0x0020,0x1041)) and not hasattr(ReadDICOM_Image.getDicomHeader(self.images[0]), "SliceLocation"): dicom_tag = (0x2001, 0x100a)
                     logical_operator = tag.split(' ')[1]
                     target_value = tag.split(' ')[2]
                     series_to_return = copy.copy(self)
@@ -1368,7 +1523,7 @@ class Series:
                 elif isinstance(tag, int):
                     return self.children[tag]
                 else:
-                    if (tag == "SliceLocation" or tag == (0x0020,0x1041)) and not hasattr(self.PydicomList[0], "SliceLocation"): tag = (0x2001, 0x100a)
+                    if (tag == "SliceLocation" or tag == (0x0020,0x1041)) and not hasattr(ReadDICOM_Image.getDicomHeader(self.images[0]), "SliceLocation"): tag = (0x2001, 0x100a)
                     return ReadDICOM_Image.getSeriesTagValues(self.images, tag)[0]
             else:
                 return []
@@ -1379,44 +1534,34 @@ class Series:
     def set_value(self, tag, newValue):
         logger.info("Series.set_value called")
         try:
+            self._complexComponents = None
             if self.images:
-                comparisonDicom = self.PydicomList
-                oldSubjectID = self.subjectID
-                oldStudyID = self.studyID
-                oldSeriesID = self.seriesID
                 if isinstance(tag, list) and isinstance(newValue, list):
-                    for index, ind_tag in enumerate(tag):
-                        self.set_value(ind_tag, newValue[index])
-                        #GenericDICOMTools.editDICOMTag(self.images, ind_tag, newValue[index])
+                    tagValues = dict(zip(tag, newValue))
                 elif isinstance(newValue, list):
-                    for value in newValue:
-                        GenericDICOMTools.editDICOMTag(self.images, tag, value)
+                    # The values are written one after the other, so the last one is kept
+                    tagValues = {tag: newValue[-1]}
                 else:
-                    GenericDICOMTools.editDICOMTag(self.images, tag, newValue)
-                newDicomList = self.PydicomList
-                # Consider the case where other XML fields are changed
-                for index, dataset in enumerate(comparisonDicom):
-                    changeXML = False
-                    if dataset.SeriesDescription != newDicomList[index].SeriesDescription or dataset.SeriesNumber != newDicomList[index].SeriesNumber:
-                        changeXML = True
-                        newSeriesID = str(newDicomList[index].SeriesNumber) + "_" + str(newDicomList[index].SeriesDescription)
-                        self.seriesID = newSeriesID
-                    else:
-                        newSeriesID = oldSeriesID
-                    if dataset.StudyDate != newDicomList[index].StudyDate or dataset.StudyTime != newDicomList[index].StudyTime or dataset.StudyDescription != newDicomList[index].StudyDescription:
-                        changeXML = True
-                        newStudyID = str(newDicomList[index].StudyDate) + "_" + str(newDicomList[index].StudyTime).split(".")[0] + "_" + str(newDicomList[index].StudyDescription)
-                        self.studyID = newStudyID
-                    else:
-                        newStudyID = oldStudyID
-                    if dataset.PatientID != newDicomList[index].PatientID:
-                        changeXML = True
-                        newSubjectID = str(newDicomList[index].PatientID)
-                        self.subjectID = newSubjectID
-                    else:
-                        newSubjectID = oldSubjectID
-                    if changeXML == True:
-                        self.objWeasel.objXMLReader.moveImageInXMLFile(oldSubjectID, oldStudyID, oldSeriesID, newSubjectID, newStudyID, newSeriesID, self.images[index], '')
+                    tagValues = {tag: newValue}
+                editedTags = _editedHierarchyTags(tagValues)
+                # One header snapshot before the edit, only needed if the XML fields may change
+                oldHeaderList = ReadDICOM_Image.getSeriesDicomHeader(self.images) if editedTags else []
+                GenericDICOMTools.editDICOMTag(self.images, tagValues)
+                if editedTags:
+                    # The edited values are the same in all files, so they are read back from the first file only
+                    newHeader = ReadDICOM_Image.getDicomHeader(self.images[0])
+                    editedValues = {editedTag: getattr(newHeader, editedTag, None) for editedTag in editedTags}
+                    oldSubjectID, oldStudyID, oldSeriesID = self.subjectID, self.studyID, self.seriesID
+                    imagesToMove = {}
+                    for index, oldHeader in enumerate(oldHeaderList):
+                        oldValues = _hierarchyValues(oldHeader)
+                        newValues = dict(oldValues, **editedValues)
+                        newSubjectID, newStudyID, newSeriesID, changeXML = _newParentIDs(oldValues, newValues, oldSubjectID, oldStudyID, oldSeriesID)
+                        if changeXML == True:
+                            self.subjectID, self.studyID, self.seriesID = newSubjectID, newStudyID, newSeriesID
+                            imagesToMove.setdefault((newSubjectID, newStudyID, newSeriesID), []).append(self.images[index])
+                    for (newSubjectID, newStudyID, newSeriesID), imageList in imagesToMove.items():
+                        self.objWeasel.objXMLReader.moveImagesInXMLFile(oldSubjectID, oldStudyID, oldSeriesID, newSubjectID, newStudyID, newSeriesID, imageList, '')
         except Exception as e:
             print('Error in Series.set_value: ' + str(e))
             logger.exception('Error in Series.set_value: ' + str(e))
@@ -1443,6 +1588,14 @@ class Series:
                     self.objWeasel.objXMLreader.renameSeriesinXMLFile(self.images, series_name=newValue)
                 elif tagDescription == 'SeriesNumber':
                     self.objWeasel.objXMLreader.renameSeriesinXMLFile(self.images, series_id=newValue)
+                elif tagDescription == 'SeriesInstanceUID':
+                    self.seriesUID = newValue
+                    seriesXML = self.objWeasel.objXMLReader.getSeries(self.subjectID, self.studyID, self.seriesID)
+                    if seriesXML is not None: seriesXML.set('uid', str(newValue))
+                elif tagDescription == 'StudyInstanceUID':
+                    self.studyUID = newValue
+                    studyXML = self.objWeasel.objXMLReader.getStudy(self.subjectID, self.studyID)
+                    if studyXML is not None: studyXML.set('uid', str(newValue))
             itemList, _ = ReadDICOM_Image.getSeriesTagValues(self.images, tagDescription)
             #if self.Multiframe: 
             #    tempList = [itemList[index] for index in self.indices]
@@ -1464,42 +1617,31 @@ class Series:
         try:
             if directory is None: directory=os.path.dirname(self.images[0])
             if filename is None: filename=self.seriesID
-            dicomHeader = nib.nifti1.Nifti1DicomExtension(2, self.PydicomList[0])
-            niftiObj = nib.Nifti1Image(np.flipud(np.rot90(np.transpose(self.PixelArray))), self.Affine)
-            # The transpose is necessary in this case to be in line with the rest of Weasel. The rot90() can be a bit questionable, so this should be tested in as much data as possible.
-            niftiObj.header.extensions.append(dicomHeader)
-            nib.save(niftiObj, directory + '/' + filename + '.nii.gz')
+            ExportDICOM_Image.writeNIfTI(self.images, directory + '/' + filename + '.nii.gz')
         except Exception as e:
             print('Error in Series.export_as_nifti: ' + str(e))
             logger.exception('Error in Series.export_as_nifti: ' + str(e))
     
-    def export_as_csv(self, directory=None, filename=None, columnHeaders=None):
+    def export_as_csv(self, directory=None, filename=None, columnHeaders=None, compressed=False):
         logger.info("Series.export_as_csv called")
         try:
             if directory is None: directory = os.path.dirname(self.images[0])
-            if self.number_children == 1:
-                self.children[0].export_as_csv(directory=directory, filename=filename, columnHeaders=columnHeaders)
-            else:
-                table = self.PixelArray
-                image_counter = 0
-                for slice_image in table:
-                    if filename is None:
-                        one_filename = os.path.join(directory, self.seriesID + '_' + str(image_counter).zfill(6) + '.csv')
-                    else:
-                        one_filename = os.path.join(directory, filename + '_' + str(image_counter).zfill(6) +'.csv')
-                    if columnHeaders is None:
-                        one_columHeaders = []
-                        counter = 0
-                        for _ in slice_image:
-                            counter += 1
-                            one_columHeaders.append("Column" + str(counter))
-                    df = pd.DataFrame(np.transpose(slice_image), columns=one_columHeaders)
-                    df.to_csv(one_filename, index=False)
-                    image_counter += 1
+            if filename is None: filename = self.seriesID
+            ExportDICOM_Image.writeTables(self.images, os.path.join(directory, filename), fileFormat='csv.gz' if compressed else 'csv', columnHeaders=columnHeaders)
         except Exception as e:
             print('Error in Series.export_as_csv: ' + str(e))
             logger.exception('Error in Series.export_as_csv: ' + str(e))
 
+    def export_as_numpy(self, directory=None, filename=None, compressed=False):
+        logger.info("Series.export_as_numpy called")
+        try:
+            if directory is None: directory = os.path.dirname(self.images[0])
+            if filename is None: filename = self.seriesID
+            ExportDICOM_Image.writeTables(self.images, os.path.join(directory, filename), fileFormat='npz' if compressed else 'npy')
+        except Exception as e:
+            print('Error in Series.export_as_numpy: ' + str(e))
+            logger.exception('Error in Series.export_as_numpy: ' + str(e))
+
 
 class Image:
     """This class corresponds to 1 DICOM file that belongs to its parent Subject, Study and Series.
@@ -1518,16 +1660,17 @@ class Image:
         suffix : string (optional)
             This is the text to append to subjectID if a new Image() class is created.
     """
-    __slots__ = ('objWeasel', 'subjectID', 'studyID', 'seriesID', 'path', 'seriesUID',
-                 'studyUID', 'suffix', 'referencePath')
+    __slots__ = ('objWeasel', 'subjectID', 'studyID', 'seriesID', 'path', '_seriesUID',
+                 '_studyUID', 'suffix', 'referencePath')
     def __init__(self, objWeasel, subjectID, studyID, seriesID, path, suffix=None):
         self.objWeasel = objWeasel
         self.subjectID = subjectID
         self.studyID = studyID
         self.seriesID = seriesID
         self.path = path
-        self.seriesUID = self.SeriesUID
-        self.studyUID = self.StudyUID
+        # The UIDs are resolved on first access, from the XML file if possible
+        self._seriesUID = None
+        self._studyUID = None
         self.suffix = '' if suffix is None else suffix
         self.referencePath = ''
 
@@ -1538,13 +1681,7 @@ class Image:
     def parent(self):
         logger.info("Image.parent called")
         try:
-            temp_series = Series(self.objWeasel, self.subjectID, self.studyID, self.seriesID, studyUID=self.studyUID, seriesUID=self.seriesUID)
-            paths = []
-            images_of_series = temp_series.children
-            for image in images_of_series:
-                paths.append(image.path)
-            del temp_series, images_of_series
-            return Series(self.objWeasel, self.subjectID, self.studyID, self.seriesID, listPaths=paths, studyUID=self.studyUID, seriesUID=self.seriesUID)
+            return ImagesList([self]).parent[0]
         except Exception as e:
             print('Error in Image.parent: ' + str(e))
             logger.exception('Error in Image.parent: ' + str(e))
@@ -1664,19 +1801,8 @@ class Image:
         return self.PydicomObject
 
     def save(self, PydicomObject):
-        changeXML = False
-        newSubjectID = self.subjectID
-        newStudyID = self.studyID
-        newSeriesID = self.seriesID
-        if PydicomObject.SeriesDescription != self.PydicomObject.SeriesDescription or PydicomObject.SeriesNumber != self.PydicomObject.SeriesNumber:
-            changeXML = True
-            newSeriesID = str(PydicomObject.SeriesNumber) + "_" + str(PydicomObject.SeriesDescription)
-        if PydicomObject.StudyDate != self.PydicomObject.StudyDate or PydicomObject.StudyTime != self.PydicomObject.StudyTime or PydicomObject.StudyDescription != self.PydicomObject.StudyDescription:
-            changeXML = True
-            newStudyID = str(PydicomObject.StudyDate) + "_" + str(PydicomObject.StudyTime).split(".")[0] + "_" + str(PydicomObject.StudyDescription)
-        if PydicomObject.PatientID != self.PydicomObject.PatientID:
-            changeXML = True
-            newSubjectID = str(PydicomObject.PatientID)
+        oldValues = _hierarchyValues(ReadDICOM_Image.getDicomHeader(self.path))
+        newSubjectID, newStudyID, newSeriesID, changeXML = _newParentIDs(oldValues, _hierarchyValues(PydicomObject), self.subjectID, self.studyID, self.seriesID)
         SaveDICOM_Image.saveDicomToFile(PydicomObject, output_path=self.path)
         if changeXML == True:
             self.objWeasel.objXMLReader.moveImageInXMLFile(self.subjectID, self.studyID, self.seriesID, newSubjectID, newStudyID, newSeriesID, self.path, '')
@@ -1709,6 +1835,30 @@ class Image:
             print('Error in Image.plot: ' + str(e))
             logger.exception('Error in Image.plot: ' + str(e))
 
+    @property
+    def seriesUID(self):
+        if self._seriesUID is None:
+            self._seriesUID = _uidFromXML(self.objWeasel, self.subjectID, self.studyID, self.seriesID)
+        if self._seriesUID is None:
+            self._seriesUID = self.SeriesUID
+        return self._seriesUID
+
+    @seriesUID.setter
+    def seriesUID(self, value):
+        self._seriesUID = value
+
+    @property
+    def studyUID(self):
+        if self._studyUID is None:
+            self._studyUID = _uidFromXML(self.objWeasel, self.subjectID, self.studyID)
+        if self._studyUID is None:
+            self._studyUID = self.StudyUID
+        return self._studyUID
+
+    @studyUID.setter
+    def studyUID(self, value):
+        self._studyUID = value
+
     @property
     def SeriesUID(self):
         if not self.path:
@@ -1760,30 +1910,9 @@ class Image:
         """
         logger.info("Image.Mask called")
         try:
-            if isinstance(maskInstance, Image):
-                #for index, dicomFile in enumerate(targetPath):
-                tempArray = np.zeros(np.shape(self.PixelArray))
-                dataset_original = self.PydicomObject
-                dataset = maskInstance.PydicomObject
-                mask_array = maskInstance.PixelArray
-                mask_array[mask_array != 0] = 1
-                affine_results = ReadDICOM_Image.mapMaskToImage(mask_array, dataset, dataset_original)
-                if affine_results:
-                    coords = zip(*affine_results)
-                    tempArray[tuple(coords)] = list(np.ones(len(affine_results)).flatten())
-                return np.transpose(tempArray) * self.PixelArray
-            elif isinstance(maskInstance, Series):
-                tempArray = np.zeros(np.shape(self.PixelArray))
-                for maskFile in maskInstance.images:
-                    dataset_original = self.PydicomObject
-                    dataset = ReadDICOM_Image.getDicomDataset(maskFile)
-                    mask_array = ReadDICOM_Image.getPixelArray(dataset)
-                    mask_array[mask_array != 0] = 1
-                    affine_results = ReadDICOM_Image.mapMaskToImage(mask_array, dataset, dataset_original)
-                    if affine_results:
-                        coords = zip(*affine_results)
-                        tempArray[tuple(coords)] = list(np.ones(len(affine_results)).flatten())
-                return np.transpose(tempArray) * self.PixelArray
+            maskPaths = [maskInstance.path] if isinstance(maskInstance, Image) else maskInstance.images
+            resampledMask = ReadDICOM_Image.resampleMask(maskPaths, [self.path], cacheKey=(maskInstance.seriesUID, self.seriesUID))
+            return resampledMask[0] * self.PixelArray
         except Exception as e:
             print('Error in Image.Mask: ' + str(e))
             logger.exception('Error in Image.Mask: ' + str(e))
@@ -1802,7 +1931,7 @@ class Image:
     def ROIindices(self):
         logger.info("Image.ROIindices called")
         try:
-            tempImage = self.PixelArray
+            tempImage = self.PixelArray.copy()
             tempImage[tempImage != 0] = 1
             return np.transpose(np.where(tempImage == 1))
         except Exception as e:
@@ -1813,16 +1942,17 @@ class Image:
     def TopLeftCorner(self):
         logger.info("Image.TopLeftCorner called")
         try:
-            return ReadDICOM_Image.getTopLeftCorner(self.PydicomObject)
+            topLeftCorners = ReadDICOM_Image.getSeriesGeometry([self.path]).topLeftCorners.tolist()
+            return topLeftCorners[0] if len(topLeftCorners) == 1 else topLeftCorners
         except Exception as e:
             print('Error in Image.TopLeftCorner: ' + str(e))
             logger.exception('Error in Image.TopLeftCorner: ' + str(e))
 
     @property
     def Affine(self):
-        logger.info("Image.TopLeftCorner called")
+        logger.info("Image.Affine called")
         try:
-            return ReadDICOM_Image.returnAffineArray(self.path)
+            return ReadDICOM_Image.getSeriesGeometry([self.path]).fileAffines()[0]
         except Exception as e:
             print('Error in Image.Affine: ' + str(e))
             logger.exception('Error in Image.Affine: ' + str(e)) 
@@ -1833,11 +1963,11 @@ class Image:
             if isinstance(tag, list):
                 outputValuesList = []
                 for ind_tag in tag:
-                    if (ind_tag == "SliceLocation" or ind_tag == (0x0020,0x1041)) and not hasattr(self.PydicomObject, "SliceLocation"): ind_tag = (0x2001, 0x100a)
+                    if (ind_tag == "SliceLocation" or ind_tag == (0x0020,0x1041)) and not hasattr(ReadDICOM_Image.getDicomHeader(self.path), "SliceLocation"): ind_tag = (0x2001, 0x100a)
                     outputValuesList.append(ReadDICOM_Image.getImageTagValue(self.path, ind_tag))
                 return outputValuesList
             else:
-                if (tag == "SliceLocation" or tag == (0x0020,0x1041)) and not hasattr(self.PydicomObject, "SliceLocation"): tag = (0x2001, 0x100a)
+                if (tag == "SliceLocation" or tag == (0x0020,0x1041)) and not hasattr(ReadDICOM_Image.getDicomHeader(self.path), "SliceLocation"): tag = (0x2001, 0x100a)
                 return ReadDICOM_Image.getImageTagValue(self.path, tag)
         except Exception as e:
             print('Error in Image.get_value: ' + str(e))
@@ -1846,37 +1976,24 @@ class Image:
     def set_value(self, tag, newValue):
         logger.info("Image.set_value called")
         try:
-            comparisonDicom = self.PydicomObject
-            changeXML = False
             # Not necessary new IDs, but they may be new. The changeXML flag coordinates that.
             oldSubjectID = self.subjectID
             oldStudyID = self.studyID
             oldSeriesID = self.seriesID
             # Set tag commands
             if isinstance(tag, list) and isinstance(newValue, list):
-                for index, ind_tag in enumerate(tag):
-                    GenericDICOMTools.editDICOMTag(self.path, ind_tag, newValue[index])
+                tagValues = dict(zip(tag, newValue))
             else:
-                GenericDICOMTools.editDICOMTag(self.path, tag, newValue)
+                tagValues = {tag: newValue}
+            editedTags = _editedHierarchyTags(tagValues)
+            oldValues = _hierarchyValues(ReadDICOM_Image.getDicomHeader(self.path)) if editedTags else None
+            GenericDICOMTools.editDICOMTag(self.path, tagValues)
             # Consider the case where XML fields are changed
-            if comparisonDicom.SeriesDescription != self.PydicomObject.SeriesDescription or comparisonDicom.SeriesNumber != self.PydicomObject.SeriesNumber:
-                changeXML = True
-                newSeriesID = str(self.PydicomObject.SeriesNumber) + "_" + str(self.PydicomObject.SeriesDescription)
-                self.seriesID = newSeriesID
-            else:
-                newSeriesID = oldSeriesID
-            if comparisonDicom.StudyDate != self.PydicomObject.StudyDate or comparisonDicom.StudyTime != self.PydicomObject.StudyTime or comparisonDicom.StudyDescription != self.PydicomObject.StudyDescription:
-                changeXML = True
-                newStudyID = str(self.PydicomObject.StudyDate) + "_" + str(self.PydicomObject.StudyTime).split(".")[0] + "_" + str(self.PydicomObject.StudyDescription)
-                self.studyID = newStudyID
-            else:
-                newStudyID = oldStudyID
-            if comparisonDicom.PatientID != self.PydicomObject.PatientID:
-                changeXML = True
-                newSubjectID = str(self.PydicomObject.PatientID)
-                self.subjectID = newSubjectID
-            else:
-                newSubjectID = oldSubjectID
+            changeXML = False
+            if editedTags:
+                newValues = _hierarchyValues(ReadDICOM_Image.getDicomHeader(self.path))
+                newSubjectID, newStudyID, newSeriesID, changeXML = _newParentIDs(oldValues, newValues, oldSubjectID, oldStudyID, oldSeriesID)
+                self.subjectID, self.studyID, self.seriesID = newSubjectID, newStudyID, newSeriesID
             if changeXML == True:
                 self.objWeasel.objXMLReader.moveImageInXMLFile(oldSubjectID, oldStudyID, oldSeriesID, newSubjectID, newStudyID, newSeriesID, self.path, '')
         except Exception as e:
@@ -1901,32 +2018,27 @@ class Image:
         try:
             if directory is None: directory=os.path.dirname(self.path)
             if filename is None: filename=self.seriesID
-            dicomHeader = nib.nifti1.Nifti1DicomExtension(2, self.PydicomObject)
-            niftiObj = nib.Nifti1Image(np.flipud(np.rot90(np.transpose(self.PixelArray))), affine=self.Affine)
-            # The transpose is necessary in this case to be in line with the rest of Weasel.
-            niftiObj.header.extensions.append(dicomHeader)
-            nib.save(niftiObj, directory + '/' + filename + '.nii.gz')
+            ExportDICOM_Image.writeNIfTI([self.path], directory + '/' + filename + '.nii.gz')
         except Exception as e:
             print('Error in Image.export_as_nifti: ' + str(e))
             logger.exception('Error in Image.export_as_nifti: ' + str(e))
 
-    def export_as_csv(self, directory=None, filename=None, columnHeaders=None):
+    def export_as_csv(self, directory=None, filename=None, columnHeaders=None, compressed=False):
         logger.info("Image.export_as_csv called")
         try:
-            if directory is None: directory = os.path.dirname(self.images[0])
-            if filename is None:
-                filename = os.path.join(directory, self.seriesID + '.csv')
-            else:
-                filename = os.path.join(directory, filename + '.csv')
-            table = self.PixelArray
-            if columnHeaders is None:
-                columnHeaders = []
-                counter = 0
-                for _ in table:
-                    counter += 1
-                    columnHeaders.append("Column" + str(counter))
-            df = pd.DataFrame(np.transpose(table), columns=columnHeaders)
-            df.to_csv(filename, index=False)
+            if directory is None: directory = os.path.dirname(self.path)
+            if filename is None: filename = self.seriesID
+            ExportDICOM_Image.writeTables([self.path], os.path.join(directory, filename), fileFormat='csv.gz' if compressed else 'csv', columnHeaders=columnHeaders)
         except Exception as e:
             print('Error in Image.export_as_csv: ' + str(e))
             logger.exception('Error in Image.export_as_csv: ' + str(e))
+
+    def export_as_numpy(self, directory=None, filename=None, compressed=False):
+        logger.info("Image.export_as_numpy called")
+        try:
+            if directory is None: directory = os.path.dirname(self.path)
+            if filename is None: filename = self.seriesID
+            ExportDICOM_Image.writeTables([self.path], os.path.join(directory, filename), fileFormat='npz' if compressed else 'npy')
+        except Exception as e:
+            print('Error in Image.export_as_numpy: ' + str(e))
+            logger.exception('Error in Image.export_as_numpy: ' + str(e))
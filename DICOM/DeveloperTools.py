@@ -8,6 +8,7 @@ import os
 import numpy as np
 import random
 import logging
+from concurrent.futures import ThreadPoolExecutor
 import DICOM.ReadDICOM_Image as ReadDICOM_Image
 import DICOM.SaveDICOM_Image as SaveDICOM_Image
 
@@ -34,30 +35,9 @@ class GenericDICOMTools:
                     _, series_uid = GenericDICOMTools.generateSeriesIDs(self, inputPath, seriesNumber=series_id, studyUID=study_uid)
                 elif (series_id is None) and (series_uid is not None):
                     series_id = int(str(ReadDICOM_Image.getDicomDataset(inputPath).SeriesNumber) + str(random.randint(0, 9999)))
-                newDataset = ReadDICOM_Image.getDicomDataset(inputPath)
                 derivedPath = SaveDICOM_Image.returnFilePath(inputPath, suffix, output_folder=output_dir)
-                SaveDICOM_Image.saveDicomToFile(newDataset, output_path=derivedPath)
-                # The next lines perform an overwrite operation over the copied images
-                if patient_id:
-                        SaveDICOM_Image.overwriteDicomFileTag(derivedPath, "PatientID", patient_id)
-                if study_uid:
-                    SaveDICOM_Image.overwriteDicomFileTag(derivedPath, "StudyInstanceUID", study_uid)
-                if study_name:
-                    SaveDICOM_Image.overwriteDicomFileTag(derivedPath, "StudyDescription", study_name)
-                instance_uid = SaveDICOM_Image.generateUIDs(newDataset, seriesNumber=series_id, studyUID=study_uid)[2]
-                SaveDICOM_Image.overwriteDicomFileTag(derivedPath, "SOPInstanceUID", instance_uid)
-                SaveDICOM_Image.overwriteDicomFileTag(derivedPath, "SeriesInstanceUID", series_uid)
-                SaveDICOM_Image.overwriteDicomFileTag(derivedPath, "SeriesNumber", series_id)
-                if series_name:
-                    SaveDICOM_Image.overwriteDicomFileTag(derivedPath, "SeriesDescription", series_name)
-                else:
-                    SaveDICOM_Image.overwriteDicomFileTag(derivedPath, "SeriesDescription", str(newDataset.SeriesDescription + suffix))
-                    #if hasattr(newDataset, "SeriesDescription"):
-                    #    SaveDICOM_Image.overwriteDicomFileTag(derivedPath, "SeriesDescription", str(newDataset.SeriesDescription + suffix))
-                    #elif hasattr(newDataset, "SequenceName"):
-                    #    SaveDICOM_Image.overwriteDicomFileTag(derivedPath, "SequenceName", str(newDataset.SequenceName + suffix))
-                    #elif hasattr(newDataset, "ProtocolName"):
-                    #    SaveDICOM_Image.overwriteDicomFileTag(derivedPath, "ProtocolName", str(newDataset.ProtocolName + suffix))
+                if not GenericDICOMTools.copyDicomFile(inputPath, derivedPath, series_id, series_uid, series_name, study_uid, study_name, patient_id, suffix):
+                    return None, None
                 newSeriesID = self.objXMLReader.insertNewImageInXMLFile(inputPath,
                                              derivedPath, suffix, newSeriesName=series_name, newStudyName=study_name, newSubjectName=patient_id)
             elif isinstance(inputPath, list) and os.path.exists(inputPath[0]):
@@ -67,33 +47,14 @@ class GenericDICOMTools:
                     _, series_uid = GenericDICOMTools.generateSeriesIDs(self, inputPath, seriesNumber=series_id, studyUID=study_uid)
                 elif (series_id is None) and (series_uid is not None):
                     series_id = int(str(ReadDICOM_Image.getDicomDataset(inputPath[0]).SeriesNumber) + str(random.randint(0, 9999)))
-                derivedPath = []
-                for path in inputPath:
-                    newDataset = ReadDICOM_Image.getDicomDataset(path)
-                    newFilePath = SaveDICOM_Image.returnFilePath(path, suffix, output_folder=output_dir)
-                    SaveDICOM_Image.saveDicomToFile(newDataset, output_path=newFilePath)
-                    derivedPath.append(newFilePath)
-                    # The next lines perform an overwrite operation over the copied images
-                    if patient_id:
-                        SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "PatientID", patient_id)
-                    if study_uid:
-                        SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "StudyInstanceUID", study_uid)
-                    if study_name:
-                        SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "StudyDescription", study_name)
-                    instance_uid = SaveDICOM_Image.generateUIDs(newDataset, seriesNumber=series_id, studyUID=study_uid)[2]
-                    SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "SOPInstanceUID", instance_uid)
-                    SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "SeriesInstanceUID", series_uid)
-                    SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "SeriesNumber", series_id)
-                    if series_name:
-                        SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "SeriesDescription", series_name)
-                    else:
-                        SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "SeriesDescription", str(newDataset.SeriesDescription + suffix))
-                        #if hasattr(newDataset, "SeriesDescription"):
-                        #    SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "SeriesDescription", str(newDataset.SeriesDescription + suffix))
-                        #elif hasattr(newDataset, "SequenceName"):
-                        #    SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "SequenceName", str(newDataset.SequenceName + suffix))
-                        #elif hasattr(newDataset, "ProtocolName"):
-                        #    SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "ProtocolName", str(newDataset.ProtocolName + suffix))
+                derivedPath = GenericDICOMTools.reserveFilePaths(inputPath, suffix, output_dir=output_dir)
+                def copyFile(index):
+                    return GenericDICOMTools.copyDicomFile(inputPath[index], derivedPath[index], series_id, series_uid, series_name, study_uid, study_name, patient_id, suffix)
+                with ThreadPoolExecutor(max_workers=ReadDICOM_Image.MAX_WORKERS) as executor:
+                    copied = list(executor.map(copyFile, range(len(inputPath))))
+                inputPath, derivedPath = GenericDICOMTools.copiedFilePaths(inputPath, derivedPath, copied)
+                if not derivedPath:
+                    return derivedPath, None
                 newSeriesID = self.objXMLReader.insertNewSeriesInXMLFile(
                                 inputPath, derivedPath, suffix, newSeriesName=series_name, newStudyName=study_name, newSubjectName=patient_id)
             return derivedPath, newSeriesID
@@ -148,22 +109,8 @@ class GenericDICOMTools:
                 for index, path in enumerate(imagePathList):
                     if progress_bar == True: 
                         self.progressBar.set_value(index+1)
-                    if patient_id:
-                        SaveDICOM_Image.overwriteDicomFileTag(path, "PatientID", patient_id)
-                    if study_uid:
-                        SaveDICOM_Image.overwriteDicomFileTag(path, "StudyInstanceUID", study_uid)
-                    if study_name:
-                        SaveDICOM_Image.overwriteDicomFileTag(path, "StudyDescription", study_name)
-                    SaveDICOM_Image.overwriteDicomFileTag(path, "SeriesInstanceUID", series_uid)
-                    SaveDICOM_Image.overwriteDicomFileTag(path, "SeriesNumber", series_id)
-                    SaveDICOM_Image.overwriteDicomFileTag(path, "SeriesDescription", series_name)
-                    #dataset = ReadDICOM_Image.getDicomDataset(path)
-                    #if hasattr(dataset, "SeriesDescription"):
-                    #    SaveDICOM_Image.overwriteDicomFileTag(path, "SeriesDescription", series_name)
-                    #elif hasattr(dataset, "SequenceName"):
-                    #    SaveDICOM_Image.overwriteDicomFileTag(path, "SequenceName", series_name)
-                    #elif hasattr(dataset, "ProtocolName"):
-                    #    SaveDICOM_Image.overwriteDicomFileTag(path, "ProtocolName", series_name)
+                    tagValues = GenericDICOMTools.copyTagValues(None, series_id, series_uid, series_name, study_uid, study_name, patient_id, suffix)
+                    SaveDICOM_Image.overwriteDicomFileTags(path, tagValues)
                 newImagePathList = imagePathList
                 self.objXMLReader.insertNewSeriesInXMLFile(
                                 originalPathList, newImagePathList, suffix, newSeriesName=series_name, newStudyName=study_name, newSubjectName=patient_id)
@@ -171,37 +118,90 @@ class GenericDICOMTools:
             else:
                 if progress_bar == True: 
                     self.progressBar.set_maximum(len(imagePathList))
-                for index, path in enumerate(imagePathList):
-                    if progress_bar == True: 
-                        self.progressBar.set_value(len(index+1))
-                    newDataset = ReadDICOM_Image.getDicomDataset(path)
-                    newFilePath = SaveDICOM_Image.returnFilePath(path, suffix)
-                    SaveDICOM_Image.saveDicomToFile(newDataset, output_path=newFilePath)
-                    # The next lines perform an overwrite operation over the copied images
-                    if patient_id:
-                        SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "PatientID", patient_id)
-                    if study_uid:
-                        SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "StudyInstanceUID", study_uid)
-                    if study_name:
-                        SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "StudyDescription", study_name)
-                    instance_uid = SaveDICOM_Image.generateUIDs(newDataset, seriesNumber=series_id, studyUID=study_uid)[2]
-                    SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "SOPInstanceUID", instance_uid)
-                    SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "SeriesInstanceUID", series_uid)
-                    SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "SeriesNumber", series_id)
-                    SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "SeriesDescription", series_name)
-                    #if hasattr(newDataset, "SeriesDescription"):
-                    #    SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "SeriesDescription", series_name)
-                    #elif hasattr(newDataset, "SequenceName"):
-                    #    SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "SequenceName", series_name)
-                    #elif hasattr(newDataset, "ProtocolName"):
-                    #    SaveDICOM_Image.overwriteDicomFileTag(newFilePath, "ProtocolName", series_name)
-                    newImagePathList.append(newFilePath)
-                self.objXMLReader.insertNewSeriesInXMLFile(imagePathList, newImagePathList, suffix, newSeriesName=series_name, newStudyName=study_name, newSubjectName=patient_id)
+                newImagePathList = GenericDICOMTools.reserveFilePaths(imagePathList, suffix)
+                def copyFile(index):
+                    return GenericDICOMTools.copyDicomFile(imagePathList[index], newImagePathList[index], series_id, series_uid, series_name, study_uid, study_name, patient_id, suffix)
+                copied = []
+                with ThreadPoolExecutor(max_workers=ReadDICOM_Image.MAX_WORKERS) as executor:
+                    for index, success in enumerate(executor.map(copyFile, range(len(imagePathList)))):
+                        copied.append(success)
+                        if progress_bar == True: 
+                            self.progressBar.set_value(index+1)
+                imagePathList, newImagePathList = GenericDICOMTools.copiedFilePaths(imagePathList, newImagePathList, copied)
+                if newImagePathList:
+                    self.objXMLReader.insertNewSeriesInXMLFile(imagePathList, newImagePathList, suffix, newSeriesName=series_name, newStudyName=study_name, newSubjectName=patient_id)
             return newImagePathList
         except Exception as e:
             print('Error in function GenericDICOMTools.mergeDicomIntoOneSeries: ' + str(e))
             logger.exception('Error in GenericDICOMTools.mergeDicomIntoOneSeries: ' + str(e))
 
+    def splitDicomIntoSeries(self, imagePathGroups, series_names, study_name=None, study_uid=None, patient_id=None, suffix="_Split", overwrite=False, progress_bar=False):
+        """
+        Writes each list of DICOM files in "imagePathGroups" into a new series named after the matching entry of "series_names".
+        All files of all groups are written in one pass and the XML file is updated once all files are written.
+        It creates copies if "overwrite=False" (default).
+        Returns the list of new file paths of each series.
+        """
+        logger.info("GenericDICOMTools.splitDicomIntoSeries called")
+        try:
+            (subjectID, studyID, _) = self.objXMLReader.getImageParentIDs(imagePathGroups[0][0])
+            firstSeriesNumber = GenericDICOMTools.nextSeriesNumber(self, subjectID, studyID)
+            seriesIDs = []
+            for index, imagePathList in enumerate(imagePathGroups):
+                seriesNumber, seriesUID, _ = SaveDICOM_Image.generateUIDs(ReadDICOM_Image.getDicomHeader(imagePathList[0]), seriesNumber=firstSeriesNumber+index, studyUID=study_uid)
+                seriesIDs.append((seriesNumber, seriesUID))
+            tasks = [(imagePath, groupIndex) for groupIndex, imagePathList in enumerate(imagePathGroups) for imagePath in imagePathList]
+            if progress_bar == True:
+                self.progress_bar(msg = ("<H4>Writing {} images into {} series</H4>").format(len(tasks), len(imagePathGroups)))
+                self.progressBar.set_maximum(len(tasks))
+            if overwrite:
+                newImagePathGroups = imagePathGroups
+                def writeFile(task):
+                    imagePath, groupIndex = task
+                    tagValues = GenericDICOMTools.copyTagValues(None, seriesIDs[groupIndex][0], seriesIDs[groupIndex][1], series_names[groupIndex], study_uid, study_name, patient_id, suffix)
+                    SaveDICOM_Image.overwriteDicomFileTags(imagePath, tagValues)
+            else:
+                newImagePathGroups = [GenericDICOMTools.reserveFilePaths(imagePathList, suffix) for imagePathList in imagePathGroups]
+                newImagePaths = [imagePath for newImagePathList in newImagePathGroups for imagePath in newImagePathList]
+                newImagePathIndex = {task: newImagePaths[index] for index, task in enumerate(tasks)}
+                def writeFile(task):
+                    imagePath, groupIndex = task
+                    return GenericDICOMTools.copyDicomFile(imagePath, newImagePathIndex[task], seriesIDs[groupIndex][0], seriesIDs[groupIndex][1], series_names[groupIndex], study_uid, study_name, patient_id, suffix)
+            copied = {}
+            with ThreadPoolExecutor(max_workers=ReadDICOM_Image.MAX_WORKERS) as executor:
+                for index, success in enumerate(executor.map(writeFile, tasks)):
+                    copied[tasks[index]] = success
+                    if progress_bar == True:
+                        self.progressBar.set_value(index+1)
+            xmlGroups = list(zip(imagePathGroups, newImagePathGroups))
+            if not overwrite:
+                # The copies that failed are left out of the XML file
+                xmlGroups = [GenericDICOMTools.copiedFilePaths(imagePathList, newImagePathList, [copied[(imagePath, groupIndex)] for imagePath in imagePathList])
+                             for groupIndex, (imagePathList, newImagePathList) in enumerate(xmlGroups)]
+                newImagePathGroups = [newImagePathList for _, newImagePathList in xmlGroups]
+            # The XML file is only updated after all files are written
+            for groupIndex, (imagePathList, newImagePathList) in enumerate(xmlGroups):
+                if newImagePathList:
+                    self.objXMLReader.insertNewSeriesInXMLFile(imagePathList, newImagePathList, suffix, newSeriesName=series_names[groupIndex], newStudyName=study_name, newSubjectName=patient_id)
+            if overwrite:
+                self.objXMLReader.removeMultipleImagesFromXMLFile([imagePath for imagePath, _ in tasks])
+            return newImagePathGroups
+        except Exception as e:
+            print('Error in function GenericDICOMTools.splitDicomIntoSeries: ' + str(e))
+            logger.exception('Error in GenericDICOMTools.splitDicomIntoSeries: ' + str(e))
+
+    def nextSeriesNumber(self, subjectID, studyID):
+        """
+        Returns the series number that follows the largest numeric series number of the study.
+        Series whose ID doesn't start with a number are ignored.
+        """
+        seriesNumbers = [0]
+        for seriesXML in self.objXMLReader.getStudy(subjectID, studyID):
+            seriesNumber = seriesXML.attrib['id'].split('_')[0]
+            if seriesNumber.isdigit():
+                seriesNumbers.append(int(seriesNumber))
+        return max(seriesNumbers) + 1
+
     def generateSeriesIDs(self, inputPath, seriesNumber=None, studyUID=None):
         """
         This function generates and returns a SeriesUID and an InstanceUID.
@@ -214,12 +214,12 @@ class GenericDICOMTools:
                 dataset = PixelArrayDICOMTools.getDICOMobject(inputPath)
                 if seriesNumber is None:
                     (subjectID, studyID, seriesID) = self.objXMLReader.getImageParentIDs(inputPath)
-                    seriesNumber = str(int(self.objXMLReader.getStudy(subjectID, studyID)[-1].attrib['id'].split('_')[0]) + 1)
+                    seriesNumber = str(GenericDICOMTools.nextSeriesNumber(self, subjectID, studyID))
             elif isinstance(inputPath, list) and os.path.exists(inputPath[0]):
                 dataset = PixelArrayDICOMTools.getDICOMobject(inputPath[0])
                 if seriesNumber is None:
                     (subjectID, studyID, seriesID) = self.objXMLReader.getImageParentIDs(inputPath[0])
-                    seriesNumber = str(int(self.objXMLReader.getStudy(subjectID, studyID)[-1].attrib['id'].split('_')[0]) + 1)
+                    seriesNumber = str(GenericDICOMTools.nextSeriesNumber(self, subjectID, studyID))
             ids = SaveDICOM_Image.generateUIDs(dataset, seriesNumber=seriesNumber, studyUID=studyUID)
             seriesID = ids[0]
             seriesUID = ids[1]
@@ -229,22 +229,114 @@ class GenericDICOMTools:
             logger.exception('Error in GenericDICOMTools.generateSeriesIDs: ' + str(e))
 
     @staticmethod
-    def editDICOMTag(inputPath, dicomTag, newValue):
+    def reserveFilePaths(inputPath, suffix, output_dir=None):
+        """
+        Returns the list of new file paths for the copies of the DICOM files in "inputPath".
+        An empty file is created at each new path, so that files copied concurrently never get the same name.
+        """
+        logger.info("GenericDICOMTools.reserveFilePaths called")
+        try:
+            outputPathList = []
+            for path in inputPath:
+                newFilePath = SaveDICOM_Image.returnFilePath(path, suffix, output_folder=output_dir)
+                open(newFilePath, 'ab').close()
+                outputPathList.append(newFilePath)
+            return outputPathList
+        except Exception as e:
+            print('Error in function GenericDICOMTools.reserveFilePaths: ' + str(e))
+            logger.exception('Error in GenericDICOMTools.reserveFilePaths: ' + str(e))
+
+    @staticmethod
+    def copyDicomFile(inputPath, outputPath, series_id, series_uid, series_name=None, study_uid=None, study_name=None, patient_id=None, suffix=""):
+        """
+        Copies the DICOM file "inputPath" into "outputPath" with the tags of the new series.
+        The pixel data is streamed from the original file without being decoded, unless the file can only be copied through pydicom.
+        Returns True if the copy was written. Otherwise "outputPath" is deleted and False is returned.
+        """
+        logger.info("GenericDICOMTools.copyDicomFile called")
+        try:
+            tagValues = GenericDICOMTools.copyTagValues(ReadDICOM_Image.getDicomHeader(inputPath), series_id, series_uid, series_name, study_uid, study_name, patient_id, suffix)
+            if tagValues is None:
+                raise ValueError('Could not read the header of ' + inputPath)
+            if not SaveDICOM_Image.copyDicomFile(inputPath, outputPath, tagValues):
+                newDataset = ReadDICOM_Image.getDicomDataset(inputPath)
+                if newDataset is None:
+                    raise ValueError('Could not read ' + inputPath)
+                SaveDICOM_Image.setDatasetTags(newDataset, tagValues)
+                if not SaveDICOM_Image.saveDicomToFile(newDataset, output_path=outputPath):
+                    raise IOError('Could not write ' + outputPath)
+            return True
+        except Exception as e:
+            print('Error in function GenericDICOMTools.copyDicomFile: ' + str(e))
+            logger.exception('Error in GenericDICOMTools.copyDicomFile: ' + str(e))
+            # Remove the reserved or partially written copy
+            if os.path.exists(outputPath):
+                os.remove(outputPath)
+            return False
+
+    @staticmethod
+    def copiedFilePaths(inputPath, outputPath, copied):
+        """
+        Returns the lists "inputPath" and "outputPath" without the files whose copy or derived file failed, as given by the list of booleans "copied".
+        """
+        failedPaths = [path for path, success in zip(outputPath, copied) if not success]
+        if failedPaths:
+            print('Weasel could not write {} DICOM files: '.format(len(failedPaths)) + ', '.join(failedPaths))
+            logger.error('GenericDICOMTools could not write {} DICOM files: '.format(len(failedPaths)) + ', '.join(failedPaths))
+        return ([path for path, success in zip(inputPath, copied) if success],
+                [path for path, success in zip(outputPath, copied) if success])
+
+    @staticmethod
+    def copyTagValues(dataset, series_id, series_uid, series_name=None, study_uid=None, study_name=None, patient_id=None, suffix=""):
+        """
+        Returns the dictionary {dicomTag: newValue} of the tags that are changed when a DICOM file is copied or merged into a new series.
+        If "dataset" is given, a new SOPInstanceUID is generated and the default SeriesDescription is based on the one in "dataset".
+        """
+        logger.info("GenericDICOMTools.copyTagValues called")
+        try:
+            tagValues = {}
+            if patient_id:
+                tagValues["PatientID"] = patient_id
+            if study_uid:
+                tagValues["StudyInstanceUID"] = study_uid
+            if study_name:
+                tagValues["StudyDescription"] = study_name
+            if dataset is not None:
+                tagValues["SOPInstanceUID"] = SaveDICOM_Image.generateUIDs(dataset, seriesNumber=series_id, studyUID=study_uid)[2]
+            tagValues["SeriesInstanceUID"] = series_uid
+            tagValues["SeriesNumber"] = series_id
+            if series_name:
+                tagValues["SeriesDescription"] = series_name
+            elif dataset is not None:
+                tagValues["SeriesDescription"] = str(dataset.SeriesDescription + suffix)
+            return tagValues
+        except Exception as e:
+            print('Error in function GenericDICOMTools.copyTagValues: ' + str(e))
+            logger.exception('Error in GenericDICOMTools.copyTagValues: ' + str(e))
+
+    @staticmethod
+    def editDICOMTag(inputPath, dicomTag, newValue=None):
         """
         Overwrites all "dicomTag" of the DICOM files in "inputPath"
         with "newValue".
+        "dicomTag" can also be a dictionary {dicomTag: newValue, ...} or a list of tags 
+        with the corresponding list of values in "newValue". All tags are then written in one pass per file.
         """
         logger.info("GenericDICOMTools.editDICOMTag called")
         try:
+            if isinstance(dicomTag, dict):
+                tagValues = dicomTag
+            elif isinstance(dicomTag, list) and isinstance(newValue, list):
+                tagValues = dict(zip(dicomTag, newValue))
+            else:
+                tagValues = {dicomTag: newValue}
             if isinstance(inputPath, str) and os.path.exists(inputPath):
-                SaveDICOM_Image.overwriteDicomFileTag(inputPath, dicomTag, newValue)
+                SaveDICOM_Image.overwriteDicomFileTags(inputPath, tagValues)
             elif isinstance(inputPath, list) and os.path.exists(inputPath[0]):
-                for path in inputPath:
-                    SaveDICOM_Image.overwriteDicomFileTag(path, dicomTag, newValue)
+                SaveDICOM_Image.overwriteDicomFileTags(inputPath, tagValues)
         except Exception as e:
             print('Error in GenericDICOMTools.editDICOMTag: ' + str(e))
             logger.exception('Error in GenericDICOMTools.editDICOMTag: ' + str(e))
-        
 
 class PixelArrayDICOMTools:
     """
@@ -258,14 +350,16 @@ class PixelArrayDICOMTools:
     def getPixelArrayFromDICOM(inputPath):
         """
         Returns the PixelArray of the DICOM file(s) in "inputPath".
+        The arrays are served from the session-wide pixel array cache and are read-only.
+        Call copy() on the result before modifying it.
         """
         logger.info("PixelArrayDICOMTools.getPixelArrayFromDICOM called")
         try:
             if isinstance(inputPath, str) and os.path.exists(inputPath):
-                pixelArray = ReadDICOM_Image.returnPixelArray(inputPath)
+                pixelArray = ReadDICOM_Image.returnCachedPixelArray(inputPath)
                 return np.squeeze(pixelArray)
             elif isinstance(inputPath, list) and os.path.exists(inputPath[0]):
-                pixelArray = ReadDICOM_Image.returnSeriesPixelArray(inputPath)
+                pixelArray = ReadDICOM_Image.returnCachedSeriesPixelArray(inputPath)
                 return np.squeeze(pixelArray)
             else:
                 return None
@@ -273,6 +367,24 @@ class PixelArrayDICOMTools:
             print('Error in PixelArrayDICOMTools.getPixelArrayFromDICOM: ' + str(e))
             logger.exception('Error in PixelArrayDICOMTools.getPixelArrayFromDICOM: ' + str(e))
 
+    @staticmethod
+    def getVolumeView(inputPath):
+        """
+        Returns a read-only, memory-mapped view of the PixelArray of the uncompressed DICOM file(s) in "inputPath".
+        Slices are read from disk and rescaled only when the view is indexed, eg. view[10] or view[::4, 100:200, :].
+        """
+        logger.info("PixelArrayDICOMTools.getVolumeView called")
+        try:
+            if isinstance(inputPath, str) and os.path.exists(inputPath):
+                return ReadDICOM_Image.getVolumeView([inputPath])
+            elif isinstance(inputPath, list) and os.path.exists(inputPath[0]):
+                return ReadDICOM_Image.getVolumeView(inputPath)
+            else:
+                return None
+        except Exception as e:
+            print('Error in PixelArrayDICOMTools.getVolumeView: ' + str(e))
+            logger.exception('Error in PixelArrayDICOMTools.getVolumeView: ' + str(e))
+
     @staticmethod
     def getDICOMobject(inputPath):
         """
@@ -292,6 +404,46 @@ class PixelArrayDICOMTools:
             print('Error in PixelArrayDICOMTools.getDICOMobject: ' + str(e))
             logger.exception('Error in PixelArrayDICOMTools.getDICOMobject: ' + str(e))
 
+    @staticmethod
+    def getPixelArrayCacheInfo():
+        """
+        Returns a dictionary with the hits, misses and bytes held by the session-wide pixel array cache.
+        """
+        logger.info("PixelArrayDICOMTools.getPixelArrayCacheInfo called")
+        try:
+            return ReadDICOM_Image.pixelArrayCache.info()
+        except Exception as e:
+            print('Error in PixelArrayDICOMTools.getPixelArrayCacheInfo: ' + str(e))
+            logger.exception('Error in PixelArrayDICOMTools.getPixelArrayCacheInfo: ' + str(e))
+
+    @staticmethod
+    def setPixelArrayCacheSize(maxBytes):
+        """
+        Sets the memory budget (in bytes) of the session-wide pixel array cache.
+        """
+        logger.info("PixelArrayDICOMTools.setPixelArrayCacheSize called")
+        try:
+            ReadDICOM_Image.setPixelArrayCacheSize(maxBytes)
+        except Exception as e:
+            print('Error in PixelArrayDICOMTools.setPixelArrayCacheSize: ' + str(e))
+            logger.exception('Error in PixelArrayDICOMTools.setPixelArrayCacheSize: ' + str(e))
+
+    @staticmethod
+    def clearPixelArrayCache(inputPath=None):
+        """
+        Removes the cached PixelArray of the DICOM file(s) in "inputPath", or all cached arrays if "inputPath" is None.
+        """
+        logger.info("PixelArrayDICOMTools.clearPixelArrayCache called")
+        try:
+            if isinstance(inputPath, list):
+                for imagePath in inputPath:
+                    ReadDICOM_Image.invalidatePixelArray(imagePath)
+            else:
+                ReadDICOM_Image.invalidatePixelArray(inputPath)
+        except Exception as e:
+            print('Error in PixelArrayDICOMTools.clearPixelArrayCache: ' + str(e))
+            logger.exception('Error in PixelArrayDICOMTools.clearPixelArrayCache: ' + str(e))
+
     def writeNewPixelArray(self, pixelArray, inputPath, suffix, series_id=None, series_uid=None, series_name=None, parametric_map=None, colourmap=None, output_dir=None):
         """
         Saves the "pixelArray" into new DICOM files with a new series, based
@@ -330,13 +482,18 @@ class PixelArrayDICOMTools:
             if numImages == 1:
                 if isinstance(inputPath, list):
                     inputPath = inputPath[0]
-                SaveDICOM_Image.saveNewSingleDicomImage(derivedImagePathList[0], (''.join(inputPath)), derivedImageList[0], suffix, series_id=series_id, series_uid=series_uid, series_name=series_name, list_refs_path=[(''.join(inputPath))], parametric_map=parametric_map, colourmap=colourmap)
+                written = SaveDICOM_Image.saveNewSingleDicomImage(derivedImagePathList[0], (''.join(inputPath)), derivedImageList[0], suffix, series_id=series_id, series_uid=series_uid, series_name=series_name, list_refs_path=[(''.join(inputPath))], parametric_map=parametric_map, colourmap=colourmap)
+                if not written:
+                    return []
                 # Record derived image in XML file
                 self.objXMLReader.insertNewImageInXMLFile((''.join(inputPath)), derivedImagePathList[0], suffix, newSeriesName=series_name)
             else:
-                SaveDICOM_Image.saveDicomNewSeries(derivedImagePathList, inputPath, derivedImageList, suffix, series_id=series_id, series_uid=series_uid, series_name=series_name, list_refs_path=[inputPath], parametric_map=parametric_map, colourmap=colourmap)
+                written = SaveDICOM_Image.saveDicomNewSeries(derivedImagePathList, inputPath, derivedImageList, suffix, series_id=series_id, series_uid=series_uid, series_name=series_name, list_refs_path=[inputPath], parametric_map=parametric_map, colourmap=colourmap)
+                # The files that could not be written are left out of the XML file
+                inputPath, derivedImagePathList = GenericDICOMTools.copiedFilePaths(inputPath, derivedImagePathList, written)
                 # Insert new series into the DICOM XML file
-                self.objXMLReader.insertNewSeriesInXMLFile(inputPath, derivedImagePathList, suffix, newSeriesName=series_name)            
+                if derivedImagePathList:
+                    self.objXMLReader.insertNewSeriesInXMLFile(inputPath, derivedImagePathList, suffix, newSeriesName=series_name)            
                 
             return derivedImagePathList
 
@@ -0,0 +1,214 @@
+"""
+Collection of functions that export the content of DICOM files (pixel arrays and headers) to other file formats, such as NIfTI, CSV and NumPy.
+"""
+
+import os
+import gzip
+import threading
+import zipfile
+import numpy as np
+import nibabel as nib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import DICOM.ReadDICOM_Image as ReadDICOM_Image
+import logging
+logger = logging.getLogger(__name__)
+
+# Number of slices read, oriented and written at a time when exporting a series
+EXPORT_SLAB_SIZE = 16
+# Printf format of the CSV values: 9 significant digits recover every float32 pixel value exactly
+CSV_FORMAT = '%.9g'
+# Compression level of the .csv.gz and .npz files, the same fast level nibabel uses for .nii.gz
+COMPRESS_LEVEL = 1
+
+
+def writeNIfTI(imagePathList, filePath, slabSize=EXPORT_SLAB_SIZE, progress=None, workers=None):
+    """This method writes the Image/Pixel arrays of the DICOM files in imagePathList into the NIfTI file filePath (.nii or .nii.gz).
+
+        The volume is never held in memory: the header is written first and the slices are then read, rescaled and appended
+        to the file `slabSize` at a time. The voxel (i, j, k) of the NIfTI file is pixel (i, j) of slice k as returned by
+        `getPixelArray`, so no rotation or flip is needed. Only the header of the first file is read for the affine
+        (unless the geometry of the series is already cached) and for the DICOM extension. The slices of each slab are decoded on `workers` threads.
+        If given, progress(numberSlices) is called after each slab is written, with the number of frames of the slab.
+        If the export fails, the partial file is deleted and the exception is raised again.
+    """
+    logger.info("ExportDICOM_Image.writeNIfTI called")
+    try:
+        firstHeader = ReadDICOM_Image.getDicomHeader(imagePathList[0])
+        numberSlices = countSlices(imagePathList)
+        shape = (int(firstHeader.Columns), int(firstHeader.Rows))
+        if numberSlices > 1: shape += (numberSlices,)
+        # The geometry of the whole series is reused if cached, otherwise only the first header is needed
+        geometry = ReadDICOM_Image.getSeriesGeometry(imagePathList, readHeaders=False) or ReadDICOM_Image.getSeriesGeometry(imagePathList[:1])
+        affine = geometry.affines[0]
+        niftiObj = nib.Nifti1Image(np.empty((0, 0, 0), dtype=np.float32), affine)
+        header = niftiObj.header
+        header.set_data_shape(shape)
+        header.set_data_dtype(np.float32)
+        header.set_slope_inter(1.0, 0.0)
+        header.extensions.append(nib.nifti1.Nifti1DicomExtension(2, firstHeader))
+        with nib.openers.Opener(filePath, 'wb') as fileObj:
+            header.write_to(fileObj)
+            dataOffset = header.get_data_offset()
+            fileObj.write(b'\x00' * (dataOffset - fileObj.tell()))
+            for start in range(0, len(imagePathList), slabSize):
+                slab = ReadDICOM_Image.returnSeriesPixelArray(imagePathList[start:start+slabSize], workers=workers)
+                slab = slab.reshape((-1,) + shape[:2])
+                # NIfTI voxels are stored in Fortran order, i.e. the first in-plane index varies fastest
+                fileObj.write(np.ascontiguousarray(slab.transpose(0, 2, 1), dtype=np.float32).data)
+                if progress is not None: progress(len(slab))
+                del slab
+    except Exception as e:
+        print('Error in function ExportDICOM_Image.writeNIfTI: ' + str(e))
+        logger.exception('Error in ExportDICOM_Image.writeNIfTI: ' + str(e))
+        removeFiles([filePath])
+        raise
+
+
+def writeTables(imagePathList, filePath, fileFormat='csv', columnHeaders=None, slabSize=EXPORT_SLAB_SIZE, progress=None, workers=None):
+    """This method writes the Image/Pixel arrays of the DICOM files in imagePathList as tables. filePath has no extension.
+
+        fileFormat is one of:
+            - 'csv' or 'csv.gz': one (gzipped) CSV file per slice, filePath_000000.csv and so on, or filePath.csv if
+              there is only one slice. Each row is one column of the pixel array, as in `Image.export_as_csv`.
+            - 'npy': one NumPy file with the pixel arrays of all slices.
+            - 'npz': one compressed NumPy archive with the same array stored as 'PixelArray'.
+        The slices are read `slabSize` at a time and written straight from the numpy arrays. The CSV header row is only
+        built once. If given, progress(numberSlices) is called after each slab is written, with the number of frames of the slab.
+        If the export fails, the files written so far are deleted and the exception is raised again.
+    """
+    logger.info("ExportDICOM_Image.writeTables called")
+    outputPaths = []
+    try:
+        firstHeader = ReadDICOM_Image.getDicomHeader(imagePathList[0])
+        numberSlices = countSlices(imagePathList)
+        shape = (int(firstHeader.Columns), int(firstHeader.Rows))
+        if fileFormat in ('csv', 'csv.gz'):
+            if columnHeaders is None:
+                columnHeaders = ["Column" + str(counter) for counter in range(1, shape[0] + 1)]
+            headerRow = ','.join(columnHeaders)
+            sliceIndex = 0
+            for start in range(0, len(imagePathList), slabSize):
+                slab = ReadDICOM_Image.returnSeriesPixelArray(imagePathList[start:start+slabSize], workers=workers)
+                slab = slab.reshape((-1,) + shape)
+                for pixelArray in slab:
+                    if numberSlices == 1:
+                        fileName = filePath + '.' + fileFormat
+                    else:
+                        fileName = filePath + '_' + str(sliceIndex).zfill(6) + '.' + fileFormat
+                    outputPaths.append(fileName)
+                    with (gzip.open(fileName, 'wb', compresslevel=COMPRESS_LEVEL) if fileFormat == 'csv.gz' else open(fileName, 'wb')) as fileObj:
+                        np.savetxt(fileObj, np.transpose(pixelArray), fmt=CSV_FORMAT, delimiter=',', header=headerRow, comments='')
+                    sliceIndex += 1
+                if progress is not None: progress(len(slab))
+        elif fileFormat in ('npy', 'npz'):
+            if numberSlices > 1: shape = (numberSlices,) + shape
+            arrayHeader = {'descr': np.lib.format.dtype_to_descr(np.dtype(np.float32)), 'fortran_order': False, 'shape': shape}
+            outputPaths.append(filePath + '.' + fileFormat)
+            if fileFormat == 'npy':
+                archive = None
+                fileObj = open(filePath + '.npy', 'wb')
+            else:
+                # Same layout as np.savez_compressed, but the array is compressed slab by slab
+                archive = zipfile.ZipFile(filePath + '.npz', 'w', compression=zipfile.ZIP_DEFLATED,
+                                          compresslevel=COMPRESS_LEVEL, allowZip64=True)
+                fileObj = archive.open('PixelArray.npy', 'w', force_zip64=True)
+            try:
+                np.lib.format.write_array_header_1_0(fileObj, arrayHeader)
+                for start in range(0, len(imagePathList), slabSize):
+                    slab = ReadDICOM_Image.returnSeriesPixelArray(imagePathList[start:start+slabSize], workers=workers)
+                    slab = slab.reshape((-1,) + shape[-2:])
+                    fileObj.write(np.ascontiguousarray(slab, dtype=np.float32).data)
+                    if progress is not None: progress(len(slab))
+            finally:
+                fileObj.close()
+                if archive is not None: archive.close()
+        else:
+            raise ValueError("Unknown table format '" + str(fileFormat) + "'. Use 'csv', 'csv.gz', 'npy' or 'npz'.")
+    except Exception as e:
+        print('Error in function ExportDICOM_Image.writeTables: ' + str(e))
+        logger.exception('Error in ExportDICOM_Image.writeTables: ' + str(e))
+        removeFiles(outputPaths)
+        raise
+
+
+def countSlices(imagePathList):
+    """This method returns the number of slices of the DICOM files in imagePathList, counting each frame of 
+        a multiframe file, from the header of the first file.
+    """
+    try:
+        return len(imagePathList) * int(getattr(ReadDICOM_Image.getDicomHeader(imagePathList[0]), 'NumberOfFrames', 1) or 1)
+    except Exception as e:
+        logger.error('Error in ExportDICOM_Image.countSlices: ' + str(e))
+        return len(imagePathList)
+
+
+def removeFiles(filePathList):
+    """This method deletes the files in filePathList that exist, such as the partial output of a failed export."""
+    for filePath in filePathList:
+        try:
+            if os.path.exists(filePath): os.remove(filePath)
+        except OSError as e:
+            logger.error('Error in ExportDICOM_Image.removeFiles: ' + str(e))
+
+
+def exportFiles(writeFunction, exportList, objWeasel=None, workers=None, msg="Exporting series", **kwargs):
+    """This method calls writeFunction(imagePathList, filePath, progress=..., workers=..., **kwargs) for every tuple
+        (imagePathList, filePath) in exportList, on a pool of worker threads.
+        If objWeasel is given, one progress bar reports the number of slices (frames) written across all files.
+        The progress bar is only updated from the calling thread.
+        A file that fails doesn't stop the others. Returns the list of file paths that could not be written.
+    """
+    logger.info("ExportDICOM_Image.exportFiles called")
+    try:
+        if len(exportList) == 0: return []
+        totalSlices = sum(countSlices(imagePathList) for imagePathList, _ in exportList)
+        slicesWritten = [0]
+        lock = threading.Lock()
+        def progress(numberSlices):
+            with lock:
+                slicesWritten[0] += numberSlices
+        if objWeasel is not None:
+            objWeasel.progress_bar(max=totalSlices, index=0, msg=msg)
+        workers = workers or ReadDICOM_Image.MAX_WORKERS
+        # The threads are shared between the files exported and the slices decoded within each file
+        decodeWorkers = max(1, workers // len(exportList))
+        failedFiles = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {executor.submit(writeFunction, imagePathList, filePath, progress=progress, workers=decodeWorkers, **kwargs): filePath
+                       for imagePathList, filePath in exportList}
+            notDone = set(pending)
+            while notDone:
+                done, notDone = wait(notDone, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # The write functions log their own errors and delete their partial output
+                    if future.exception() is not None: failedFiles.append(pending[future])
+                if objWeasel is not None:
+                    objWeasel.progressBar.set_value(min(slicesWritten[0], totalSlices))
+        if objWeasel is not None:
+            objWeasel.close_progress_bar()
+        return [filePath for _, filePath in exportList if filePath in failedFiles]
+    except Exception as e:
+        print('Error in function ExportDICOM_Image.exportFiles: ' + str(e))
+        logger.exception('Error in ExportDICOM_Image.exportFiles: ' + str(e))
+        return [filePath for _, filePath in exportList]
+
+
+def exportNIfTIFiles(exportList, objWeasel=None, workers=None, slabSize=EXPORT_SLAB_SIZE):
+    """This method writes several NIfTI files concurrently.
+        exportList is a list of tuples (imagePathList, filePath), see `exportFiles`.
+        Returns the list of file paths that could not be written.
+    """
+    logger.info("ExportDICOM_Image.exportNIfTIFiles called")
+    return exportFiles(writeNIfTI, exportList, objWeasel=objWeasel, workers=workers,
+                msg="Exporting {} series to NIfTI".format(len(exportList)), slabSize=slabSize)
+
+
+def exportTables(exportList, fileFormat='csv', columnHeaders=None, objWeasel=None, workers=None, slabSize=EXPORT_SLAB_SIZE):
+    """This method writes the tables of several series concurrently, in one of the formats of `writeTables`.
+        exportList is a list of tuples (imagePathList, filePath), where filePath has no extension, see `exportFiles`.
+        Returns the list of file paths (without extension) that could not be written.
+    """
+    logger.info("ExportDICOM_Image.exportTables called")
+    return exportFiles(writeTables, exportList, objWeasel=objWeasel, workers=workers,
+                msg="Exporting {} series to {}".format(len(exportList), fileFormat.upper()),
+                fileFormat=fileFormat, columnHeaders=columnHeaders, slabSize=slabSize)
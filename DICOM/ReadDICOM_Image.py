@@ -3,8 +3,12 @@ Collection of functions that read DICOM files and return meaningful content stor
 """
 
 import os
+import operator
 import struct
+import threading
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime
 import pydicom
 from nibabel.affines import apply_affine
@@ -12,6 +16,504 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+class DicomFileCache:
+    """
+    Process-wide LRU cache of content read from DICOM files.
+
+    Entries are keyed by file path and are only reused while the file size and the
+    modification time (in nanoseconds) match the values recorded when the content was read.
+    The cache is bounded by `maxBytes` and the least recently used entries are evicted first.
+    Subclasses implement `load`, which returns the content of a file and its cost in bytes.
+    """
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.bytesHeld = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return '{}(files={}, bytes={}, hits={}, misses={})'.format(
+            self.__class__.__name__, len(self._entries), self.bytesHeld, self.hits, self.misses)
+
+    def load(self, imagePath):
+        raise NotImplementedError
+
+    def get(self, imagePath):
+        """Returns the cached content of the DICOM file in imagePath, reading it from disk only if needed."""
+        key = os.path.normpath(imagePath)
+        fileStat = os.stat(key)
+        signature = (fileStat.st_size, fileStat.st_mtime_ns)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        content, numberBytes = self.load(key)
+        with self._lock:
+            self._discard(key)
+            if numberBytes <= self.maxBytes:
+                self._entries[key] = (signature, content, numberBytes)
+                self.bytesHeld += numberBytes
+                self._evict()
+        return content
+
+    def invalidate(self, imagePath=None):
+        """Drops the cached entry of imagePath, or of all files if imagePath is None."""
+        with self._lock:
+            self.invalidations += 1
+            if imagePath is None:
+                self._entries.clear()
+                self.bytesHeld = 0
+            else:
+                self._discard(os.path.normpath(imagePath))
+
+    def resize(self, maxBytes):
+        """Sets a new memory cap and evicts the least recently used entries that no longer fit."""
+        with self._lock:
+            self.maxBytes = maxBytes
+            self._evict()
+
+    def info(self):
+        """Returns a dictionary with the hit and miss counters and the memory held by the cache."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'files': len(self._entries),
+                    'bytesHeld': self.bytesHeld, 'maxBytes': self.maxBytes}
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytesHeld -= entry[2]
+
+    def _evict(self):
+        while self._entries and self.bytesHeld > self.maxBytes:
+            _, entry = self._entries.popitem(last=False)
+            self.bytesHeld -= entry[2]
+
+
+class DicomHeaderCache(DicomFileCache):
+    """
+    Cache of DICOM headers, read with `stop_before_pixels=True`.
+    The cost of each entry is the number of header bytes read from the file.
+
+    The datasets handed out are shared between callers and must not be modified.
+    Use `getDicomDataset` to get a copy that can be edited and saved.
+    """
+    def __init__(self, maxBytes=256*1024*1024):
+        super().__init__(maxBytes)
+
+    def load(self, imagePath):
+        with open(imagePath, 'rb') as fp:
+            dataset = pydicom.dcmread(fp, stop_before_pixels=True)
+            numberBytes = fp.tell()
+        return dataset, numberBytes
+
+
+class PixelArrayCache(DicomFileCache):
+    """
+    Cache of decoded and rescaled pixel arrays, as returned by `returnPixelArray`.
+    The cost of each entry is the size of the array in bytes.
+
+    The arrays handed out are read-only and shared between callers.
+    Call `copy()` on the array before modifying it.
+    """
+    def __init__(self, maxBytes=512*1024*1024):
+        super().__init__(maxBytes)
+
+    def load(self, imagePath):
+        pixelArray = getPixelArray(getDicomDataset(imagePath))
+        if pixelArray is None:
+            raise ValueError('no pixel array could be read from ' + imagePath)
+        pixelArray.setflags(write=False)
+        return pixelArray, pixelArray.nbytes
+
+
+class DicomVolumeView:
+    """
+    Read-only, lazily paged view of the Image/Pixel arrays of a list of uncompressed DICOM files.
+
+    The byte offset, dtype and shape of the PixelData of each file are recorded once, from a header-only read.
+    Indexing the view maps the requested slices with `numpy.memmap` and applies the rescale slope and intercept
+    of each slice on demand, so only the slices accessed are read from disk. The slices have the same
+    orientation as the arrays returned by `getPixelArray`, so multiframe files are only accepted if they are
+    enhanced (with a PerFrameFunctionalGroupsSequence).
+    """
+    _VR_WITH_LONG_LENGTH = (b'OB', b'OD', b'OF', b'OL', b'OV', b'OW', b'SQ', b'UC', b'UN', b'UR', b'UT')
+
+    def __init__(self, imagePathList, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self._slices = [] # (path, offset, storedDtype, frameShape, frame index or None, slope, intercept)
+        for imagePath in imagePathList:
+            self._slices.extend(self._readLayout(imagePath))
+        if not self._slices:
+            raise ValueError('no slices with uncompressed pixel data were found')
+        frameShapes = set(item[3] for item in self._slices)
+        if len(frameShapes) > 1:
+            raise ValueError('the slices do not have the same number of rows and columns')
+        rows, columns = frameShapes.pop()
+        self.shape = (len(self._slices), columns, rows)
+
+    def __repr__(self):
+        return '{}(shape={}, dtype={})'.format(self.__class__.__name__, self.shape, self.dtype)
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __array__(self, dtype=None):
+        volumeArray = self[:]
+        return volumeArray if dtype is None else volumeArray.astype(dtype, copy=False)
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        sliceIndex, frameIndex = index[0], index[1:]
+        if isinstance(sliceIndex, (int, np.integer)):
+            return self.readSlice(sliceIndex)[frameIndex]
+        selectedSlices = np.arange(self.shape[0])[sliceIndex]
+        volumeArray = None
+        for position, number in enumerate(selectedSlices):
+            sliceArray = self.readSlice(number)[frameIndex]
+            if volumeArray is None:
+                volumeArray = np.empty((len(selectedSlices),) + sliceArray.shape, dtype=self.dtype)
+            volumeArray[position] = sliceArray
+        if volumeArray is None:
+            volumeArray = np.empty((0,) + np.empty(self.shape[1:])[frameIndex].shape, dtype=self.dtype)
+        return volumeArray
+
+    def readSlice(self, number):
+        """Returns the rescaled Image/Pixel array of the slice in position number of the volume"""
+        imagePath, offset, storedDtype, frameShape, frame, slope, intercept = self._slices[number]
+        numberValues = frameShape[0] * frameShape[1]
+        frameOffset = offset + (0 if frame is None else frame * numberValues * storedDtype.itemsize)
+        storedArray = np.memmap(imagePath, dtype=storedDtype, mode='r', offset=frameOffset, shape=frameShape)
+        sliceArray = storedArray.astype(self.dtype)
+        del storedArray
+        sliceArray *= slope
+        sliceArray += intercept
+        return np.transpose(np.nan_to_num(sliceArray, copy=False))
+
+    def _readLayout(self, imagePath):
+        """Returns the description of the frames stored in the PixelData of imagePath"""
+        with open(imagePath, 'rb') as fp:
+            dataset = pydicom.dcmread(fp, stop_before_pixels=True)
+            transferSyntax = dataset.file_meta.TransferSyntaxUID
+            if transferSyntax.is_compressed or transferSyntax.is_deflated:
+                raise ValueError('{} has the compressed transfer syntax {}'.format(imagePath, transferSyntax.name))
+            endian = '<' if transferSyntax.is_little_endian else '>'
+            elementHeader = fp.read(8)
+            group, element = struct.unpack(endian + 'HH', elementHeader[:4])
+            if (group, element) != (0x7FE0, 0x0010):
+                raise ValueError('{} has no PixelData element'.format(imagePath))
+            if transferSyntax.is_implicit_VR:
+                length = struct.unpack(endian + 'L', elementHeader[4:])[0]
+            elif elementHeader[4:6] in self._VR_WITH_LONG_LENGTH:
+                length = struct.unpack(endian + 'L', fp.read(4))[0]
+            else:
+                length = struct.unpack(endian + 'H', elementHeader[6:])[0]
+            offset = fp.tell()
+        if length == 0xFFFFFFFF:
+            raise ValueError('{} has encapsulated pixel data'.format(imagePath))
+        if int(getattr(dataset, 'SamplesPerPixel', 1)) != 1 or dataset.BitsAllocated not in (8, 16, 32):
+            raise ValueError('{} does not store one grayscale sample of 8, 16 or 32 bits per pixel'.format(imagePath))
+        storedDtype = np.dtype('{}{}{}'.format(endian, 'i' if dataset.PixelRepresentation == 1 else 'u', dataset.BitsAllocated // 8))
+        frameShape = (int(dataset.Rows), int(dataset.Columns))
+        numberFrames = int(getattr(dataset, 'NumberOfFrames', 1) or 1)
+        # getPixelArray rotates the 3D arrays of multiframe files that are not enhanced rather than transposing each frame
+        if numberFrames > 1 and not hasattr(dataset, 'PerFrameFunctionalGroupsSequence'):
+            raise ValueError('{} is a multiframe file without PerFrameFunctionalGroupsSequence'.format(imagePath))
+        philipsSlope = float(dataset[(0x2005, 0x100E)].value) if [0x2005, 0x100E] in dataset else None
+        layout = []
+        for frame in range(numberFrames):
+            if hasattr(dataset, 'PerFrameFunctionalGroupsSequence'):
+                transformation = dataset.PerFrameFunctionalGroupsSequence[frame].PixelValueTransformationSequence[0]
+            else:
+                transformation = dataset
+            slope = float(getattr(transformation, 'RescaleSlope', 1))
+            intercept = float(getattr(transformation, 'RescaleIntercept', 0))
+            if philipsSlope is not None:
+                slope, intercept = 1 / philipsSlope, intercept / (slope * philipsSlope)
+            layout.append((imagePath, offset, storedDtype, frameShape, None if numberFrames == 1 else frame, slope, intercept))
+        return layout
+
+
+def fileSignature(imagePath):
+    """This method returns the size and modification time (in nanoseconds) of the file in imagePath, or None if it can't be read.
+        The content read from a file is up to date as long as its signature is unchanged.
+    """
+    try:
+        fileStat = os.stat(imagePath)
+        return (fileStat.st_size, fileStat.st_mtime_ns)
+    except OSError:
+        return None
+
+
+class DicomTagTable:
+    """
+    Columnar table of the DICOM tag values of a list of files.
+
+    The headers of all files are read once, in a single batch, and each tag requested is converted once into
+    a typed column: a float array for numeric tags (TM values in seconds, NaN where the tag is missing),
+    a unicode array for text tags, or an object array otherwise. Filters and sorts are then computed
+    on the columns instead of reading the files again. Rows of files that changed on disk are re-read
+    on the next `refresh`, which `sync` only runs if Weasel wrote a DICOM file since the table was read.
+    """
+    OPERATORS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+    def __init__(self, imagePathList, headers=None):
+        self.paths = list(imagePathList)
+        self._writeCount = headerCache.invalidations
+        if headers is None:
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+                headers = list(pool.map(getDicomHeader, self.paths))
+        self._headers = headers
+        self._signatures = [fileSignature(imagePath) for imagePath in self.paths]
+        self._values = {}
+        self._columns = {}
+
+    def __repr__(self):
+        return '{}(rows={}, columns={})'.format(self.__class__.__name__, len(self.paths), list(self._columns))
+
+    def __len__(self):
+        return len(self.paths)
+
+    def refresh(self):
+        """Re-reads the headers of the files that changed on disk and drops the cached columns if any did."""
+        self._writeCount = headerCache.invalidations
+        changed = False
+        for index, imagePath in enumerate(self.paths):
+            signature = fileSignature(imagePath)
+            if signature != self._signatures[index]:
+                self._signatures[index] = signature
+                self._headers[index] = getDicomHeader(imagePath)
+                changed = True
+        if changed:
+            self._values.clear()
+            self._columns.clear()
+        return self
+
+    def sync(self):
+        """Runs `refresh` only if a DICOM file was written through Weasel since the table was last read, without checking the files otherwise."""
+        if self._writeCount != headerCache.invalidations:
+            self.refresh()
+        return self
+
+    def take(self, indices):
+        """Returns the table of the rows in indices, sharing the headers and the columns already converted."""
+        table = DicomTagTable.__new__(DicomTagTable)
+        table.paths = [self.paths[index] for index in indices]
+        table._writeCount = self._writeCount
+        table._headers = [self._headers[index] for index in indices]
+        table._signatures = [self._signatures[index] for index in indices]
+        table._values = {tag: [values[index] for index in indices] for tag, values in self._values.items()}
+        table._columns = {tag: (column[indices], present[indices]) for tag, (column, present) in self._columns.items()}
+        return table
+
+    def values(self, tag):
+        """Returns the list of values of the DICOM tag, in the same format as `getImageTagValue`."""
+        if tag not in self._values:
+            self._values[tag] = [None if header is None else getDatasetTagValue(header, tag) for header in self._headers]
+        return self._values[tag]
+
+    def column(self, tag):
+        """Returns the typed column of the DICOM tag and the boolean array of the rows where the tag is present."""
+        if tag not in self._columns:
+            values = self.values(tag)
+            present = np.array([value is not None for value in values], dtype=bool)
+            if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values if value is not None):
+                column = np.array([float(value) if value is not None else np.nan for value in values], dtype=np.float64)
+            elif all(isinstance(value, str) for value in values if value is not None):
+                column = np.array([str(value) if value is not None else '' for value in values], dtype=str)
+            else:
+                column = np.empty(len(values), dtype=object)
+                for index, value in enumerate(values):
+                    column[index] = tuple(value) if isinstance(value, (list, pydicom.multival.MultiValue)) else (None if value is None else str(value))
+            self._columns[tag] = (column, present)
+        return self._columns[tag]
+
+    def mask(self, tag, condition, target):
+        """Returns the boolean array of the rows where the value of the tag satisfies the condition (==, !=, <, <=, >, >=) with target."""
+        if condition not in self.OPERATORS:
+            raise ValueError('unknown condition ' + repr(condition))
+        compare = self.OPERATORS[condition]
+        column, present = self.column(tag)
+        if column.dtype == np.float64:
+            try:
+                if isinstance(target, str) and self._isTime(tag):
+                    target = timeToSeconds(target)
+                target = float(target)
+            except (TypeError, ValueError):
+                return np.full(len(column), condition == '!=')
+            with np.errstate(invalid='ignore'):
+                return compare(column, target) & present
+        if column.dtype.kind == 'U':
+            return compare(column, str(target)) & present
+        if isinstance(target, (list, tuple)):
+            target = tuple(target)
+        else:
+            target = str(target)
+        values = self.values(tag)
+        result = np.zeros(len(column), dtype=bool)
+        for index, value in enumerate(column):
+            if value is None: continue
+            try:
+                if type(value) == type(target):
+                    result[index] = compare(value, target)
+                elif condition in ('==', '!='):
+                    # Values of other types are compared as strings, eg. a multi-valued tag with "['ORIGINAL', 'PRIMARY']"
+                    result[index] = compare(str(values[index]), str(target))
+            except TypeError:
+                pass
+        return result
+
+    def groups(self, *tags):
+        """Partitions the rows by the values of the given tags in one pass.
+            Returns a dictionary {value: row indices}, or {(value1, value2, ...): row indices} if there are several tags,
+            with the groups in order of first appearance.
+        """
+        keyColumns = [[tuple(value) if isinstance(value, (list, pydicom.multival.MultiValue)) else value for value in self.values(tag)] for tag in tags]
+        groups = {}
+        for index, key in enumerate(zip(*keyColumns)):
+            groups.setdefault(key if len(tags) > 1 else key[0], []).append(index)
+        return {key: np.array(indices, dtype=np.intp) for key, indices in groups.items()}
+
+    def argsort(self, *tags, reverse=False):
+        """Returns the indices that sort the rows by the given tags, the first tag being the primary key. The sort is stable."""
+        if not tags:
+            return np.arange(len(self.paths))
+        ranks = [self._ranks(tag) for tag in tags]
+        if reverse:
+            ranks = [-rank for rank in ranks]
+        return np.lexsort(ranks[::-1])
+
+    def _ranks(self, tag):
+        column, _ = self.column(tag)
+        if column.dtype != object:
+            return np.unique(column, return_inverse=True)[1].ravel()
+        try:
+            uniqueValues = sorted(set(column))
+        except TypeError:
+            uniqueValues = sorted(set(column), key=str)
+        rank = {value: index for index, value in enumerate(uniqueValues)}
+        return np.array([rank[value] for value in column], dtype=np.intp)
+
+    def _isTime(self, tag):
+        for header in self._headers:
+            if header is None: continue
+            try:
+                if isinstance(tag, str):
+                    dataElement = header.data_element(tag)
+                elif isinstance(tag, tuple):
+                    dataElement = header[tag]
+                else:
+                    dataElement = header[hex(tag)]
+                return dataElement.VR == "TM"
+            except (KeyError, AttributeError):
+                continue
+        return False
+
+
+class SeriesGeometry:
+    """
+    Table of the geometry of the slices of a list of files, built from a single header-only pass.
+
+    There is one row per slice, or per frame of a multi-frame file:
+        - affines: (N, 4, 4) Affine/Orientation matrices, with the conventions of `getAffineArray`
+        - normals: (N, 3) slice normals, the cross products of the row and column cosines
+        - positions: (N, 3) ImagePositionPatient, the centre of the top left-hand pixel
+        - slicePositions: (N,) positions projected onto the slice normals
+        - sliceLocations: (N,) SliceLocation values, or slicePositions where the tag is missing
+        - topLeftCorners: (N, 3) real-world coordinates of the top left-hand corner, as in `getTopLeftCorner`
+    frameCounts holds the number of rows of each file. The arrays are read-only as they are shared through
+    `seriesGeometryCache`.
+    """
+    def __init__(self, imagePathList, headers=None):
+        self.paths = list(imagePathList)
+        if headers is None:
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+                headers = list(pool.map(getDicomHeader, self.paths))
+        self._signatures = [fileSignature(imagePath) for imagePath in self.paths]
+        orientations, spacings, sliceSpacings, positions, locations, frameCounts = [], [], [], [], [], []
+        for dataset in headers:
+            if hasattr(dataset, 'PerFrameFunctionalGroupsSequence'):
+                for frame in dataset.PerFrameFunctionalGroupsSequence:
+                    orientations.append(frame.PlaneOrientationSequence[0].ImageOrientationPatient)
+                    spacings.append(frame.PixelMeasuresSequence[0].PixelSpacing)
+                    sliceSpacings.append(frame.PixelMeasuresSequence[0].SpacingBetweenSlices)
+                    positions.append(frame.PlanePositionSequence[0].ImagePositionPatient)
+                    locations.append(np.nan)
+                frameCounts.append(len(dataset.PerFrameFunctionalGroupsSequence))
+            else:
+                orientations.append(dataset.ImageOrientationPatient)
+                spacings.append(dataset.PixelSpacing)
+                sliceSpacings.append(dataset.SliceThickness)
+                positions.append(dataset.ImagePositionPatient)
+                sliceLocation = getattr(dataset, 'SliceLocation', None)
+                locations.append(np.nan if sliceLocation in (None, '') else float(sliceLocation))
+                frameCounts.append(1)
+        orientations = np.array(orientations, dtype=np.float64).reshape(-1, 6)
+        spacings = np.array(spacings, dtype=np.float64).reshape(-1, 2)
+        rowCosines = orientations[:, :3]
+        columnCosines = orientations[:, 3:]
+        self.frameCounts = np.array(frameCounts, dtype=np.intp)
+        self.positions = np.array(positions, dtype=np.float64).reshape(-1, 3)
+        self.normals = np.cross(rowCosines, columnCosines)
+        self.affines = np.zeros((len(self.positions), 4, 4))
+        self.affines[:, :3, 0] = rowCosines * spacings[:, 1:2]
+        self.affines[:, :3, 1] = columnCosines * spacings[:, 0:1]
+        self.affines[:, :3, 2] = self.normals * np.array(sliceSpacings, dtype=np.float64)[:, None]
+        self.affines[:, :3, 3] = self.positions
+        self.affines[:, 3, 3] = 1
+        self.slicePositions = np.einsum('ij,ij->i', self.positions, self.normals)
+        self.sliceLocations = np.array(locations, dtype=np.float64)
+        missing = np.isnan(self.sliceLocations)
+        self.sliceLocations[missing] = self.slicePositions[missing]
+        self.topLeftCorners = self.positions - 0.5 * spacings[:, 0:1] * rowCosines - 0.5 * spacings[:, 1:2] * columnCosines
+        for array in (self.frameCounts, self.positions, self.normals, self.affines, self.slicePositions, self.sliceLocations, self.topLeftCorners):
+            array.setflags(write=False)
+
+    def __repr__(self):
+        return '{}(files={}, slices={})'.format(self.__class__.__name__, len(self.paths), len(self.affines))
+
+    def __len__(self):
+        return len(self.affines)
+
+    def isCurrent(self):
+        """Returns True if none of the files changed on disk since the table was built."""
+        return all(fileSignature(imagePath) == signature for imagePath, signature in zip(self.paths, self._signatures))
+
+    def fileAffines(self):
+        """Returns the Affine/Orientation matrix of each file, in the format of `getAffineArray`."""
+        return [np.squeeze(affines).astype(np.float32) for affines in np.split(self.affines, np.cumsum(self.frameCounts)[:-1])]
+
+
+headerCache = DicomHeaderCache()
+pixelArrayCache = PixelArrayCache()
+
+# Number of workers used to read and decode the files of a series concurrently
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+# Resampled masks returned by resampleMask, keyed by (mask series UID, target series UID)
+MASK_CACHE_SIZE = 16
+maskResampleCache = OrderedDict()
+maskResampleLock = threading.Lock()
+
+# Geometry tables returned by getSeriesGeometry, keyed by the tuple of file paths
+GEOMETRY_CACHE_SIZE = 64
+seriesGeometryCache = OrderedDict()
+seriesGeometryLock = threading.Lock()
+
+PIXEL_DATA_TAGS = ['PixelData', 'FloatPixelData', 'DoubleFloatPixelData',
+                   (0x7FE0, 0x0010), (0x7FE0, 0x0008), (0x7FE0, 0x0009), 0x7FE00010, 0x7FE00008, 0x7FE00009]
+
+
 def returnPixelArray(imagePath):
     """This method reads the DICOM file in imagePath and returns the Image/Pixel array"""
     logger.info("ReadDICOM_Image.returnPixelArray called")
@@ -42,25 +544,133 @@ def returnAffineArray(imagePath):
         logger.exception('Error in ReadDICOM_Image.returnAffineArray: ' + str(e))
 
 
-def returnSeriesPixelArray(imagePathList):
-    """This method reads the DICOM files in imagePathList and 
-    returns a list where each element is a DICOM Dataset object/class"""
+def returnSeriesPixelArray(imagePathList, workers=None, processPool=False):
+    """This method reads the DICOM files in imagePathList and returns the Image/Pixel arrays as one float32 volume.
+        The files are read and decoded concurrently in a pool of threads (MAX_WORKERS by default) and each slice
+        is written in place in a preallocated volume, in the order of imagePathList.
+        If processPool is True and the files have a compressed transfer syntax, a pool of processes is used to decode them instead.
+    """
     logger.info("ReadDICOM_Image.returnSeriesPixelArray called")
     try:
-        datasetList = getSeriesDicomDataset(imagePathList)
-        imageList = [getPixelArray(dataset) for dataset in datasetList]
-        if imageList:
-            volumeArray = np.array(imageList)
-            del imageList
-            return volumeArray
-        else:
-            del imageList
+        imagePathList = [imagePath for imagePath in imagePathList if os.path.exists(imagePath)]
+        if not imagePathList:
+            return None
+        firstDataset = getDicomDataset(imagePathList[0])
+        firstArray = getPixelArray(firstDataset)
+        if firstArray is None:
             return None
+        volumeArray = np.empty((len(imagePathList),) + np.shape(firstArray), dtype=np.float32)
+        volumeArray[0] = firstArray
+        del firstArray
+        remainingPaths = imagePathList[1:]
+        if processPool and isCompressed(firstDataset):
+            with ProcessPoolExecutor(max_workers=workers or MAX_WORKERS) as executor:
+                for index, pixelArray in enumerate(executor.map(returnPixelArray, remainingPaths, chunksize=4), start=1):
+                    _fillSlice(volumeArray, index, pixelArray)
+        else:
+            def readSlice(index):
+                _fillSlice(volumeArray, index, returnPixelArray(imagePathList[index]))
+            with ThreadPoolExecutor(max_workers=workers or MAX_WORKERS) as executor:
+                list(executor.map(readSlice, range(1, len(imagePathList))))
+        return volumeArray
     except Exception as e:
         print('Error in function ReadDICOM_Image.returnSeriesPixelArray: ' + str(e))
         logger.exception('Error in ReadDICOM_Image.returnSeriesPixelArray: ' + str(e))
 
 
+def _fillSlice(volumeArray, index, pixelArray):
+    """Writes pixelArray in position index of the preallocated volumeArray"""
+    if pixelArray is None or np.shape(pixelArray) != volumeArray.shape[1:]:
+        raise ValueError('the slice in position {} does not have the shape {} of the series'.format(index, volumeArray.shape[1:]))
+    volumeArray[index] = pixelArray
+
+
+def isCompressed(dataset):
+    """This method returns True if the DICOM Dataset object/class has a compressed transfer syntax"""
+    try:
+        return dataset.file_meta.TransferSyntaxUID.is_compressed
+    except Exception:
+        return False
+
+
+def returnCachedPixelArray(imagePath):
+    """This method returns the Image/Pixel array of the DICOM file in imagePath from the session-wide `pixelArrayCache`.
+        The array is shared between callers and is read-only: call copy() on it before modifying it.
+    """
+    logger.info("ReadDICOM_Image.returnCachedPixelArray called")
+    try:
+        if os.path.exists(imagePath):
+            return pixelArrayCache.get(imagePath)
+        else:
+            return None
+    except Exception as e:
+        print('Error in function ReadDICOM_Image.returnCachedPixelArray: ' + str(e))
+        logger.exception('Error in ReadDICOM_Image.returnCachedPixelArray: ' + str(e))
+
+
+def returnCachedSeriesPixelArray(imagePathList, workers=None):
+    """This method returns the volume of the DICOM files in imagePathList, built from the slices in the session-wide `pixelArrayCache`.
+        The slices that are not cached yet are read concurrently and copied in place in a preallocated float32 volume.
+        The volume is returned read-only, like the cached slices: call copy() on it before modifying it.
+    """
+    logger.info("ReadDICOM_Image.returnCachedSeriesPixelArray called")
+    try:
+        imagePathList = [imagePath for imagePath in imagePathList if os.path.exists(imagePath)]
+        if not imagePathList:
+            return None
+        firstArray = pixelArrayCache.get(imagePathList[0])
+        volumeArray = np.empty((len(imagePathList),) + np.shape(firstArray), dtype=np.float32)
+        volumeArray[0] = firstArray
+        def readSlice(index):
+            _fillSlice(volumeArray, index, pixelArrayCache.get(imagePathList[index]))
+        with ThreadPoolExecutor(max_workers=workers or MAX_WORKERS) as executor:
+            list(executor.map(readSlice, range(1, len(imagePathList))))
+        volumeArray.setflags(write=False)
+        return volumeArray
+    except Exception as e:
+        print('Error in function ReadDICOM_Image.returnCachedSeriesPixelArray: ' + str(e))
+        logger.exception('Error in ReadDICOM_Image.returnCachedSeriesPixelArray: ' + str(e))
+
+
+def getVolumeView(imagePathList, dtype=np.float32):
+    """This method returns a read-only DicomVolumeView of the uncompressed DICOM files in imagePathList.
+        The Image/Pixel arrays are memory-mapped and rescaled slice by slice when the view is indexed, 
+        so the volume is never loaded in memory as a whole.
+    """
+    logger.info("ReadDICOM_Image.getVolumeView called")
+    try:
+        imagePathList = [imagePath for imagePath in imagePathList if os.path.exists(imagePath)]
+        if imagePathList:
+            return DicomVolumeView(imagePathList, dtype=dtype)
+        else:
+            return None
+    except Exception as e:
+        print('Error in function ReadDICOM_Image.getVolumeView: ' + str(e))
+        logger.exception('Error in ReadDICOM_Image.getVolumeView: ' + str(e))
+
+
+def invalidatePixelArray(imagePath=None):
+    """This method removes the cached pixel array of imagePath (or of all files if imagePath is None).
+        It must be called whenever a DICOM file is written to disk.
+    """
+    logger.info("ReadDICOM_Image.invalidatePixelArray called")
+    try:
+        pixelArrayCache.invalidate(imagePath)
+    except Exception as e:
+        print('Error in function ReadDICOM_Image.invalidatePixelArray: ' + str(e))
+        logger.exception('Error in ReadDICOM_Image.invalidatePixelArray: ' + str(e))
+
+
+def setPixelArrayCacheSize(maxBytes):
+    """This method sets the memory budget (in bytes) of the session-wide pixel array cache"""
+    logger.info("ReadDICOM_Image.setPixelArrayCacheSize called")
+    try:
+        pixelArrayCache.resize(maxBytes)
+    except Exception as e:
+        print('Error in function ReadDICOM_Image.setPixelArrayCacheSize: ' + str(e))
+        logger.exception('Error in ReadDICOM_Image.setPixelArrayCacheSize: ' + str(e))
+
+
 def getMultiframeBySlices(dataset, sliceList=None, sort=False):
     """This method splits and sorts the slices in the variable `dataset`. In this case, `dataset` is an Enhanced DICOM object."""
     try:
@@ -104,60 +714,11 @@ def getImageTagValue(imagePath, dicomTag):
     logger.info("ReadDICOM_Image.getImageTagValue called")
     try:
         if os.path.exists(imagePath):
-            dataset = getDicomDataset(imagePath)
-            # The following if statement is an exception for Multi-frame / Enhanced DICOM images (13/08/2021)
-            if (dicomTag == "SliceLocation" or dicomTag == (0x0020,0x1041)) and not hasattr(dataset, "SliceLocation"): dicomTag = (0x2001, 0x100a)
-            # This is not for Enhanced MRI. Only Classic DICOM
-            if isinstance(dicomTag, str):
-                try:
-                    if isinstance(dataset.data_element(dicomTag).value, bytes) == True:
-                        try:
-                            attribute = list(struct.unpack('h', dataset.data_element(dicomTag).value))
-                            if len(attribute) == 1: attribute = attribute[0]
-                        except:
-                            attribute = dataset.data_element(dicomTag).value.decode('utf-8')
-                            if "\\" in attribute: attribute = list(map(eval, attribute.split("\\")))
-                    else:
-                        attribute = dataset.data_element(dicomTag).value
-                    if dataset.data_element(dicomTag).VR == "TM":
-                        if "." in attribute: attribute = (datetime.strptime(attribute, "%H%M%S.%f") - datetime(1900, 1, 1)).total_seconds()
-                        else: attribute = (datetime.strptime(attribute, "%H%M%S") - datetime(1900, 1, 1)).total_seconds()
-                except:
-                    return None
-            elif isinstance(dicomTag, tuple):
-                try:
-                    if isinstance(dataset[dicomTag].value, bytes) == True:
-                        try:
-                            attribute = list(struct.unpack('h', dataset[dicomTag].value))
-                            if len(attribute) == 1: attribute = attribute[0]
-                        except:
-                            attribute = dataset[dicomTag].value.decode('utf-8')
-                            if "\\" in attribute: attribute = list(map(eval, attribute.split("\\")))
-                    else:
-                        attribute = dataset[dicomTag].value
-                    if dataset[dicomTag].VR == "TM": 
-                        if "." in attribute: attribute = (datetime.strptime(attribute, "%H%M%S.%f") - datetime(1900, 1, 1)).total_seconds()
-                        else: attribute = (datetime.strptime(attribute, "%H%M%S") - datetime(1900, 1, 1)).total_seconds()
-                except:
-                    return None
+            if dicomTag in PIXEL_DATA_TAGS:
+                dataset = getDicomDataset(imagePath)
             else:
-                try:
-                    if isinstance(dataset[hex(dicomTag)].value, bytes) == True:
-                        try:
-                            attribute = list(struct.unpack('h', dataset[hex(dicomTag)].value))
-                            if len(attribute) == 1: attribute = attribute[0]
-                        except:
-                            attribute = dataset[hex(dicomTag)].value.decode('utf-8')
-                            if "\\" in attribute: attribute = list(map(eval, attribute.split("\\")))
-                    else:
-                        attribute = dataset[hex(dicomTag)].value
-                    if dataset[hex(dicomTag)].VR == "TM":
-                        if "." in attribute: attribute = (datetime.strptime(attribute, "%H%M%S.%f") - datetime(1900, 1, 1)).total_seconds()
-                        else: attribute = (datetime.strptime(attribute, "%H%M%S") - datetime(1900, 1, 1)).total_seconds()
-                except:
-                    return None
-            del dataset
-            return attribute
+                dataset = getDicomHeader(imagePath)
+            return getDatasetTagValue(dataset, dicomTag)
         else:
             return None
     except Exception as e:
@@ -165,6 +726,42 @@ def getImageTagValue(imagePath, dicomTag):
         logger.exception('Error in ReadDICOM_Image.getImageTagValue: ' + str(e))
 
 
+def getDatasetTagValue(dataset, dicomTag):
+    """This method returns the value in the given DICOM tag of the dataset, or None if the tag is not present.
+        Byte values are unpacked and TM values are converted to seconds.
+    """
+    # The following if statement is an exception for Multi-frame / Enhanced DICOM images (13/08/2021)
+    if (dicomTag == "SliceLocation" or dicomTag == (0x0020,0x1041)) and not hasattr(dataset, "SliceLocation"): dicomTag = (0x2001, 0x100a)
+    # This is not for Enhanced MRI. Only Classic DICOM
+    try:
+        if isinstance(dicomTag, str):
+            dataElement = dataset.data_element(dicomTag)
+        elif isinstance(dicomTag, tuple):
+            dataElement = dataset[dicomTag]
+        else:
+            dataElement = dataset[hex(dicomTag)]
+        if isinstance(dataElement.value, bytes) == True:
+            try:
+                attribute = list(struct.unpack('h', dataElement.value))
+                if len(attribute) == 1: attribute = attribute[0]
+            except:
+                attribute = dataElement.value.decode('utf-8')
+                if "\\" in attribute: attribute = list(map(eval, attribute.split("\\")))
+        else:
+            attribute = dataElement.value
+        if dataElement.VR == "TM":
+            attribute = timeToSeconds(attribute)
+    except:
+        return None
+    return attribute
+
+
+def timeToSeconds(timeValue):
+    """Converts a DICOM TM value (HHMMSS or HHMMSS.FFFFFF) to the number of seconds since midnight."""
+    if "." in timeValue: return (datetime.strptime(timeValue, "%H%M%S.%f") - datetime(1900, 1, 1)).total_seconds()
+    else: return (datetime.strptime(timeValue, "%H%M%S") - datetime(1900, 1, 1)).total_seconds()
+
+
 def getSeriesTagValues(imagePathList, dicomTag):
     """This method reads the DICOM files in imagePathList and returns the list of values in the given DICOM tag
         Outputs are : attributeList, numAttribute
@@ -174,7 +771,10 @@ def getSeriesTagValues(imagePathList, dicomTag):
     logger.info("ReadDICOM_Image.getSeriesTagValues called")
     try:
         if os.path.exists(imagePathList[0]):
-            datasetList = getSeriesDicomDataset(imagePathList)
+            if dicomTag in PIXEL_DATA_TAGS:
+                datasetList = getSeriesDicomDataset(imagePathList)
+            else:
+                datasetList = getSeriesDicomHeader(imagePathList)
             # The following if statement is an exception for Multi-frame / Enhanced DICOM images (13/08/2021)
             if (dicomTag == "SliceLocation" or dicomTag == (0x0020,0x1041)) and not hasattr(datasetList[0], "SliceLocation"): dicomTag = (0x2001, 0x100a)
             if not hasattr(datasetList[0], 'PerFrameFunctionalGroupsSequence'):
@@ -302,7 +902,7 @@ def sortSequenceByTag(imagePathList, dicomTag):
                 indices = [index for index, value in enumerate(attributeList) if value == attributeListUnique[i]]
                 indicesSorted.extend(indices)
             # If/Else regarding Multi-Frame DICOM
-            dataset = getDicomDataset(imagePathList[0])
+            dataset = getDicomHeader(imagePathList[0])
             if not hasattr(dataset, 'PerFrameFunctionalGroupsSequence'):
                 sortedSequencePath = [imagePathList[index] for index in indicesSorted]
             else:
@@ -317,17 +917,13 @@ def sortSequenceByTag(imagePathList, dicomTag):
         logger.exception('Error in ReadDICOM_Image.sortSequenceByTag: ' + str(e))
 
 
-def getSeriesDicomDataset(imagePathList):
-    """This method reads the DICOM files in imagePathList and 
-    returns a list where each element is a DICOM Dataset object/class"""
+def getSeriesDicomDataset(imagePathList, workers=None):
+    """This method reads the DICOM files in imagePathList concurrently and 
+    returns a list where each element is a DICOM Dataset object/class, in the order of imagePathList"""
     logger.info("ReadDICOM_Image.getSeriesDicomDataset called")
     try:
-        #datasetList = [getDicomDataset(imagePath) for imagePath in imagePathList if getDicomDataset(imagePath) is not None]
-        datasetList = []
-        for imagePath in imagePathList:
-            dataset = getDicomDataset(imagePath)
-            if dataset is not None:
-                datasetList.append(dataset)
+        with ThreadPoolExecutor(max_workers=workers or MAX_WORKERS) as executor:
+            datasetList = [dataset for dataset in executor.map(getDicomDataset, imagePathList) if dataset is not None]
         if datasetList:
             return datasetList
         else:
@@ -350,39 +946,98 @@ def getDicomDataset(imagePath):
         logger.exception('Error in ReadDICOM_Image.getDicomDataset: ' + str(e))
 
 
-def getPixelArray(dataset):
-    """This method reads the DICOM Dataset object/class and returns the Image/Pixel array"""
+def getDicomHeader(imagePath):
+    """This method returns the DICOM Dataset object/class of the file in imagePath without the pixel data.
+        The header is served from the session-wide `headerCache`, so it must be treated as read-only.
+    """
+    logger.info("ReadDICOM_Image.getDicomHeader called")
+    try:
+        if os.path.exists(imagePath):
+            return headerCache.get(imagePath)
+        else:
+            return None
+    except Exception as e:
+        print('Error in function ReadDICOM_Image.getDicomHeader when imagePath = {}: '.format(imagePath) + str(e))
+        logger.exception('Error in ReadDICOM_Image.getDicomHeader: ' + str(e))
+
+
+def getSeriesDicomHeader(imagePathList):
+    """This method returns a list with the DICOM headers (without pixel data) of the files in imagePathList"""
+    logger.info("ReadDICOM_Image.getSeriesDicomHeader called")
+    try:
+        datasetList = []
+        for imagePath in imagePathList:
+            dataset = getDicomHeader(imagePath)
+            if dataset is not None:
+                datasetList.append(dataset)
+        if datasetList:
+            return datasetList
+        else:
+            return None
+    except Exception as e:
+        print('Error in function ReadDICOM_Image.getSeriesDicomHeader: ' + str(e))
+        logger.exception('Error in ReadDICOM_Image.getSeriesDicomHeader: ' + str(e))
+
+
+def invalidateDicomHeader(imagePath=None):
+    """This method removes the cached header of imagePath (or of all files if imagePath is None).
+        It must be called whenever a DICOM file is written to disk.
+    """
+    logger.info("ReadDICOM_Image.invalidateDicomHeader called")
+    try:
+        headerCache.invalidate(imagePath)
+    except Exception as e:
+        print('Error in function ReadDICOM_Image.invalidateDicomHeader: ' + str(e))
+        logger.exception('Error in ReadDICOM_Image.invalidateDicomHeader: ' + str(e))
+
+
+def setHeaderCacheSize(maxBytes):
+    """This method sets the memory cap (in bytes) of the session-wide DICOM header cache"""
+    logger.info("ReadDICOM_Image.setHeaderCacheSize called")
+    try:
+        headerCache.resize(maxBytes)
+    except Exception as e:
+        print('Error in function ReadDICOM_Image.setHeaderCacheSize: ' + str(e))
+        logger.exception('Error in ReadDICOM_Image.setHeaderCacheSize: ' + str(e))
+
+
+def getPixelArray(dataset, dtype=np.float32):
+    """This method reads the DICOM Dataset object/class and returns the Image/Pixel array.
+        The rescale slope and intercept are applied in place on a single array of the given floating point dtype.
+        For Enhanced MR, the slope and intercept of each frame are applied with one vectorised operation.
+    """
     logger.info("ReadDICOM_Image.getPixelArray called")
     try:
         if any(hasattr(dataset, attr) for attr in ['PixelData', 'FloatPixelData', 'DoubleFloatPixelData']):
+            originalArray = dataset.pixel_array.astype(dtype)
             if hasattr(dataset, 'PerFrameFunctionalGroupsSequence'):
-                imageList = list()
-                originalArray = dataset.pixel_array.astype(np.float32)
-                if len(np.shape(originalArray)) == 2:
-                    slope = float(getattr(dataset.PerFrameFunctionalGroupsSequence[0].PixelValueTransformationSequence[0], 'RescaleSlope', 1)) * np.ones(originalArray.shape)
-                    intercept = float(getattr(dataset.PerFrameFunctionalGroupsSequence[0].PixelValueTransformationSequence[0], 'RescaleIntercept', 0)) * np.ones(originalArray.shape)
-                    pixelArray = np.transpose(originalArray * slope + intercept)
+                numberFrames = 1 if originalArray.ndim == 2 else originalArray.shape[0]
+                transformations = [dataset.PerFrameFunctionalGroupsSequence[index].PixelValueTransformationSequence[0] for index in range(numberFrames)]
+                slope = np.array([float(getattr(item, 'RescaleSlope', 1)) for item in transformations], dtype=dtype)
+                intercept = np.array([float(getattr(item, 'RescaleIntercept', 0)) for item in transformations], dtype=dtype)
+                if originalArray.ndim == 2:
+                    slope, intercept = slope[0], intercept[0]
+                    originalArray *= slope
+                    originalArray += intercept
+                    pixelArray = np.transpose(originalArray)
                 else:
-                    for index in range(np.shape(originalArray)[0]):
-                        sliceArray = np.squeeze(originalArray[index, ...])
-                        slope = float(getattr(dataset.PerFrameFunctionalGroupsSequence[index].PixelValueTransformationSequence[0], 'RescaleSlope', 1)) * np.ones(sliceArray.shape)
-                        intercept = float(getattr(dataset.PerFrameFunctionalGroupsSequence[index].PixelValueTransformationSequence[0], 'RescaleIntercept', 0)) * np.ones(sliceArray.shape)
-                        tempArray = np.transpose(sliceArray * slope + intercept)
-                        imageList.append(tempArray)
-                    pixelArray = np.array(imageList)
-                    del sliceArray, tempArray, index
-                del originalArray, imageList
+                    slope, intercept = slope[:, np.newaxis, np.newaxis], intercept[:, np.newaxis, np.newaxis]
+                    originalArray *= slope
+                    originalArray += intercept
+                    pixelArray = np.transpose(originalArray, (0, 2, 1))
             else:
-                slope = float(getattr(dataset, 'RescaleSlope', 1)) * np.ones(dataset.pixel_array.shape)
-                intercept = float(getattr(dataset, 'RescaleIntercept', 0)) * np.ones(dataset.pixel_array.shape)
-                if len(dataset.pixel_array.shape) == 3:
-                    pixelArray = np.rot90(np.array(dataset.pixel_array.astype(np.float32) * slope + intercept), k=1, axes=(0, 1))
+                slope = float(getattr(dataset, 'RescaleSlope', 1))
+                intercept = float(getattr(dataset, 'RescaleIntercept', 0))
+                originalArray *= slope
+                originalArray += intercept
+                if originalArray.ndim == 3:
+                    pixelArray = np.rot90(originalArray, k=1, axes=(0, 1))
                 else:
-                    pixelArray = np.transpose(dataset.pixel_array.astype(np.float32) * slope + intercept)
+                    pixelArray = np.transpose(originalArray)
             if [0x2005, 0x100E] in dataset: # 'Philips Rescale Slope'
-                pixelArray = pixelArray / (slope * dataset[(0x2005, 0x100E)].value)
-            del slope, intercept
-            return np.nan_to_num(pixelArray)
+                originalArray /= slope * float(dataset[(0x2005, 0x100E)].value)
+            del originalArray, slope, intercept
+            return np.nan_to_num(pixelArray, copy=False)
         else:
             return None
     except Exception as e:
@@ -492,9 +1147,11 @@ def mapCoordinates(indexes, affineTarget, affineMask):
     """
     logger.info("ReadDICOM_Image.mapCoordinates called")
     try:
-        coords = [[index[0], index[1], 0] for index in indexes]
-        newCoord = np.round(applyAffine(affineTarget, affineMask, np.array(coords)), 3).astype(int)
-        return [(coord[1], coord[0]) for coord in newCoord if coord[-1] == 0]
+        coords = np.zeros((len(indexes), 3))
+        coords[:, :2] = indexes
+        newCoord = np.round(applyAffine(affineTarget, affineMask, coords), 3).astype(int)
+        newCoord = newCoord[newCoord[:, -1] == 0]
+        return list(zip(newCoord[:, 1], newCoord[:, 0]))
 
         # Legacy code that might be needed if we move to 3D
         #if len(index) == 2: 
@@ -522,6 +1179,96 @@ def applyAffine(affineReference, affineTarget, coordinates):
         logger.exception('Error in ReadDICOM_Image.applyAffine: ' + str(e))
 
 
+def getSeriesGeometry(imagePathList, readHeaders=True):
+    """This method returns the SeriesGeometry table of the DICOM files in imagePathList.
+        The tables are kept in `seriesGeometryCache` until any of their files changes on disk.
+        If readHeaders is False, None is returned instead of reading the headers when no current table is cached.
+    """
+    logger.info("ReadDICOM_Image.getSeriesGeometry called")
+    try:
+        key = tuple(imagePathList)
+        with seriesGeometryLock:
+            geometry = seriesGeometryCache.get(key)
+        if geometry is not None and geometry.isCurrent():
+            with seriesGeometryLock:
+                if key in seriesGeometryCache: seriesGeometryCache.move_to_end(key)
+            return geometry
+        if not readHeaders:
+            return None
+        geometry = SeriesGeometry(imagePathList)
+        with seriesGeometryLock:
+            seriesGeometryCache[key] = geometry
+            seriesGeometryCache.move_to_end(key)
+            while len(seriesGeometryCache) > GEOMETRY_CACHE_SIZE:
+                seriesGeometryCache.popitem(last=False)
+        return geometry
+    except Exception as e:
+        print('Error in function ReadDICOM_Image.getSeriesGeometry: ' + str(e))
+        logger.exception('Error in ReadDICOM_Image.getSeriesGeometry: ' + str(e))
+
+
+def getSeriesAffineArrays(imagePathList):
+    """This method returns the read-only (N, 4, 4) array of the Affine/Orientation matrices of the DICOM files in
+        imagePathList, one per slice (or per frame of a multi-frame file). See `SeriesGeometry`.
+    """
+    logger.info("ReadDICOM_Image.getSeriesAffineArrays called")
+    try:
+        return getSeriesGeometry(imagePathList).affines
+    except Exception as e:
+        print('Error in function ReadDICOM_Image.getSeriesAffineArrays: ' + str(e))
+        logger.exception('Error in ReadDICOM_Image.getSeriesAffineArrays: ' + str(e))
+
+
+def resampleMask(maskPathList, targetPathList, cacheKey=None):
+    """This method maps the non-zero pixels of the mask files in maskPathList onto the slices of the files in targetPathList.
+        Returns a read-only boolean volume with one slice per target slice, in the orientation of `getPixelArray`.
+
+        The mask volume and the affines of both series are read once. The pixel indices of the whole mask are
+        mapped with one batched affine product per target slice, with the rounding rules of `mapCoordinates`.
+        If cacheKey is given (eg. the mask and target series UIDs), the result is kept in `maskResampleCache`
+        until any of the files changes.
+    """
+    logger.info("ReadDICOM_Image.resampleMask called")
+    try:
+        signature = tuple((imagePath, fileSignature(imagePath)) for imagePath in list(maskPathList) + list(targetPathList))
+        if cacheKey is not None:
+            with maskResampleLock:
+                entry = maskResampleCache.get(cacheKey)
+                if entry is not None and entry[0] == signature:
+                    maskResampleCache.move_to_end(cacheKey)
+                    return entry[1]
+        maskVolume = returnCachedSeriesPixelArray(maskPathList)
+        maskVolume = maskVolume.reshape((-1,) + maskVolume.shape[-2:]) != 0
+        maskAffines = getSeriesAffineArrays(maskPathList)
+        targetAffines = getSeriesAffineArrays(targetPathList)
+        targetHeader = getDicomHeader(targetPathList[0])
+        targetShape = (len(targetAffines), int(targetHeader.Columns), int(targetHeader.Rows))
+        if maskVolume.shape == targetShape and np.allclose(maskAffines, targetAffines):
+            resampledMask = maskVolume
+        else:
+            resampledMask = np.zeros(targetShape, dtype=bool)
+            sliceIndices, xIndices, yIndices = np.nonzero(maskVolume)
+            # Real-world coordinates of all mask pixels, with the affine of the slice each pixel belongs to
+            sliceAffines = maskAffines[sliceIndices]
+            worldCoords = xIndices[:, None] * sliceAffines[:, :3, 0] + yIndices[:, None] * sliceAffines[:, :3, 1] + sliceAffines[:, :3, 3]
+            del sliceAffines
+            for targetIndex, inverseAffine in enumerate(np.linalg.inv(targetAffines)):
+                newCoords = np.round(worldCoords @ inverseAffine[:3, :3].T + inverseAffine[:3, 3], 3).astype(int)
+                inside = ((newCoords[:, 2] == 0) & (newCoords[:, 0] >= 0) & (newCoords[:, 0] < targetShape[1])
+                          & (newCoords[:, 1] >= 0) & (newCoords[:, 1] < targetShape[2]))
+                resampledMask[targetIndex, newCoords[inside, 0], newCoords[inside, 1]] = True
+        resampledMask.setflags(write=False)
+        if cacheKey is not None:
+            with maskResampleLock:
+                maskResampleCache[cacheKey] = (signature, resampledMask)
+                while len(maskResampleCache) > MASK_CACHE_SIZE:
+                    maskResampleCache.popitem(last=False)
+        return resampledMask
+    except Exception as e:
+        print('Error in function ReadDICOM_Image.resampleMask: ' + str(e))
+        logger.exception('Error in ReadDICOM_Image.resampleMask: ' + str(e))
+
+
 def getColourmap(imagePath):
     """This method reads the DICOM file in imagePath and returns the colourmap if there's any"""
     logger.info("ReadDICOM_Image.getColourmap called")
@@ -659,6 +1406,20 @@ def checkImageType(dataset):
         logger.exception('Error in ReadDICOM_Image.checkImageType: ' + str(e))
 
 
+def getSeriesImageTypes(imagePathList):
+    """This method returns the output of `checkImageType` for each file in imagePathList.
+        Only the headers are read (stop_before_pixels), concurrently and in a single pass.
+    """
+    logger.info("ReadDICOM_Image.getSeriesImageTypes called")
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            datasetList = list(pool.map(getDicomHeader, imagePathList))
+        return [(False, False, False, False, False) if dataset is None else checkImageType(dataset) for dataset in datasetList]
+    except Exception as e:
+        print('Error in function ReadDICOM_Image.getSeriesImageTypes: ' + str(e))
+        logger.exception('Error in ReadDICOM_Image.getSeriesImageTypes: ' + str(e))
+
+
 def checkAcquisitionType(dataset):
     """This method reads the DICOM Dataset object/class and returns if it is a Water, Fat, In-Phase, Out-phase image or None"""
     logger.info("ReadDICOM_Image.checkImageType called")
@@ -8,15 +8,25 @@ import pydicom
 from pydicom.dataset import Dataset, FileDataset
 from pydicom.sequence import Sequence
 from pydicom.datadict import dictionary_VR
+from pydicom.filebase import DicomBytesIO
+from pydicom.tag import Tag
 from datetime import datetime, timedelta
 import copy
 import random
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from matplotlib import cm
 import DICOM.ReadDICOM_Image as ReadDICOM_Image
 import DICOM.ParametricMapsDictionary as param
 import logging
 logger = logging.getLogger(__name__)
 
+# Permissions given to new files by open() under the umask of the process. The umask can only be read by setting it.
+_umask = os.umask(0o022)
+os.umask(_umask)
+NEW_FILE_MODE = 0o666 & ~_umask
+
 
 def returnFilePath(imagePath, suffix, new_path=None, output_folder=None):
     """This method returns the new filepath of the object to be saved."""
@@ -54,34 +64,53 @@ def returnFilePath(imagePath, suffix, new_path=None, output_folder=None):
 
 
 def saveNewSingleDicomImage(newFilePath, imagePath, pixelArray, suffix, series_id=None, series_uid=None, series_name=None, image_number=None, parametric_map=None, colourmap=None, list_refs_path=None):
-    """This method saves the new pixelArray into DICOM in the given newFilePath"""
+    """This method saves the new pixelArray into DICOM in the given newFilePath.
+        Returns True if the file was written and False otherwise.
+    """
     logger.info("SaveDICOM_Image.saveNewSingleDicomImage called")
     try:
         if os.path.exists(imagePath):
-            dataset = ReadDICOM_Image.getDicomDataset(imagePath)
+            dataset = ReadDICOM_Image.getDicomHeader(imagePath)
             if list_refs_path is not None:
-                refs = []
-                for individualRef in list_refs_path:
-                    refs.append(ReadDICOM_Image.getDicomDataset(individualRef))
+                refs = [ReadDICOM_Image.getDicomHeader(individualRef) for individualRef in list_refs_path]
             else:
                 refs = None
-            if colourmap is not None:
-                if isinstance(colourmap, str):
-                    pass
-                else:
-                    colourmap = colourmap.reshape(-1, colourmap.shape[-1]) # Flatten (x, y, 3) to (x*y, 3)
-            newDataset = createNewSingleDicom(dataset, pixelArray, series_id=series_id, series_uid=series_uid, series_name=series_name, comment=suffix, parametric_map=parametric_map, colourmap=colourmap, list_refs=refs)
-            if (image_number is not None) and (len(np.shape(pixelArray)) < 3):
-                newDataset.InstanceNumber = image_number
-                newDataset.ImageNumber = image_number
-            saveDicomToFile(newDataset, output_path=newFilePath)
-            del dataset, newDataset, refs, image_number
-            return
+            return writeDerivedDicom(newFilePath, dataset, pixelArray, suffix, series_id=series_id, series_uid=series_uid, series_name=series_name, 
+                                     image_number=image_number, parametric_map=parametric_map, colourmap=colourmap, list_refs=refs)
         else:
-            return None
+            return False
     except Exception as e:
         print('Error in function SaveDICOM_Image.saveNewSingleDicomImage: ' + str(e))
         logger.exception('Error in SaveDICOM_Image.saveNewSingleDicomImage: ' + str(e))
+        return False
+
+
+def writeDerivedDicom(newFilePath, dataset, pixelArray, suffix, series_id=None, series_uid=None, series_name=None, image_number=None, parametric_map=None, colourmap=None, list_refs=None, creation_time=None):
+    """This method saves the new pixelArray into DICOM in the given newFilePath, with the metadata of the reference header `dataset`.
+        `dataset` and the headers in `list_refs` can be the read-only headers of `ReadDICOM_Image.getDicomHeader`, which are not modified.
+        Returns True if the file was written. Otherwise the partial file is deleted and False is returned.
+    """
+    logger.info("SaveDICOM_Image.writeDerivedDicom called")
+    try:
+        if colourmap is not None and not isinstance(colourmap, str):
+            colourmap = colourmap.reshape(-1, colourmap.shape[-1]) # Flatten (x, y, 3) to (x*y, 3)
+        newDataset = createNewSingleDicom(dataset, pixelArray, series_id=series_id, series_uid=series_uid, series_name=series_name, comment=suffix, 
+                                          parametric_map=parametric_map, colourmap=colourmap, list_refs=list_refs, creation_time=creation_time)
+        if newDataset is None:
+            raise ValueError('the DICOM dataset of ' + str(newFilePath) + ' could not be created')
+        if (image_number is not None) and (len(np.shape(pixelArray)) < 3):
+            newDataset.InstanceNumber = image_number
+            newDataset.ImageNumber = image_number
+        if not saveDicomToFile(newDataset, output_path=newFilePath):
+            raise IOError(str(newFilePath) + ' could not be written')
+        del newDataset
+        return True
+    except Exception as e:
+        print('Error in function SaveDICOM_Image.writeDerivedDicom: ' + str(e))
+        logger.exception('Error in SaveDICOM_Image.writeDerivedDicom: ' + str(e))
+        if os.path.exists(newFilePath):
+            os.remove(newFilePath)
+        return False
 
 
 def updateSingleDicomImage(objWeasel, spinBoxIntensity, spinBoxContrast, 
@@ -107,32 +136,43 @@ def updateSingleDicomImage(objWeasel, spinBoxIntensity, spinBoxContrast,
 
 
 def saveDicomNewSeries(derivedImagePathList, imagePathList, pixelArrayList, suffix, series_id=None, series_uid=None, series_name=None, parametric_map=None, colourmap=None, list_refs_path=None):
-    """This method saves the pixelArrayList into DICOM files with metadata pointing to the same series"""
+    """This method saves the pixelArrayList into DICOM files with metadata pointing to the same series.
+
+        The reference headers are read once, without pixel data. The Series ID and UID and the creation date and time
+        are resolved once for the whole series. Each slice is then built by `createNewSingleDicom` from a copy of its own
+        reference header, which holds the per-slice tags such as position and timing. The files are encoded and written concurrently.
+        Returns a list with True for each file of derivedImagePathList that was written and False for each that failed.
+    """
     # What if it's a map with less files than original? Think about iterating the first elements and sort path list by SliceLocation - see T2* algorithm
     # Think of a way to choose a select a new FilePath or Folder
     logger.info("SaveDICOM_Image.saveDicomNewSeries called")
     try:
         if os.path.exists(imagePathList[0]):
+            numberImages = len(derivedImagePathList)
+            with ThreadPoolExecutor(max_workers=ReadDICOM_Image.MAX_WORKERS) as pool:
+                headers = list(pool.map(ReadDICOM_Image.getDicomHeader, imagePathList[:numberImages]))
             # Series ID and UID
             if (series_id is None) and (series_uid is None):
-                ids = generateUIDs(ReadDICOM_Image.getDicomDataset(imagePathList[0]))
+                ids = generateUIDs(headers[0])
                 series_id = ids[0]
                 series_uid = ids[1]
             elif (series_id is not None) and (series_uid is None):
-                series_uid = generateUIDs(ReadDICOM_Image.getDicomDataset(imagePathList[0]), seriesNumber=series_id)[1]
+                series_uid = generateUIDs(headers[0], seriesNumber=series_id)[1]
             elif (series_id is None) and (series_uid is not None):
-                series_id = int(str(ReadDICOM_Image.getDicomDataset(imagePathList[0]).SeriesNumber) + str(random.randint(0, 9999)))
+                series_id = int(str(headers[0].SeriesNumber) + str(random.randint(0, 9999)))
+            creationTime = datetime.now()
 
+            tasks = []
             refs = None
             for index, newFilePath in enumerate(derivedImagePathList):
                 # Extra references, besides the main one, which is imagePathList
                 if list_refs_path is not None:
                     if len(np.shape(list_refs_path)) == 1:
-                        refs = list_refs_path[index]
+                        refs = ReadDICOM_Image.getDicomHeader(list_refs_path[index])
                     else:
                         refs = []
                         for individualRef in list_refs_path:
-                            refs.append(individualRef[index])
+                            refs.append(ReadDICOM_Image.getDicomHeader(individualRef[index]))
                 if colourmap is not None:
                     if isinstance(colourmap, str):
                         colour = colourmap
@@ -140,16 +180,17 @@ def saveDicomNewSeries(derivedImagePathList, imagePathList, pixelArrayList, suff
                         colour = colourmap[index, ...]
                 else:
                     colour = None
-
-                saveNewSingleDicomImage(newFilePath, imagePathList[index], pixelArrayList[index], suffix, series_id=series_id, series_uid=series_uid, series_name=series_name, image_number=index+1, parametric_map=parametric_map, 
-                                      colourmap=colour, list_refs_path=refs)
-            del series_id, series_uid, refs
-            return
+                tasks.append((newFilePath, headers[index], pixelArrayList[index], suffix, series_id, series_uid, series_name, index+1, parametric_map, colour, refs, creationTime))
+            with ThreadPoolExecutor(max_workers=ReadDICOM_Image.MAX_WORKERS) as pool:
+                written = list(pool.map(lambda task: writeDerivedDicom(*task), tasks))
+            del series_id, series_uid, refs, tasks, headers
+            return written
         else:
-            return None
+            return [False] * len(derivedImagePathList)
     except Exception as e:
         print('Error in function SaveDICOM_Image.saveDicomNewSeries: ' + str(e))
         logger.exception('Error in SaveDICOM_Image.saveDicomNewSeries: ' + str(e))
+        return [False] * len(derivedImagePathList)
  
     
 def generateUIDs(dataset, seriesNumber=None, studyUID=None):
@@ -185,90 +226,208 @@ def overwriteDicomFileTag(imagePath, dicomTag, newValue):
     This method writes the `newValue` into the `dicomTag` in `imagePath`.
     If `dicomTag` exists in `imagePath`, this will overwrite.
     Otherwise, it will create `dicomTag` and store the `newValue`.
+    To change more than one tag, use `overwriteDicomFileTags` so that each file is written only once.
     """
     logger.info("SaveDICOM_Image.overwriteDicomFileTag called")
     try:
-        if isinstance(imagePath, list):
-            datasetList = ReadDICOM_Image.getSeriesDicomDataset(imagePath)
-            for index, dataset in enumerate(datasetList):
-                if isinstance(dicomTag, str):
-                    try: 
-                        if dataset.data_element(dicomTag).VR == "TM": 
-                            dataset.data_element(dicomTag).value = datetime.strptime(str(timedelta(seconds=int(newValue))), "%H:%M:%S")
-                        else:
-                            dataset.data_element(dicomTag).value = newValue
-                    except:
-                        if dictionary_VR(dicomTag) == "TM": 
-                            dataset.add_new(dicomTag, dictionary_VR(dicomTag), datetime.strptime(str(timedelta(seconds=int(newValue))), "%H:%M:%S"))
-                        else:
-                            dataset.add_new(dicomTag, dictionary_VR(dicomTag), newValue) 
-                elif isinstance(dicomTag, tuple):
-                    try:
-                        if dataset[dicomTag].VR == "TM":
-                            dataset[dicomTag].value = datetime.strptime(str(timedelta(seconds=int(newValue))), "%H:%M:%S")
-                        else:
-                            dataset[dicomTag].value = newValue
-                    except:
-                        if dataset[dicomTag].VR == "TM":
-                            dataset.add_new(dicomTag, dictionary_VR(dicomTag), datetime.strptime(str(timedelta(seconds=int(newValue))), "%H:%M:%S"))
-                        else:
-                            dataset.add_new(dicomTag, dictionary_VR(dicomTag), newValue)
-                else:
-                    try:
-                        if dataset[hex(dicomTag)].VR == "TM":
-                            dataset[hex(dicomTag)].value = datetime.strptime(str(timedelta(seconds=int(newValue))), "%H:%M:%S")
-                        else:
-                            dataset[hex(dicomTag)].value = newValue
-                    except:
-                        if dataset[hex(dicomTag)].VR == "TM":
-                            dataset.add_new(hex(dicomTag), dictionary_VR(hex(dicomTag)), datetime.strptime(str(timedelta(seconds=int(newValue))), "%H:%M:%S"))
-                        else:
-                            dataset.add_new(hex(dicomTag), dictionary_VR(hex(dicomTag)), newValue)
-                saveDicomToFile(dataset, output_path=imagePath[index])
-        else:
-            dataset = ReadDICOM_Image.getDicomDataset(imagePath)
-            if isinstance(dicomTag, str):
-                try: 
-                    if dataset.data_element(dicomTag).VR == "TM": 
-                        dataset.data_element(dicomTag).value = datetime.strptime(str(timedelta(seconds=int(newValue))), "%H:%M:%S")
-                    else:
-                        dataset.data_element(dicomTag).value = newValue
-                except:
-                    if dictionary_VR(dicomTag) == "TM": 
-                        dataset.add_new(dicomTag, dictionary_VR(dicomTag), datetime.strptime(str(timedelta(seconds=int(newValue))), "%H:%M:%S"))
-                    else:
-                        dataset.add_new(dicomTag, dictionary_VR(dicomTag), newValue) 
-            elif isinstance(dicomTag, tuple):
-                try:
-                    if dataset[dicomTag].VR == "TM":
-                        dataset[dicomTag].value = datetime.strptime(str(timedelta(seconds=int(newValue))), "%H:%M:%S")
-                    else:
-                        dataset[dicomTag].value = newValue
-                except:
-                    if dataset[dicomTag].VR == "TM":
-                        dataset.add_new(dicomTag, dictionary_VR(dicomTag), datetime.strptime(str(timedelta(seconds=int(newValue))), "%H:%M:%S"))
-                    else:
-                        dataset.add_new(dicomTag, dictionary_VR(dicomTag), newValue)
-            else:
-                try:
-                    if dataset[hex(dicomTag)].VR == "TM":
-                        dataset[hex(dicomTag)].value = datetime.strptime(str(timedelta(seconds=int(newValue))), "%H:%M:%S")
-                    else:
-                        dataset[hex(dicomTag)].value = newValue
-                except:
-                    if dataset[hex(dicomTag)].VR == "TM":
-                        dataset.add_new(hex(dicomTag), dictionary_VR(hex(dicomTag)), datetime.strptime(str(timedelta(seconds=int(newValue))), "%H:%M:%S"))
-                    else:
-                        dataset.add_new(hex(dicomTag), dictionary_VR(hex(dicomTag)), newValue)
-            saveDicomToFile(dataset, output_path=imagePath)
+        overwriteDicomFileTags(imagePath, {dicomTag: newValue})
         return
     except Exception as e:
         print('Error in SaveDICOM_Image.overwriteDicomFileTag: ' + str(e))
         logger.exception('Error in SaveDICOM_Image.overwriteDicomFileTag: ' + str(e))
 
 
+def overwriteDicomFileTags(imagePath, tagValues):
+    """
+    This method writes all the values of the dictionary `tagValues` ({dicomTag: newValue, ...}) 
+    into the corresponding tags of `imagePath`, which can be 1 file or a list of files.
+    Each file is read once, all tags are changed in memory and the file is written once.
+    """
+    logger.info("SaveDICOM_Image.overwriteDicomFileTags called")
+    try:
+        imagePathList = imagePath if isinstance(imagePath, list) else [imagePath]
+        for path in imagePathList:
+            if patchDicomFileTags(path, tagValues):
+                continue
+            dataset = ReadDICOM_Image.getDicomDataset(path)
+            setDatasetTags(dataset, tagValues)
+            saveDicomToFile(dataset, output_path=path)
+        return
+    except Exception as e:
+        print('Error in SaveDICOM_Image.overwriteDicomFileTags: ' + str(e))
+        logger.exception('Error in SaveDICOM_Image.overwriteDicomFileTags: ' + str(e))
+
+
+# Value representations whose values can be padded with trailing spaces (or NULL for UI) without changing their meaning
+PADDED_VR = {'AE': b' ', 'AS': b' ', 'CS': b' ', 'DA': b' ', 'DS': b' ', 'DT': b' ', 'IS': b' ', 
+             'LO': b' ', 'SH': b' ', 'TM': b' ', 'UC': b' ', 'UI': b'\x00'}
+
+
+def patchDicomFileTags(imagePath, tagValues):
+    """
+    This method writes all the values of the dictionary `tagValues` ({dicomTag: newValue, ...}) into `imagePath` 
+    without re-encoding the pixel data. It only applies to explicit VR little endian files that are not deflated, where all tags are before PixelData.
+    If every new value fits in the padded length of the existing element, the values are patched in place.
+    Otherwise, only the header is re-encoded into a temporary file, the bytes from PixelData onwards are copied unchanged 
+    and the temporary file replaces `imagePath`.
+    Returns True if the file was patched and False if it has to be rewritten with `overwriteDicomFileTags`.
+    """
+    logger.info("SaveDICOM_Image.patchDicomFileTags called")
+    try:
+        tags = [Tag(dicomTag) for dicomTag in tagValues]
+        if any(tag >= 0x7FE00010 for tag in tags):
+            return False
+        with open(imagePath, 'rb') as fp:
+            dataset = pydicom.dcmread(fp, stop_before_pixels=True)
+            pixelDataPosition = fp.tell()
+        if dataset.is_implicit_VR or not dataset.is_little_endian or dataset.file_meta.TransferSyntaxUID.is_deflated:
+            return False
+        encodings = pydicom.charset.convert_encodings(dataset.get('SpecificCharacterSet', 'ISO_IR 6'))
+        rawElements = {tag: dataset.get_item(tag) for tag in tags if tag in dataset}
+        setDatasetTags(dataset, tagValues)
+        # Try to patch all values in place
+        patches = []
+        for tag in tags:
+            rawElement = rawElements.get(tag)
+            if rawElement is None or not hasattr(rawElement, 'value_tell') or rawElement.length == 0xFFFFFFFF:
+                break
+            dataElement = dataset[tag]
+            if dataElement.VR != rawElement.VR or dataElement.VR == 'SQ':
+                break
+            elementBytes = DicomBytesIO()
+            elementBytes.is_little_endian = True
+            elementBytes.is_implicit_VR = False
+            pydicom.filewriter.write_data_element(elementBytes, dataElement, encodings=encodings)
+            valueBytes = elementBytes.getvalue()[12 if dataElement.VR in pydicom.filewriter.extra_length_VRs else 8:]
+            if len(valueBytes) < rawElement.length and dataElement.VR in PADDED_VR:
+                valueBytes += PADDED_VR[dataElement.VR] * (rawElement.length - len(valueBytes))
+            if len(valueBytes) != rawElement.length:
+                break
+            patches.append((rawElement.value_tell, valueBytes))
+        else:
+            with open(imagePath, 'r+b') as fp:
+                for position, valueBytes in patches:
+                    fp.seek(position)
+                    fp.write(valueBytes)
+            ReadDICOM_Image.invalidateDicomHeader(imagePath)
+            ReadDICOM_Image.invalidatePixelArray(imagePath)
+            return True
+        # Re-encode the header only and stream-copy the pixel data
+        writeHeaderAndCopyPixels(dataset, imagePath, pixelDataPosition, imagePath)
+        return True
+    except Exception as e:
+        print('Error in SaveDICOM_Image.patchDicomFileTags: ' + str(e))
+        logger.exception('Error in SaveDICOM_Image.patchDicomFileTags: ' + str(e))
+        return False
+
+
+def copyDicomFile(imagePath, outputPath, tagValues):
+    """
+    This method copies the DICOM file `imagePath` into `outputPath` and writes the values of the dictionary 
+    `tagValues` ({dicomTag: newValue, ...}) in the copy, in one pass and without decoding the pixel data.
+    Only the header is re-encoded: the bytes from PixelData onwards are copied unchanged.
+    Returns True if the file was copied and False if it has to be copied through pydicom (eg. deflated files).
+    """
+    logger.info("SaveDICOM_Image.copyDicomFile called")
+    try:
+        if any(Tag(dicomTag) >= 0x7FE00010 for dicomTag in tagValues):
+            return False
+        with open(imagePath, 'rb') as fp:
+            dataset = pydicom.dcmread(fp, stop_before_pixels=True)
+            pixelDataPosition = fp.tell()
+        if dataset.file_meta.TransferSyntaxUID.is_deflated:
+            return False
+        setDatasetTags(dataset, tagValues)
+        writeHeaderAndCopyPixels(dataset, imagePath, pixelDataPosition, outputPath)
+        return True
+    except Exception as e:
+        print('Error in SaveDICOM_Image.copyDicomFile: ' + str(e))
+        logger.exception('Error in SaveDICOM_Image.copyDicomFile: ' + str(e))
+        return False
+
+
+def writeHeaderAndCopyPixels(dataset, imagePath, pixelDataPosition, outputPath):
+    """
+    This method writes the header `dataset` (read with stop_before_pixels=True) into `outputPath`, followed by the bytes 
+    of `imagePath` from `pixelDataPosition` onwards. The file is written into a temporary file that then replaces `outputPath`.
+    The temporary file gets the permissions of `outputPath` if it exists, or those of a new file otherwise.
+    """
+    fileDescriptor, temporaryPath = tempfile.mkstemp(suffix='.dcm', dir=os.path.dirname(os.path.abspath(outputPath)))
+    try:
+        with os.fdopen(fileDescriptor, 'wb') as outputFile:
+            pydicom.filewriter.dcmwrite(outputFile, dataset, write_like_original=True)
+            with open(imagePath, 'rb') as inputFile:
+                inputFile.seek(pixelDataPosition)
+                shutil.copyfileobj(inputFile, outputFile, 1024*1024)
+        # mkstemp creates the file with mode 0600
+        if os.path.exists(outputPath):
+            shutil.copymode(outputPath, temporaryPath)
+        else:
+            os.chmod(temporaryPath, NEW_FILE_MODE)
+        os.replace(temporaryPath, outputPath)
+    except:
+        if os.path.exists(temporaryPath):
+            os.remove(temporaryPath)
+        raise
+    ReadDICOM_Image.invalidateDicomHeader(outputPath)
+    ReadDICOM_Image.invalidatePixelArray(outputPath)
+
+
+def setDatasetTags(dataset, tagValues):
+    """
+    This method writes all the values of the dictionary `tagValues` ({dicomTag: newValue, ...}) 
+    into the DICOM Dataset object/class in memory. The tags that don't exist in `dataset` are created.
+    `dicomTag` can be a keyword string, a (group, element) tuple or an integer.
+    """
+    logger.info("SaveDICOM_Image.setDatasetTags called")
+    try:
+        for dicomTag, newValue in tagValues.items():
+            if dicomTag in dataset:
+                dataElement = dataset[dicomTag]
+                if dataElement.VR == "TM":
+                    dataElement.value = datetime.strptime(str(timedelta(seconds=int(newValue))), "%H:%M:%S")
+                else:
+                    dataElement.value = newValue
+            elif dictionary_VR(dicomTag) == "TM":
+                dataset.add_new(dicomTag, dictionary_VR(dicomTag), datetime.strptime(str(timedelta(seconds=int(newValue))), "%H:%M:%S"))
+            else:
+                dataset.add_new(dicomTag, dictionary_VR(dicomTag), newValue)
+        return dataset
+    except Exception as e:
+        print('Error in SaveDICOM_Image.setDatasetTags: ' + str(e))
+        logger.exception('Error in SaveDICOM_Image.setDatasetTags: ' + str(e))
+
+
+def isBinaryArray(array, chunkSize=1048576):
+    """This method returns True if the input array holds exactly two distinct values, as `len(np.unique(array)) == 2`.
+        The array is scanned once, in chunks, and the scan stops at the first chunk with a third value.
+    """
+    def matches(chunk, value):
+        # value != value is only True for NaN, which np.unique counts as one value
+        return (chunk != chunk) if value != value else (chunk == value)
+    values = []
+    flatArray = np.ravel(array)
+    for start in range(0, flatArray.size, chunkSize):
+        chunk = flatArray[start:start+chunkSize]
+        if len(values) == 2:
+            if not np.all(matches(chunk, values[0]) | matches(chunk, values[1])):
+                return False
+            continue
+        for value in values:
+            chunk = chunk[~matches(chunk, value)]
+        while chunk.size:
+            if len(values) == 2:
+                return False
+            values.append(chunk[0])
+            chunk = chunk[~matches(chunk, chunk[0])]
+    return len(values) == 2
+
+
 def createNewPixelArray(imageArray, dataset):
     """This method saves the imageArray into the `dataset` input argument based on other DICOM parameters in `dataset`.
+
+        The minimum and maximum of all frames are computed in one reduction and each frame is scaled with scalars into
+        a reused buffer, then cast in place into the integer array that becomes PixelData.
     """
     logger.info("SaveDICOM_Image.createNewPixelArray called")
     try:
@@ -276,94 +435,101 @@ def createNewPixelArray(imageArray, dataset):
         if [0x2005, 0x100E] in dataset:
             del dataset[0x2005, 0x100E]
         # If the new array is a binary image / mask
-        if len(np.unique(imageArray)) == 2:
+        if isBinaryArray(imageArray):
             param.editDicom(dataset, imageArray, "SEG")
             return dataset
+        imageArray = np.asarray(imageArray)
         numberFrames = 1
-        enhancedArrayInt = []
-        numDimensions = len(np.shape(imageArray))
         # If Enhanced MRI, then:
         # For each frame, slope and intercept are M and B. For registration, I will have to add Image Position and Orientation
-        if hasattr(dataset, 'PerFrameFunctionalGroupsSequence'):
-            if numDimensions == 2:
+        isEnhanced = hasattr(dataset, 'PerFrameFunctionalGroupsSequence')
+        if isEnhanced:
+            if imageArray.ndim == 2:
                 dataset.NumberOfFrames = 1
             else:
                 dataset.NumberOfFrames = np.shape(imageArray)[0]
             del dataset.PerFrameFunctionalGroupsSequence[dataset.NumberOfFrames:]
             numberFrames = dataset.NumberOfFrames
-        for index in range(numberFrames):
-            if len(np.shape(imageArray)) == 2:
-                tempArray = imageArray
-            else:
-                tempArray = np.squeeze(imageArray[index, ...])
-            dataset.PixelRepresentation = 0
-            target = (np.power(2, dataset.BitsAllocated) - 1) * np.ones(np.shape(tempArray))
-            maximum = np.ones(np.shape(tempArray)) * np.amax(tempArray)
-            minimum = np.ones(np.shape(tempArray)) * np.amin(tempArray)
-            imageScaled = target * (tempArray - minimum) / (maximum - minimum)
-            slope =  target / (maximum - minimum)
-            intercept = (- target * minimum)/ (maximum - minimum)
-            rescaleSlope = np.ones(np.shape(tempArray)) / slope
-            rescaleIntercept = - intercept / slope
-            if dataset.BitsAllocated == 8:
-                imageArrayInt = imageScaled.astype(np.uint8)
-            elif dataset.BitsAllocated == 16:
-                imageArrayInt = imageScaled.astype(np.uint16)
-            elif dataset.BitsAllocated == 32:
-                imageArrayInt = imageScaled.astype(np.uint32)
-            elif dataset.BitsAllocated == 64:
-                imageArrayInt = imageScaled.astype(np.uint64)
-            else:
-                imageArrayInt = imageScaled.astype(dataset.pixel_array.dtype)
-            dataset.add_new('0x00280106', 'US', int(np.amin(imageArrayInt)))
-            dataset.add_new('0x00280107', 'US', int(np.amax(imageArrayInt)))
-            if hasattr(dataset, 'PerFrameFunctionalGroupsSequence'):
-                # Rotate back to Original Position
-                enhancedArrayInt.append(np.transpose(imageArrayInt))
-                # Rescsale Slope and Intercept
-                dataset.PerFrameFunctionalGroupsSequence[index].PixelValueTransformationSequence[0].RescaleSlope = rescaleSlope.flatten()[0]
-                dataset.PerFrameFunctionalGroupsSequence[index].PixelValueTransformationSequence[0].RescaleIntercept = rescaleIntercept.flatten()[0]
-                # Set Window Center and Width
-                center = (np.amax(tempArray) + np.amin(tempArray)) / 2 # (0 if int(np.amin(imageArrayInt)) < 0 else int(target.flatten()[0]/2))
-                width = np.amax(tempArray) - np.amin(tempArray) # int(target.flatten()[0])
-                if width == 1.0: width = 1.1 
-                dataset.PerFrameFunctionalGroupsSequence[index].FrameVOILUTSequence[0].WindowCenter = center
-                dataset.PerFrameFunctionalGroupsSequence[index].FrameVOILUTSequence[0].WindowWidth = width
-            else:
-                # Rotate back to Original Position
-                imageArrayInt = np.transpose(imageArrayInt)
-                # Rescsale Slope and Intercept
-                dataset.RescaleSlope = rescaleSlope.flatten()[0]
-                dataset.RescaleIntercept = rescaleIntercept.flatten()[0]
+        if imageArray.ndim == 2:
+            frames = [imageArray]
+        else:
+            frames = [np.squeeze(imageArray[index, ...]) for index in range(numberFrames)]
+        dataset.PixelRepresentation = 0
+        target = np.float64(np.power(2, dataset.BitsAllocated) - 1)
+        if dataset.BitsAllocated in (8, 16, 32, 64):
+            dtype = np.dtype('uint' + str(dataset.BitsAllocated))
+        else:
+            dtype = dataset.pixel_array.dtype
+        # Minimum and maximum of every frame, in the input type (for the window) and in float64 (for the scaling)
+        if imageArray.ndim <= 3:
+            frameStack = imageArray.reshape((1, -1)) if imageArray.ndim == 2 else imageArray[:numberFrames].reshape((numberFrames, -1))
+        else:
+            frameStack = np.reshape(frames, (numberFrames, -1))
+        frameMinima = np.amin(frameStack, axis=1)
+        frameMaxima = np.amax(frameStack, axis=1)
+        del frameStack
+        imageArrayInt = np.empty((numberFrames,) + np.shape(frames[0]), dtype=dtype)
+        imageScaled = np.empty(np.shape(frames[0]), dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for index, tempArray in enumerate(frames):
+                minimum = np.float64(frameMinima[index])
+                maximum = np.float64(frameMaxima[index])
+                # Same operations, in the same order, as target * (tempArray - minimum) / (maximum - minimum)
+                np.subtract(tempArray, minimum, out=imageScaled)
+                imageScaled *= target
+                imageScaled /= (maximum - minimum)
+                np.copyto(imageArrayInt[index], imageScaled, casting='unsafe')
+                slope = target / (maximum - minimum)
+                intercept = (- target * minimum) / (maximum - minimum)
+                rescaleSlope = 1.0 / slope
+                rescaleIntercept = - intercept / slope
                 # Set Window Center and Width
-                center = (np.amax(tempArray) + np.amin(tempArray)) / 2
-                width = np.amax(tempArray) - np.amin(tempArray)
+                center = (frameMaxima[index] + frameMinima[index]) / 2
+                width = frameMaxima[index] - frameMinima[index]
                 if width == 1.0: width = 1.1
-                dataset.add_new('0x00281050', 'DS', center)
-                dataset.add_new('0x00281051', 'DS', width)
-                # dataset.WindowCenter = (0 if int(np.amin(imageArrayInt)) < 0 else int(target.flatten()[0]/2))
-                # dataset.WindowWidth = int(target.flatten()[0])
-        if enhancedArrayInt:
-            imageArrayInt = np.array(enhancedArrayInt)
+                if isEnhanced:
+                    # Rescsale Slope and Intercept
+                    dataset.PerFrameFunctionalGroupsSequence[index].PixelValueTransformationSequence[0].RescaleSlope = rescaleSlope
+                    dataset.PerFrameFunctionalGroupsSequence[index].PixelValueTransformationSequence[0].RescaleIntercept = rescaleIntercept
+                    dataset.PerFrameFunctionalGroupsSequence[index].FrameVOILUTSequence[0].WindowCenter = center
+                    dataset.PerFrameFunctionalGroupsSequence[index].FrameVOILUTSequence[0].WindowWidth = width
+                else:
+                    # Rescsale Slope and Intercept
+                    dataset.RescaleSlope = rescaleSlope
+                    dataset.RescaleIntercept = rescaleIntercept
+                    dataset.add_new('0x00281050', 'DS', center)
+                    dataset.add_new('0x00281051', 'DS', width)
+        dataset.add_new('0x00280106', 'US', int(np.amin(imageArrayInt[-1])))
+        dataset.add_new('0x00280107', 'US', int(np.amax(imageArrayInt[-1])))
+        # Rotate back to Original Position
+        if isEnhanced:
+            imageArrayInt = np.transpose(imageArrayInt, (0, 2, 1))
+        else:
+            imageArrayInt = np.transpose(imageArrayInt[0])
         
         # Set the shape/dimensions and PixelData
         dataset.Rows = np.shape(imageArrayInt)[-2]
         dataset.Columns = np.shape(imageArrayInt)[-1]
         dataset.PixelData = imageArrayInt.tobytes()
-        del imageScaled, enhancedArrayInt, tempArray
+        del imageScaled, imageArrayInt, frames
         return dataset
     except Exception as e:
         print('Error in SaveDICOM_Image.createNewPixelArray: ' + str(e))
         logger.exception('Error in SaveDICOM_Image.createNewPixelArray: ' + str(e))
 
 
-def createNewSingleDicom(dicomData, imageArray, series_id=None, series_uid=None, series_name=None, comment=None, parametric_map=None, colourmap=None, list_refs=None):
+def createNewSingleDicom(dicomData, imageArray, series_id=None, series_uid=None, series_name=None, comment=None, parametric_map=None, colourmap=None, list_refs=None, creation_time=None):
     """This function takes a DICOM Object, copies most of the DICOM tags from the DICOM given in input
         and writes the imageArray into the new DICOM Object in PixelData. 
+        dicomData is not modified and can be a header read without the pixel data.
+        If given, creation_time is the datetime written as the content, series and acquisition date/time.
     """
     logger.info("SaveDICOM_Image.createNewSingleDicom called")
     try:
         newDicom = copy.deepcopy(dicomData)
+        if not any(hasattr(newDicom, attr) for attr in ['PixelData', 'FloatPixelData', 'DoubleFloatPixelData']):
+            # Header read with stop_before_pixels: the pixel data is replaced below, but some parametric maps delete it first
+            newDicom.add_new(0x7FE00010, 'OW' if int(getattr(newDicom, 'BitsAllocated', 16)) > 8 else 'OB', b'')
         #imageArray = copy.deepcopy(imageArray)
 
         # Series ID and UID
@@ -382,7 +548,7 @@ def createNewSingleDicom(dicomData, imageArray, series_id=None, series_uid=None,
         newDicom.SOPInstanceUID = generateUIDs(newDicom, seriesNumber=series_id)[2]
 
         # Date and Time of Creation
-        dt = datetime.now()
+        dt = datetime.now() if creation_time is None else creation_time
         timeStr = dt.strftime('%H%M%S')  # long format with micro seconds
         newDicom.ContentDate = dt.strftime('%Y%m%d')
         newDicom.ContentTime = timeStr
@@ -591,6 +757,7 @@ def updateSingleDicom(dicomData, colourmap=None, levels=None, lut=None):
 def saveDicomToFile(dicomData, output_path=None):
     """This method takes a DICOM object and saves it as a DICOM file 
         with the set filename in the input arguments.
+        Returns True if the file was written and False otherwise.
     """
     logger.info("SaveDICOM_Image.saveDicomToFile called")
     try:
@@ -604,6 +771,8 @@ def saveDicomToFile(dicomData, output_path=None):
                     output_path = os.getcwd() + str(dicomData.SOPInstanceUID) + ".dcm"
 
         pydicom.filewriter.dcmwrite(output_path, dicomData, write_like_original=True)
+        ReadDICOM_Image.invalidateDicomHeader(output_path)
+        ReadDICOM_Image.invalidatePixelArray(output_path)
         # Try to read the new generated file to check if it's corrupted
         #list_tags = ['InstanceNumber', 'SOPInstanceUID', 'PixelData', 'FloatPixelData', 'DoubleFloatPixelData', 'AcquisitionTime',
         #             'AcquisitionDate', 'SeriesTime', 'SeriesDate', 'PatientName', 'PatientID', 'StudyDate', 'StudyTime', 
@@ -613,7 +782,8 @@ def saveDicomToFile(dicomData, output_path=None):
         #except:
         #    del output_path
         #    print('File ' + output_path + ' corrupted during the saving process. Weasel deleted the mentioned file locally.')
-        return
+        return True
     except Exception as e:
         print('Error in function SaveDICOM_Image.saveDicomToFile: ' + str(e))
         logger.exception('Error in SaveDICOM_Image.saveDicomToFile: ' + str(e))
+        return False
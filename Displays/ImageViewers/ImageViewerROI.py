@@ -672,7 +672,7 @@ class ImageViewerROI(QMdiSubWindow):
                 imageNumber = self.mainImageSlider.value()
             else:
                 imageNumber = 1
-            pixelArray = ReadDICOM_Image.returnPixelArray(self.selectedImagePath)
+            pixelArray = ReadDICOM_Image.returnCachedPixelArray(self.selectedImagePath)
             regionName = self.cmbNamesROIs.currentText()
             mask = self.graphicsView.dictROIs.getMask(regionName, imageNumber)   
             if mask is not None:
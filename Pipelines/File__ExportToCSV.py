@@ -2,6 +2,8 @@
 Saves the pixel arrays of the checked images/series as .csv files.
 """
 
+import os
+
 def main(weasel):
     try:
         dicomList = weasel.series()
@@ -9,11 +11,11 @@ def main(weasel):
         if len(dicomList) == 0: return
         local_path = weasel.select_folder()
         if local_path is None: return
-        for i, series in enumerate(dicomList):
-            weasel.progress_bar(max=len(dicomList), index=i+1, msg="Saving series " + series.label + " to CSV")
-            series.export_as_csv(directory=local_path)
-        weasel.close_progress_bar()
-        weasel.information(msg="Selected series/images successfully saved as CSV", title="Export to CSV")
+        failedFiles = dicomList.export_as_csv(directory=local_path)
+        if failedFiles:
+            weasel.error(msg="The following series could not be saved as CSV:\n" + "\n".join(os.path.basename(filePath) for filePath in failedFiles), title="Export to CSV")
+        else:
+            weasel.information(msg="Selected series/images successfully saved as CSV", title="Export to CSV")
     except Exception as e:
         # Record error message in the log and prints in the terminal
         weasel.log_error('Error in function File__ExportToCSV.main: ' + str(e))
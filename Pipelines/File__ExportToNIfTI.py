@@ -2,6 +2,8 @@
 Saves the pixel arrays of the checked images/series as .nii.gz files.
 """
 
+import os
+
 def main(weasel):
     try:
         dicomList = weasel.series()
@@ -9,11 +11,11 @@ def main(weasel):
         if len(dicomList) == 0: return
         local_path = weasel.select_folder()
         if local_path is None: return
-        for i, series in enumerate(dicomList):
-            weasel.progress_bar(max=len(dicomList), index=i+1, msg="Saving series " + series.label + " to NIfTI")
-            series.export_as_nifti(directory=local_path)
-        weasel.close_progress_bar()
-        weasel.information(msg="Selected series/images successfully saved as NIfTI", title="Export to NIfTI")
+        failedFiles = dicomList.export_as_nifti(directory=local_path)
+        if failedFiles:
+            weasel.error(msg="The following series could not be saved as NIfTI:\n" + "\n".join(os.path.basename(filePath) for filePath in failedFiles), title="Export to NIfTI")
+        else:
+            weasel.information(msg="Selected series/images successfully saved as NIfTI", title="Export to NIfTI")
     except Exception as e:
         # Record error message in the log and prints in the terminal
         weasel.log_error('Error in function File__ExportToNIfTI.main: ' + str(e))
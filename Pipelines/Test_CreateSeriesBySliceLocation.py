@@ -12,8 +12,7 @@ def main(weasel):
         imgs = study.all_images
         new_study_description = 'Sorted by slice location_' + study.studyID
         series_number = 1
-        for loc in weasel.unique_elements(imgs.get_value("SliceLocation")):
-            imgs_loc = imgs.where("SliceLocation", "==", loc)
+        for loc, imgs_loc in imgs.group_by("SliceLocation").items():
             series = imgs_loc.merge(series_number=series_number, series_name='Slice location [' + str(loc) + ']', study_name=new_study_description, progress_bar=False, overwrite=False)
             series_number += 1
             # loc can be series_number actually
@@ -10,9 +10,8 @@ def enable(weasel):
 def main(weasel):
     seriesList = weasel.series()
     for series in seriesList:
-        for time in weasel.unique_elements(series["AcquisitionTime"]):
-            series_time = series.copy().where("AcquisitionTime", "==", time) # Without copy, you overwrite
-            series_time["SeriesDescription"] = '[ Acquisition time: ' + time + ' ]'
+        # One copy per acquisition time, all written in one pass
+        series.split_by("AcquisitionTime", write=True, series_names=lambda time: '[ Acquisition time: ' + str(time) + ' ]', suffix='_Copy')
     weasel.refresh()
 
 
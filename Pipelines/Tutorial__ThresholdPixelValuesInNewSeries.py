@@ -36,7 +36,7 @@ def Thresholded(pixelArray, lower_threshold, upper_threshold):
     upper_value = minimum_value + (upper_threshold / 100) * (maximum_value - minimum_value)
     lower_value = minimum_value + (lower_threshold / 100) * (maximum_value - minimum_value)
 
-    thresholdedArray = pixelArray
+    thresholdedArray = pixelArray.copy()
     thresholdedArray[thresholdedArray < lower_value] = 0
     thresholdedArray[thresholdedArray > upper_value] = 0
     thresholdedArray[thresholdedArray != 0] = 1
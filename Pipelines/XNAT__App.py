@@ -81,9 +81,9 @@ def download(weasel):
                                         weasel.information("The selected images will be downloaded to the root folder of the TreeView. The download progress can be checked in the terminal and you may continue using Weasel.", "XNAT Download") 
                                         dataset.download_dir(downloadFolder)
                                         weasel.information("Download completed!", "XNAT Download")
-        # Load the directory again
-        # This loads the whole directory again, so it might take some time. It would be quicker if there was an incremental approach to the TreeView (.xml or .csv).
-        weasel.open_dicom_folder()
+        # Load the downloaded files
+        # Only the new files are read if they were downloaded to the open DICOM folder
+        weasel.refresh_dicom_folder()
         # Delete Login Details
         del loginDetails, url, username, password
         session.disconnect()
@@ -110,7 +110,7 @@ class Weasel_CMD(WeaselProgrammingInterface):
         print("Weasel Command-line Mode")
         print("=====================================")
         if arguments.xml_dicom and arguments.python_script:
-            if arguments.xml_dicom.endswith(".xml") and arguments.python_script.endswith(".py"):
+            if arguments.xml_dicom.endswith((".xml", ".sqlite")) and arguments.python_script.endswith(".py"):
                 super().__init__()
                 self.cmd = True
                 self.tqdm_prog = None
@@ -179,7 +179,7 @@ def main():
                                  formatter_class=argparse.RawDescriptionHelpFormatter,
                                  usage='Weasel.py/.exe [-h] [-c] [-d] XML_DATA_PATH [-s] PYTHON_SCRIPT_PATH' )
     parser.add_argument('-c', '--command-line', action='store_true', help='Start Weasel in command-line mode')
-    parser.add_argument('-d', '--xml-dicom', type=str, metavar='', required=False, help='Path to the XML file with the DICOM filepaths')
+    parser.add_argument('-d', '--xml-dicom', type=str, metavar='', required=False, help='Path to the XML file or SQLite catalog with the DICOM filepaths')
     parser.add_argument('-s', '--python-script', type=str, metavar='', required=False, help='Path to the Python file with the analysis script (menu) to process')
     args = parser.parse_args()
     if args.command_line:
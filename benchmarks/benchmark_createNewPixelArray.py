@@ -0,0 +1,117 @@
+"""
+Benchmark of SaveDICOM_Image.createNewPixelArray on 2D, 3D and Enhanced MR inputs.
+
+The time to write a float32 pixel array into a dataset is compared with the previous implementation,
+which scaled each frame through full-size np.ones arrays and tested for binary masks with np.unique.
+Both versions must produce the same PixelData, rescale and window values.
+Run from the root of the repository:
+
+    python benchmarks/benchmark_createNewPixelArray.py [--size 256] [--slices 300] [--frames 120] [--repeats 3]
+"""
+
+import os
+import sys
+import copy
+import time
+import argparse
+import logging
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import DICOM.SaveDICOM_Image as SaveDICOM_Image
+import synthetic
+
+
+def previousCreateNewPixelArray(imageArray, dataset):
+    """createNewPixelArray before the per-frame scalars, kept as the reference of the benchmark."""
+    if [0x2005, 0x100E] in dataset:
+        del dataset[0x2005, 0x100E]
+    if len(np.unique(imageArray)) == 2:
+        SaveDICOM_Image.param.editDicom(dataset, imageArray, "SEG")
+        return dataset
+    numberFrames = 1
+    enhancedArrayInt = []
+    numDimensions = len(np.shape(imageArray))
+    if hasattr(dataset, 'PerFrameFunctionalGroupsSequence'):
+        if numDimensions == 2:
+            dataset.NumberOfFrames = 1
+        else:
+            dataset.NumberOfFrames = np.shape(imageArray)[0]
+        del dataset.PerFrameFunctionalGroupsSequence[dataset.NumberOfFrames:]
+        numberFrames = dataset.NumberOfFrames
+    for index in range(numberFrames):
+        if len(np.shape(imageArray)) == 2:
+            tempArray = imageArray
+        else:
+            tempArray = np.squeeze(imageArray[index, ...])
+        dataset.PixelRepresentation = 0
+        target = (np.power(2, dataset.BitsAllocated) - 1) * np.ones(np.shape(tempArray))
+        maximum = np.ones(np.shape(tempArray)) * np.amax(tempArray)
+        minimum = np.ones(np.shape(tempArray)) * np.amin(tempArray)
+        imageScaled = target * (tempArray - minimum) / (maximum - minimum)
+        slope =  target / (maximum - minimum)
+        intercept = (- target * minimum)/ (maximum - minimum)
+        rescaleSlope = np.ones(np.shape(tempArray)) / slope
+        rescaleIntercept = - intercept / slope
+        imageArrayInt = imageScaled.astype(np.dtype('uint' + str(dataset.BitsAllocated)))
+        dataset.add_new('0x00280106', 'US', int(np.amin(imageArrayInt)))
+        dataset.add_new('0x00280107', 'US', int(np.amax(imageArrayInt)))
+        center = (np.amax(tempArray) + np.amin(tempArray)) / 2
+        width = np.amax(tempArray) - np.amin(tempArray)
+        if width == 1.0: width = 1.1
+        if hasattr(dataset, 'PerFrameFunctionalGroupsSequence'):
+            enhancedArrayInt.append(np.transpose(imageArrayInt))
+            dataset.PerFrameFunctionalGroupsSequence[index].PixelValueTransformationSequence[0].RescaleSlope = rescaleSlope.flatten()[0]
+            dataset.PerFrameFunctionalGroupsSequence[index].PixelValueTransformationSequence[0].RescaleIntercept = rescaleIntercept.flatten()[0]
+            dataset.PerFrameFunctionalGroupsSequence[index].FrameVOILUTSequence[0].WindowCenter = center
+            dataset.PerFrameFunctionalGroupsSequence[index].FrameVOILUTSequence[0].WindowWidth = width
+        else:
+            imageArrayInt = np.transpose(imageArrayInt)
+            dataset.RescaleSlope = rescaleSlope.flatten()[0]
+            dataset.RescaleIntercept = rescaleIntercept.flatten()[0]
+            dataset.add_new('0x00281050', 'DS', center)
+            dataset.add_new('0x00281051', 'DS', width)
+    if enhancedArrayInt:
+        imageArrayInt = np.array(enhancedArrayInt)
+    dataset.Rows = np.shape(imageArrayInt)[-2]
+    dataset.Columns = np.shape(imageArrayInt)[-1]
+    dataset.PixelData = imageArrayInt.tobytes()
+    return dataset
+
+
+def measure(function, imageArray, dataset, repeats):
+    """Returns the dataset written by function(imageArray, copy of dataset) and the mean time of a call in seconds."""
+    seconds = 0
+    for _ in range(repeats):
+        datasetCopy = copy.deepcopy(dataset)
+        start = time.perf_counter()
+        result = function(imageArray, datasetCopy)
+        seconds += time.perf_counter() - start
+    return result, seconds / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=256, help='number of rows and columns of each slice')
+    parser.add_argument('--slices', type=int, default=300, help='number of slices of the 3D array')
+    parser.add_argument('--frames', type=int, default=120, help='number of frames of the Enhanced MR dataset')
+    parser.add_argument('--repeats', type=int, default=3, help='number of timed calls')
+    arguments = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    size = arguments.size
+    dataset = synthetic.newDataset(size, size)
+    enhanced = synthetic.enhancedDataset(dataset, arguments.frames)
+    random = np.random.default_rng(0)
+    # Only the first slice of a 3D array is kept for a single frame dataset, but the whole array is checked for a binary mask
+    cases = [('2D ' + str(size) + 'x' + str(size), dataset, (random.random((size, size)) * 1000).astype(np.float32)),
+             ('3D ' + str(arguments.slices) + ' slices', dataset, (random.random((arguments.slices, size, size)) * 1000).astype(np.float32)),
+             ('Enhanced MR ' + str(arguments.frames) + ' frames', enhanced, (random.random((arguments.frames, size, size)) * 1000 - 200).astype(np.float32))]
+    print('{:<28}{:>14}{:>14}'.format('Input', 'Before (s)', 'After (s)'))
+    for name, inputDataset, imageArray in cases:
+        before, timeBefore = measure(previousCreateNewPixelArray, imageArray, inputDataset, arguments.repeats)
+        after, timeAfter = measure(SaveDICOM_Image.createNewPixelArray, imageArray, inputDataset, arguments.repeats)
+        assert before == after and before.PixelData == after.PixelData, name
+        print('{:<28}{:>14.3f}{:>14.3f}'.format(name, timeBefore, timeAfter))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Micro-benchmark of the bytes allocated per slice by ReadDICOM_Image.getPixelArray.
+
+The peak memory traced while converting an already decoded dataset is compared with the
+previous implementation, which rescaled through full-size np.ones arrays in float64.
+Run from the root of the repository:
+
+    python benchmarks/benchmark_getPixelArray.py [--size 512] [--frames 20]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import DICOM.ReadDICOM_Image as ReadDICOM_Image
+import synthetic
+
+
+def previousGetPixelArray(dataset):
+    """getPixelArray before the in-place rescale, kept as the reference of the benchmark."""
+    if hasattr(dataset, 'PerFrameFunctionalGroupsSequence'):
+        imageList = list()
+        originalArray = dataset.pixel_array.astype(np.float32)
+        if len(np.shape(originalArray)) == 2:
+            slope = float(getattr(dataset.PerFrameFunctionalGroupsSequence[0].PixelValueTransformationSequence[0], 'RescaleSlope', 1)) * np.ones(originalArray.shape)
+            intercept = float(getattr(dataset.PerFrameFunctionalGroupsSequence[0].PixelValueTransformationSequence[0], 'RescaleIntercept', 0)) * np.ones(originalArray.shape)
+            pixelArray = np.transpose(originalArray * slope + intercept)
+        else:
+            for index in range(np.shape(originalArray)[0]):
+                sliceArray = np.squeeze(originalArray[index, ...])
+                slope = float(getattr(dataset.PerFrameFunctionalGroupsSequence[index].PixelValueTransformationSequence[0], 'RescaleSlope', 1)) * np.ones(sliceArray.shape)
+                intercept = float(getattr(dataset.PerFrameFunctionalGroupsSequence[index].PixelValueTransformationSequence[0], 'RescaleIntercept', 0)) * np.ones(sliceArray.shape)
+                imageList.append(np.transpose(sliceArray * slope + intercept))
+            pixelArray = np.array(imageList)
+    else:
+        slope = float(getattr(dataset, 'RescaleSlope', 1)) * np.ones(dataset.pixel_array.shape)
+        intercept = float(getattr(dataset, 'RescaleIntercept', 0)) * np.ones(dataset.pixel_array.shape)
+        pixelArray = np.transpose(dataset.pixel_array.astype(np.float32) * slope + intercept)
+    return np.nan_to_num(pixelArray)
+
+
+def measure(function, dataset, repeats):
+    """Returns the peak bytes traced during one call of function(dataset) and the mean time of a call in seconds."""
+    function(dataset)
+    tracemalloc.start()
+    function(dataset)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function(dataset)
+    return peak, (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=512, help='number of rows and columns of each slice')
+    parser.add_argument('--frames', type=int, default=20, help='number of frames of the Enhanced MR dataset')
+    parser.add_argument('--repeats', type=int, default=5, help='number of timed calls')
+    arguments = parser.parse_args()
+    dataset = synthetic.newDataset(arguments.size, arguments.size)
+    enhanced = synthetic.enhancedDataset(dataset, arguments.frames)
+    print('{:<28}{:>18}{:>18}{:>14}{:>14}'.format('Input', 'Before (MB/slice)', 'After (MB/slice)', 'Before (ms)', 'After (ms)'))
+    for name, inputDataset, numberSlices in [('2D ' + str(arguments.size) + 'x' + str(arguments.size), dataset, 1),
+                                             ('Enhanced MR ' + str(arguments.frames) + ' frames', enhanced, arguments.frames)]:
+        inputDataset.pixel_array # Decode once so that only the conversion is measured
+        before = previousGetPixelArray(inputDataset)
+        after = ReadDICOM_Image.getPixelArray(inputDataset)
+        assert before.shape == after.shape and np.allclose(before, after, rtol=1e-6), name
+        peakBefore, timeBefore = measure(previousGetPixelArray, inputDataset, arguments.repeats)
+        peakAfter, timeAfter = measure(ReadDICOM_Image.getPixelArray, inputDataset, arguments.repeats)
+        print('{:<28}{:>18.2f}{:>18.2f}{:>14.1f}{:>14.1f}'.format(name, peakBefore / numberSlices / 1e6, peakAfter / numberSlices / 1e6,
+                                                               timeBefore * 1e3, timeAfter * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark of SaveDICOM_Image.patchDicomFileTags against a full rewrite of each file.
+
+SeriesDescription is changed in every file of a synthetic series of about 500 MB, with:
+    - the full rewrite that overwriteDicomFileTag performed before the patcher (read, edit and dcmwrite the whole file),
+    - the patcher with a value of the same length, which is written in place,
+    - the patcher with a longer value, which re-encodes the header and stream-copies the pixel data.
+A deflated copy of the first file checks that it is rewritten in full rather than patched.
+Run from the root of the repository:
+
+    python benchmarks/benchmark_patchDicomFileTags.py [--images 100] [--rows 2048] [--columns 1280] [--folder PATH]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import logging
+from pydicom.uid import DeflatedExplicitVRLittleEndian
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import DICOM.ReadDICOM_Image as ReadDICOM_Image
+import DICOM.SaveDICOM_Image as SaveDICOM_Image
+import synthetic
+
+
+def fullRewrite(imagePath, tagValues):
+    """The previous overwriteDicomFileTag: the file is decoded, edited and written again in full."""
+    dataset = ReadDICOM_Image.getDicomDataset(imagePath)
+    SaveDICOM_Image.setDatasetTags(dataset, tagValues)
+    SaveDICOM_Image.saveDicomToFile(dataset, output_path=imagePath)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=100, help='number of files of the series')
+    parser.add_argument('--rows', type=int, default=2048, help='number of rows of each image')
+    parser.add_argument('--columns', type=int, default=1280, help='number of columns of each image')
+    parser.add_argument('--folder', help='folder where the series is written (a temporary folder by default)')
+    arguments = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    folder = arguments.folder or tempfile.mkdtemp(prefix='weasel_benchmark_')
+    try:
+        imagePathList = synthetic.writeSeries(folder, arguments.images, arguments.rows, arguments.columns, seriesDescription='Series')
+        sizeMB = sum(os.path.getsize(imagePath) for imagePath in imagePathList) / 1e6
+        print('{} files, {:.0f} MB'.format(len(imagePathList), sizeMB))
+        referencePixels = ReadDICOM_Image.getDicomDataset(imagePathList[0]).PixelData
+        # 'Serie1' and 'Serie2' have the padded length of 'Series', the last value does not fit
+        for name, function, newValue in [('Full rewrite (previous overwriteDicomFileTag)', fullRewrite, 'Serie1'),
+                                         ('Patch in place', SaveDICOM_Image.patchDicomFileTags, 'Serie2'),
+                                         ('Header rewrite and pixel copy', SaveDICOM_Image.patchDicomFileTags, 'Series with a longer description')]:
+            start = time.perf_counter()
+            for imagePath in imagePathList:
+                function(imagePath, {'SeriesDescription': newValue})
+            seconds = time.perf_counter() - start
+            dataset = ReadDICOM_Image.getDicomDataset(imagePathList[0])
+            assert dataset.SeriesDescription == newValue and dataset.PixelData == referencePixels, name
+            print('{:<48}{:>8.2f} s{:>10.0f} MB/s'.format(name, seconds, sizeMB / seconds))
+        # Deflated files are not patched, overwriteDicomFileTags rewrites them in full
+        deflatedPath = os.path.join(folder, 'deflated.dcm')
+        dataset = ReadDICOM_Image.getDicomDataset(imagePathList[0])
+        dataset.file_meta.TransferSyntaxUID = DeflatedExplicitVRLittleEndian
+        dataset.save_as(deflatedPath, write_like_original=False)
+        for newValue in ['Serie3', 'Deflated series with a longer description']:
+            assert not SaveDICOM_Image.patchDicomFileTags(deflatedPath, {'SeriesDescription': newValue}), 'Deflated file patched'
+            SaveDICOM_Image.overwriteDicomFileTags(deflatedPath, {'SeriesDescription': newValue})
+            dataset = ReadDICOM_Image.getDicomDataset(deflatedPath)
+            assert dataset.SeriesDescription == newValue and dataset.PixelData == referencePixels, 'Deflated file'
+        print('Deflated file rewritten in full with the same pixel data')
+    finally:
+        if arguments.folder is None:
+            shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark of the header read of the folder scan, WriteXMLfromDICOM.scan_headers.
+
+The headers of a synthetic folder tree of 50 000 files are read:
+    - with the read of each file that the scan performed before read_headers, which loads the pixel data,
+    - serially, with read_headers, which is what scan_headers does by default,
+    - by a pool of threads,
+    - by a pool of processes.
+The pools are only worth enabling on machines where they are faster than the serial read, so the
+number of cores is printed with the results. Run from the root of the repository:
+
+    python benchmarks/benchmark_scan.py [--series 500] [--images 100] [--workers 4] [--folder PATH]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import logging
+from pydicom import dcmread
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import CoreModules.WriteXMLfromDICOM as WriteXMLfromDICOM
+import synthetic
+
+
+def previousReadHeaders(file_list):
+    """The read of each file in get_scan_data before read_headers, kept as the reference of the benchmark.
+        The tag list holds the pixel data, so its value is loaded.
+    """
+    list_tags = ['InstanceNumber', 'SOPInstanceUID', 'PixelData', 'FloatPixelData', 'DoubleFloatPixelData', 'AcquisitionTime',
+                 'AcquisitionDate', 'SeriesTime', 'SeriesDate', 'PatientName', 'PatientID', 'StudyDate', 'StudyTime', 
+                 'SeriesDescription', 'StudyDescription', 'SequenceName', 'ProtocolName', 'SeriesNumber', 'PerFrameFunctionalGroupsSequence',
+                 'StudyInstanceUID', 'SeriesInstanceUID']
+    list_headers = list()
+    for filepath in file_list:
+        try:
+            list_headers.append(dcmread(filepath, specific_tags=list_tags))
+        except:
+            list_headers.append(None)
+    return list_headers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--series', type=int, default=500, help='number of series of the folder tree')
+    parser.add_argument('--images', type=int, default=100, help='number of files of each series')
+    parser.add_argument('--workers', type=int, default=max(2, min(8, os.cpu_count() or 1)), help='number of threads or processes of the pools')
+    parser.add_argument('--folder', help='folder where the tree is written, or read if it holds files already (a temporary folder by default)')
+    arguments = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    folder = arguments.folder or tempfile.mkdtemp(prefix='weasel_benchmark_')
+    try:
+        os.makedirs(folder, exist_ok=True)
+        if not any(os.scandir(folder)):
+            synthetic.writeFolderTree(folder, arguments.series, arguments.images)
+        fileList = [entry.path for entry in WriteXMLfromDICOM.scan_tree(folder) if entry.is_file()]
+        fileList.sort(key=WriteXMLfromDICOM.natural_keys)
+        print('{} files, {} cores, {} workers'.format(len(fileList), os.cpu_count(), arguments.workers))
+        reference = None
+        for name, function in [('Previous read', lambda: previousReadHeaders(fileList)),
+                               ('Serial (default)', lambda: WriteXMLfromDICOM.read_headers(fileList)),
+                               ('Thread pool', lambda: list(WriteXMLfromDICOM.scan_headers(fileList, workers=arguments.workers))),
+                               ('Process pool', lambda: list(WriteXMLfromDICOM.scan_headers(fileList, workers=arguments.workers, processPool=True)))]:
+            start = time.perf_counter()
+            headers = function()
+            seconds = time.perf_counter() - start
+            instances = [None if header is None else str(header.SOPInstanceUID) for header in headers]
+            reference = reference or instances
+            assert instances == reference and None not in instances, name
+            print('{:<24}{:>8.2f} s{:>12.0f} files/s'.format(name, seconds, len(fileList) / seconds))
+    finally:
+        if arguments.folder is None:
+            shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
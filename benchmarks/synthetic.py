@@ -0,0 +1,102 @@
+"""
+Synthetic DICOM data shared by the benchmark scripts in this folder.
+
+The files are uncompressed explicit VR little endian MR images with the tags that Weasel reads
+when it builds the XML file of a folder, so they can be loaded like any other DICOM folder.
+"""
+
+import os
+import copy
+import numpy as np
+from pydicom.dataset import Dataset, FileDataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+MR_IMAGE_STORAGE = '1.2.840.10008.5.1.4.1.1.4'
+
+
+def newDataset(rows=256, columns=256, seriesNumber=1, seriesDescription='Series', patientID='Patient', studyUID=None, seriesUID=None):
+    """Returns a single frame MR dataset with a uint16 pixel array of shape (rows, columns)."""
+    fileMeta = FileMetaDataset()
+    fileMeta.MediaStorageSOPClassUID = MR_IMAGE_STORAGE
+    fileMeta.TransferSyntaxUID = ExplicitVRLittleEndian
+    dataset = FileDataset('', {}, file_meta=fileMeta, preamble=b"\0" * 128)
+    dataset.is_little_endian = True
+    dataset.is_implicit_VR = False
+    dataset.SOPClassUID = MR_IMAGE_STORAGE
+    dataset.PatientID = patientID
+    dataset.PatientName = patientID
+    dataset.StudyDate = '20200101'
+    dataset.StudyTime = '101010'
+    dataset.StudyDescription = 'Study'
+    dataset.StudyInstanceUID = studyUID or generate_uid()
+    dataset.SeriesInstanceUID = seriesUID or generate_uid()
+    dataset.SeriesNumber = seriesNumber
+    dataset.SeriesDescription = seriesDescription
+    dataset.AcquisitionDate = '20200101'
+    dataset.ImageType = ['ORIGINAL', 'PRIMARY', 'M', 'ND']
+    dataset.ImageOrientationPatient = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+    dataset.PixelSpacing = [1.0, 1.0]
+    dataset.SliceThickness = 2.0
+    dataset.Rows = rows
+    dataset.Columns = columns
+    dataset.SamplesPerPixel = 1
+    dataset.PhotometricInterpretation = 'MONOCHROME2'
+    dataset.BitsAllocated = 16
+    dataset.BitsStored = 16
+    dataset.HighBit = 15
+    dataset.PixelRepresentation = 0
+    dataset.RescaleSlope = 2.0
+    dataset.RescaleIntercept = -10.0
+    dataset.PixelData = (np.arange(rows * columns) % 4096).astype(np.uint16).tobytes()
+    return dataset
+
+
+def writeSeries(folder, numberImages=10, rows=256, columns=256, seriesNumber=1, seriesDescription='Series', patientID='Patient', studyUID=None):
+    """Writes a series of numberImages single frame files in folder and returns their paths, in slice order."""
+    os.makedirs(folder, exist_ok=True)
+    dataset = newDataset(rows, columns, seriesNumber, seriesDescription, patientID, studyUID)
+    imagePathList = []
+    for index in range(numberImages):
+        dataset.SOPInstanceUID = dataset.file_meta.MediaStorageSOPInstanceUID = generate_uid()
+        dataset.InstanceNumber = index + 1
+        dataset.AcquisitionTime = '1010' + str(index % 60).zfill(2)
+        dataset.ImagePositionPatient = [0.0, 0.0, 2.0 * index]
+        dataset.SliceLocation = 2.0 * index
+        imagePath = os.path.join(folder, 'image_' + str(index).zfill(5) + '.dcm')
+        dataset.save_as(imagePath, write_like_original=False)
+        imagePathList.append(imagePath)
+    return imagePathList
+
+
+def writeFolderTree(root, numberSeries, imagesPerSeries, rows=64, seriesPerSubject=20):
+    """Writes numberSeries series of imagesPerSeries files under root, grouped in one subfolder per subject.
+        Returns the number of files written.
+    """
+    for seriesIndex in range(numberSeries):
+        subjectIndex = seriesIndex // seriesPerSubject
+        folder = os.path.join(root, 'subject' + str(subjectIndex), 'series' + str(seriesIndex).zfill(3))
+        writeSeries(folder, imagesPerSeries, rows, rows, seriesNumber=seriesIndex + 1, seriesDescription='Series' + str(seriesIndex),
+                    patientID='Patient' + str(subjectIndex), studyUID='1.2.826.0.1.3680043.8.498.' + str(subjectIndex + 1))
+    return numberSeries * imagesPerSeries
+
+
+def enhancedDataset(dataset, numberFrames):
+    """Returns an Enhanced MR copy of dataset with numberFrames frames and a different rescale slope, intercept and window per frame."""
+    enhanced = copy.deepcopy(dataset)
+    frame = np.frombuffer(dataset.PixelData, dtype=np.uint16).reshape(dataset.Rows, dataset.Columns)
+    enhanced.NumberOfFrames = numberFrames
+    enhanced.PixelData = np.stack([frame + index for index in range(numberFrames)]).astype(np.uint16).tobytes()
+    perFrameSequence = []
+    for index in range(numberFrames):
+        transformation = Dataset()
+        transformation.RescaleSlope = 1.5 + index
+        transformation.RescaleIntercept = -index
+        window = Dataset()
+        window.WindowCenter = 2048
+        window.WindowWidth = 4096
+        frameGroup = Dataset()
+        frameGroup.PixelValueTransformationSequence = [transformation]
+        frameGroup.FrameVOILUTSequence = [window]
+        perFrameSequence.append(frameGroup)
+    enhanced.PerFrameFunctionalGroupsSequence = perFrameSequence
+    return enhanced